@@ -1,3 +1,5 @@
+import os
+import socket
 import sys
 import time
 import xmlrpclib
@@ -49,27 +51,332 @@ pcomm = ProcessCommunicationsProtocol()
 class EventListenerProtocol:
     def wait(self, stdin=sys.stdin, stdout=sys.stdout):
         self.ready(stdout)
+        return self.receive(stdin)
+
+    def receive(self, stdin=sys.stdin):
+        """ Read the next event without saying READY, as a listener in a
+        pool with a window_size does after its first READY """
         line = stdin.readline()
         headers = get_headers(line)
         payload = stdin.read(int(headers['len']))
         return headers, payload
 
+    def wait_batch(self, stdin=sys.stdin, stdout=sys.stdout):
+        """ Wait for the events sent by a pool with a batch_size and
+        return them as a list of (headers, payload) tuples """
+        self.ready(stdout)
+        line = stdin.readline()
+        headers = get_headers(line)
+        body = stdin.read(int(headers['len']))
+        if not headers.has_key('batch'):
+            # a pool without a batch_size sends bare events
+            return [(headers, body)]
+        return _split_batch(body, int(headers['batch']))
+
     def ready(self, stdout=sys.stdout):
         stdout.write(PEventListenerDispatcher.READY_FOR_EVENTS_TOKEN)
         stdout.flush()
 
-    def ok(self, stdout=sys.stdout):
-        self.send('OK', stdout)
+    def ok(self, stdout=sys.stdout, serial=None):
+        self.send('OK', stdout, serial)
+
+    def fail(self, stdout=sys.stdout, serial=None):
+        self.send('FAIL', stdout, serial)
 
-    def fail(self, stdout=sys.stdout):
-        self.send('FAIL', stdout)
+    def send_results(self, results, stdout=sys.stdout):
+        """ Answer a batch with one result ('OK' or 'FAIL') per event """
+        self.send('\n'.join(results), stdout)
 
-    def send(self, data, stdout=sys.stdout):
-        resultlen = len(data)
-        result = '%s%s\n%s' % (PEventListenerDispatcher.RESULT_TOKEN_START,
-                               str(resultlen),
-                               data)
-        stdout.write(result)
+    def send(self, data, stdout=sys.stdout, serial=None):
+        stdout.write(_result(data, serial))
         stdout.flush()
 
 listener = EventListenerProtocol()
+
+def _result(data, serial=None):
+    resultlen = len(data)
+    if serial is not None:
+        # tag the result with the serial of the event it answers
+        resultlen = '%s %s' % (resultlen, serial)
+    return '%s%s\n%s' % (PEventListenerDispatcher.RESULT_TOKEN_START,
+                         str(resultlen),
+                         data)
+
+def _split_batch(body, count):
+    events = []
+    for i in range(count):
+        line, body = body.split('\n', 1)
+        headers = get_headers(line)
+        size = int(headers['len'])
+        events.append((headers, body[:size]))
+        body = body[size:]
+    return events
+
+class EventReader:
+    """ Reads the notifications a pool sends to a listener.  It reads
+    whatever has arrived on the file descriptor in one go and parses every
+    complete notification in it, so a listener in a windowed pool handles
+    all the events that are waiting with a single read.  Don't mix it with
+    reads from the same file object: data buffered by either is lost to
+    the other. """
+
+    def __init__(self, stdin=sys.stdin, bufsize=65536):
+        self.fd = stdin.fileno()
+        self.bufsize = bufsize
+        self.chunks = [] # data read and not yet parsed
+        self.size = 0 # their total length
+        self.needed = 1 # bytes to have before it's worth parsing again
+        self.headers = None # headers of a notification not all read yet
+        self.headerlen = 0 # and the length of its header line
+
+    def read(self):
+        """ Wait until at least one complete notification has arrived
+        and return all of them, oldest first.  Each is a list of (headers,
+        payload) tuples: one for an event, one per event for a batch.
+        Raises EOFError when the pool closes the file. """
+        while 1:
+            if self.size >= self.needed:
+                data = ''.join(self.chunks)
+                notifications, pos = self._parse(data)
+                if pos:
+                    data = data[pos:]
+                if data:
+                    self.chunks = [data]
+                else:
+                    self.chunks = []
+                self.size = len(data)
+                if notifications:
+                    return notifications
+            data = os.read(self.fd, self.bufsize)
+            if not data:
+                raise EOFError
+            self.chunks.append(data)
+            self.size += len(data)
+
+    def _parse(self, data):
+        notifications = []
+        pos = 0
+        end = len(data)
+        while pos < end:
+            headers = self.headers
+            if headers is None:
+                eol = data.find('\n', pos)
+                if eol == -1:
+                    self.needed = end - pos + 1
+                    break
+                headers = get_headers(data[pos:eol])
+                headerlen = eol + 1 - pos
+            else:
+                # the header line was parsed when it arrived
+                headerlen = self.headerlen
+            stop = pos + headerlen + int(headers['len'])
+            if stop > end:
+                self.headers = headers
+                self.headerlen = headerlen
+                self.needed = stop - pos
+                break
+            self.headers = None
+            payload = data[pos+headerlen:stop]
+            if headers.has_key('batch'):
+                notifications.append(
+                    _split_batch(payload, int(headers['batch'])))
+            else:
+                notifications.append([(headers, payload)])
+            pos = stop
+        else:
+            self.needed = 1
+        return notifications, pos
+
+class ResultWriter:
+    """ Queues a listener's results and READY tokens and writes them with
+    a single write and flush """
+
+    def __init__(self, stdout=sys.stdout):
+        self.stdout = stdout
+        self.pending = []
+
+    def ready(self):
+        self.pending.append(PEventListenerDispatcher.READY_FOR_EVENTS_TOKEN)
+
+    def ok(self, serial=None):
+        self.send('OK', serial)
+
+    def fail(self, serial=None):
+        self.send('FAIL', serial)
+
+    def send_results(self, results):
+        """ Answer a batch with one result ('OK' or 'FAIL') per event """
+        self.send('\n'.join(results))
+
+    def send(self, data, serial=None):
+        self.pending.append(_result(data, serial))
+
+    def flush(self):
+        if self.pending:
+            self.stdout.write(''.join(self.pending))
+            self.stdout.flush()
+            self.pending = []
+
+def run_listener(handler, stdin=sys.stdin, stdout=sys.stdout, windowed=False):
+    """ Call handler(headers, payload) for each event a pool sends, until
+    the pool closes stdin.  An event is answered with FAIL if handler
+    returns False, and with OK otherwise.  Events that arrive together are
+    handled together and answered with one write; windowed says the pool
+    has a window_size, so READY is sent only once and each result names
+    the serial of its event.  Batches are answered with a result per
+    event. """
+    reader = EventReader(stdin)
+    writer = ResultWriter(stdout)
+    writer.ready()
+    writer.flush()
+    while 1:
+        try:
+            notifications = reader.read()
+        except EOFError:
+            return
+        for events in notifications:
+            results = []
+            for headers, payload in events:
+                if handler(headers, payload) is False:
+                    results.append('FAIL')
+                else:
+                    results.append('OK')
+            if windowed:
+                writer.send(results[0], events[0][0]['serial'])
+            else:
+                writer.send_results(results)
+                writer.ready()
+        writer.flush()
+
+class StandInPool:
+    """ Sends events to a listener the way an EventListenerPool does, so
+    a listener can be benchmarked without a supervisord.  tochild and
+    fromchild are the listener's stdin and stdout, e.g. those of a
+    subprocess.Popen.  Rejected events are counted, not sent again. """
+
+    def __init__(self, tochild, fromchild, window_size=1, batch_size=1,
+                 name='standin'):
+        self.tochild = tochild
+        self.fd = fromchild.fileno()
+        self.window_size = window_size
+        self.batch_size = batch_size
+        self.envelope_header = (
+            'ver:3.0 server:standin serial:%%s pool:%s poolserial:%%s '
+            'eventname:%%s len:%%s\n' % name)
+        self.batch_header = (
+            'ver:3.1 server:standin pool:%s batch:%%s len:%%s\n' % name)
+        self.buffer = ''
+
+    def run(self, events):
+        """ Send events, a list of (event name, payload) tuples, and
+        wait for all of them to be answered.  Returns a dict with the
+        number of events sent and rejected, the seconds it took and the
+        events per second. """
+        envelopes = []
+        for serial, (name, payload) in enumerate(events):
+            envelopes.append(self.envelope_header % (
+                serial, serial, name, len(payload)) + payload)
+        total = len(envelopes)
+        sent = answered = rejected = 0
+        ready = False
+        in_flight = 0
+        started = time.time()
+        while answered < total:
+            if ready and self.window_size > 1:
+                pending = []
+                while in_flight < self.window_size and sent < total:
+                    pending.append(envelopes[sent])
+                    sent += 1
+                    in_flight += 1
+                self._write(''.join(pending))
+            elif ready and sent < total:
+                if self.batch_size > 1:
+                    batch = envelopes[sent:sent+self.batch_size]
+                    body = ''.join(batch)
+                    self._write(self.batch_header % (len(batch), len(body))
+                                + body)
+                else:
+                    batch = envelopes[sent:sent+1]
+                    self._write(batch[0])
+                sent += len(batch)
+                in_flight = len(batch)
+                ready = False
+            reply = self._readReply()
+            if reply is None:
+                ready = True
+                continue
+            lines = reply.split('\n')
+            if self.window_size > 1:
+                count = 1
+            else:
+                count = in_flight
+            if len(lines) == count:
+                rejected += lines.count('FAIL')
+            elif reply == 'FAIL':
+                rejected += count
+            answered += count
+            in_flight -= count
+        seconds = time.time() - started
+        if seconds > 0:
+            rate = total / seconds
+        else:
+            rate = 0.0
+        return {'events': total, 'rejected': rejected, 'seconds': seconds,
+                'per_second': rate}
+
+    def _write(self, data):
+        if data:
+            self.tochild.write(data)
+            self.tochild.flush()
+
+    def _readReply(self):
+        """ Read READY (returned as None) or a result structure """
+        ready = PEventListenerDispatcher.READY_FOR_EVENTS_TOKEN
+        while 1:
+            if self.buffer.startswith(ready):
+                self.buffer = self.buffer[len(ready):]
+                return None
+            eol = self.buffer.find('\n')
+            if eol != -1:
+                line = self.buffer[:eol]
+                if not line.startswith(
+                    PEventListenerDispatcher.RESULT_TOKEN_START):
+                    raise ValueError('bad reply %r' % line)
+                resultlen = int(line.split()[1])
+                stop = eol + 1 + resultlen
+                if len(self.buffer) >= stop:
+                    result = self.buffer[eol+1:stop]
+                    self.buffer = self.buffer[stop:]
+                    return result
+            data = os.read(self.fd, 65536)
+            if not data:
+                raise EOFError
+            self.buffer += data
+
+def subscribe(socketname, events, **settings):
+    """ Subscribe to events over the [unix_event_server] socket of a
+    supervisord.  settings may include buffer_size, window_size and the
+    events_filter_* settings of an [eventlistener:x] section.  Returns
+    (stdin, stdout) file objects to use with listener.wait() and friends
+    in place of sys.stdin and sys.stdout. """
+    tokens = ['events:%s' % ','.join(events)]
+    names = settings.keys()
+    names.sort()
+    for name in names:
+        value = settings[name]
+        if isinstance(value, (list, tuple)):
+            value = ','.join(value)
+        tokens.append('%s:%s' % (name, value))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socketname)
+    stdin = sock.makefile('rb')
+    stdout = sock.makefile('wb')
+    sock.close() # the files keep the connection open
+    stdout.write('SUBSCRIBE %s\n' % ' '.join(tokens))
+    stdout.flush()
+    reply = stdin.readline()
+    if reply != 'OK\n':
+        stdin.close()
+        stdout.close()
+        raise ValueError(reply[len('ERROR '):].strip() or 'disconnected')
+    return stdin, stdout
@@ -1,5 +1,6 @@
 import grp
 import os
+import re
 import pwd
 import signal
 import sys
@@ -58,6 +59,19 @@ def list_of_strings(arg):
     except:
         raise ValueError("not a valid list of strings: " + repr(arg))
 
+def list_of_regexes(arg):
+    """ parse one regular expression per line, e.g. the continuation
+    lines of a config file value, checking that each one compiles """
+    patterns = [x.strip() for x in arg.split('\n')]
+    patterns = [x for x in patterns if x]
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error, why:
+            raise ValueError("not a valid regular expression: %r (%s)" %
+                             (pattern, why))
+    return patterns
+
 def list_of_ints(arg):
     if not arg:
         return []
@@ -155,6 +169,46 @@ def inet_address(s):
         host = DEFAULT_HOST
     return host, port
 
+def healthcheck_spec(value):
+    """ Parse a program's healthcheck setting: tcp://host:port,
+    http://host:port/path or exec:command.  Return None for no check or
+    a tuple beginning with the kind of check. """
+    value = value.strip()
+    if not value or value.lower() == 'none':
+        return None
+    if value.startswith('exec:'):
+        command = value[5:].strip()
+        if not command:
+            raise ValueError("no command in healthcheck %r" % value)
+        return ('exec', command)
+    for kind in ('tcp', 'http'):
+        prefix = kind + '://'
+        if value.startswith(prefix):
+            address = value[len(prefix):]
+            path = '/'
+            if '/' in address:
+                if kind == 'tcp':
+                    raise ValueError("a tcp healthcheck has no path: %r" %
+                                     value)
+                address, path = address.split('/', 1)
+                path = '/' + path
+            host, port = inet_address(address)
+            if not host:
+                host = '127.0.0.1'
+            try:
+                # supervisord probes from its mainloop, where a DNS
+                # lookup would block everything else
+                socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM, 0,
+                                   socket.AI_NUMERICHOST)
+            except socket.gaierror:
+                raise ValueError("a healthcheck host must be an IP "
+                                 "address: %r" % value)
+            if kind == 'tcp':
+                return ('tcp', host, port)
+            return ('http', host, port, path)
+    raise ValueError("healthcheck must begin with tcp://, http:// or "
+                     "exec: %r" % value)
+
 class SocketAddress:
     def __init__(self, s):
         # returns (family, address) tuple
@@ -1,4 +1,6 @@
 import errno
+import re
+import time
 from supervisor.medusa.asyncore_25 import compact_traceback
 
 from supervisor.events import notify
@@ -6,6 +8,7 @@ from supervisor.events import EventRejectedEvent
 from supervisor.events import ProcessLogStderrEvent
 from supervisor.events import ProcessLogStdoutEvent
 from supervisor.states import EventListenerStates
+from supervisor.states import getEventListenerStateDescription
 from supervisor import loggers
 
 def find_prefix_at_end(haystack, needle):
@@ -118,6 +121,22 @@ class POutputDispatcher(PDispatcher):
         self.log_to_mainlog = config.options.loglevel <= self.mainlog_level
         self.stdout_events_enabled = config.stdout_events_enabled
         self.stderr_events_enabled = config.stderr_events_enabled
+        self.ansi_stripper = ANSIEscapeStripper()
+
+        # log events are coalesced into complete lines when a flush
+        # latency is configured, see _log_event
+        self.events_flush_ms = getattr(config, '%s_events_flush_ms' % channel)
+        self.events_max_bytes = getattr(config,
+                                        '%s_events_max_bytes' % channel)
+        self.events_buffer = '' # output not yet sent as a log event
+        self.events_deadline = None # when events_buffer must be sent
+
+        drop = getattr(config, '%s_filter_drop' % channel)
+        keep = getattr(config, '%s_filter_keep' % channel)
+        if drop or keep:
+            self.output_filter = OutputFilter(drop, keep)
+        else:
+            self.output_filter = None
 
     def removelogs(self):
         for log in (self.mainlog, self.capturelog):
@@ -136,7 +155,31 @@ class POutputDispatcher(PDispatcher):
         if data:
             config = self.process.config
             if config.options.strip_ansi:
-                data = stripEscapes(data)
+                data = self.ansi_stripper.strip(data)
+                if not data:
+                    # only the start of an escape sequence, wait for the rest
+                    return
+            if self.output_filter is not None and not self.capturemode:
+                # captured data is a payload for a PROCESS_COMMUNICATION
+                # event, not lines of output
+                data = self._filter(data)
+            self._log_filtered(data)
+
+    def _filter(self, data, final=False):
+        data, lines, bytes = self.output_filter.filter(data, final)
+        if lines:
+            self.process.dropped_lines += lines
+            self.process.dropped_bytes += bytes
+        return data
+
+    def flush_output_filter(self):
+        """ Log an incomplete last line held back by the output filter """
+        if self.output_filter is not None:
+            self._log_filtered(self._filter('', final=True))
+
+    def _log_filtered(self, data):
+        if data:
+            config = self.process.config
             if self.childlog:
                 self.childlog.info(data)
             if self.log_to_mainlog:
@@ -144,18 +187,65 @@ class POutputDispatcher(PDispatcher):
                 config.options.logger.log(
                     self.mainlog_level, msg, name=config.name,
                     channel=self.channel, data=data)
+            listeners = self.process.output_listeners
+            if listeners:
+                for listener in listeners[:]:
+                    listener(self.process, self.channel, data)
             if self.channel == 'stdout':
                 if self.stdout_events_enabled:
-                    notify(
-                        ProcessLogStdoutEvent(self.process,
-                            self.process.pid, data)
-                    )
+                    self._log_event(data)
             else: # channel == stderr
                 if self.stderr_events_enabled:
-                    notify(
-                        ProcessLogStderrEvent(self.process,
-                            self.process.pid, data)
-                    )
+                    self._log_event(data)
+
+    def _log_event(self, data):
+        if not self.events_flush_ms:
+            # one event per read
+            self._notify_log_event(data)
+            return
+
+        if not self.events_buffer:
+            self.events_deadline = (time.time() +
+                                    self.events_flush_ms / 1000.0)
+        self.events_buffer += data
+        if (self.events_max_bytes and
+            len(self.events_buffer) >= self.events_max_bytes):
+            self._flush_log_event(lines_only=True)
+
+    def _flush_log_event(self, lines_only):
+        data = self.events_buffer
+        rest = ''
+        if lines_only:
+            pos = data.rfind('\n') + 1
+            if pos:
+                # hold back a trailing partial line; if there is no
+                # newline at all, the line is too long to wait for
+                data, rest = data[:pos], data[pos:]
+        self.events_buffer = rest
+        if rest:
+            self.events_deadline = (time.time() +
+                                    self.events_flush_ms / 1000.0)
+        else:
+            self.events_deadline = None
+        self._notify_log_event(data)
+
+    def _notify_log_event(self, data):
+        if self.channel == 'stdout':
+            event = ProcessLogStdoutEvent(self.process, self.process.pid, data)
+        else:
+            event = ProcessLogStderrEvent(self.process, self.process.pid, data)
+        notify(event)
+
+    def flush_log_events(self, now=None):
+        """ Send output held back for coalescing as a log event once it
+        has waited for the configured latency.  If now is None, send
+        everything that is buffered, e.g. because the process exited. """
+        if not self.events_buffer:
+            return
+        if now is None:
+            self._flush_log_event(lines_only=False)
+        elif now >= self.events_deadline:
+            self._flush_log_event(lines_only=True)
 
     def record_output(self):
         if self.capturelog is None:
@@ -233,6 +323,8 @@ class POutputDispatcher(PDispatcher):
             # if we get no data back from the pipe, it means that the
             # child process has ended.  See
             # mail.python.org/pipermail/python-dev/2004-August/046850.html
+            self.flush_output_filter()
+            self.flush_log_events()
             self.close()
 
 class PEventListenerDispatcher(PDispatcher):
@@ -254,10 +346,20 @@ class PEventListenerDispatcher(PDispatcher):
         # "busy" state that implies we're awaiting a READY_FOR_EVENTS_TOKEN
         self.process.listener_state = EventListenerStates.ACKNOWLEDGED
         self.process.event = None
-        self.result = ''
+        self.process.batch = None
+        if self.process.window is not None:
+            self.process.window = []
+        self.resultchunks = [] # the parts of a result read so far
+        self.resultreceived = 0 # the number of bytes in resultchunks
         self.resultlen = None
+        self.resultserial = None
+        self.line_scanned = 0 # state_buffer bytes searched for a LF
         self.channel = channel
         self.fd = fd
+        self.ansi_stripper = ANSIEscapeStripper()
+        self.mainlog_level = loggers.LevelsByName.DEBG
+        config = self.process.config
+        self.log_to_mainlog = config.options.loglevel <= self.mainlog_level
 
         logfile = getattr(process.config, '%s_logfile' % channel)
 
@@ -296,14 +398,17 @@ class PEventListenerDispatcher(PDispatcher):
         data = self.process.config.options.readfd(self.fd)
         if data:
             self.state_buffer += data
-            procname = self.process.config.name
-            msg = '%r %s output:\n%s' % (procname, self.channel, data)
-            self.process.config.options.logger.debug(msg)
+            if self.log_to_mainlog:
+                msg = '%(name)r %(channel)s output:\n%(data)s'
+                self.process.config.options.logger.log(
+                    self.mainlog_level, msg, name=self.process.config.name,
+                    channel=self.channel, data=data)
 
             if self.childlog:
                 if self.process.config.options.strip_ansi:
-                    data = stripEscapes(data)
-                self.childlog.info(data)
+                    data = self.ansi_stripper.strip(data)
+                if data:
+                    self.childlog.info(data)
         else:
             # if we get no data back from the pipe, it means that the
             # child process has ended.  See
@@ -320,108 +425,190 @@ class PEventListenerDispatcher(PDispatcher):
 
         process = self.process
         procname = process.config.name
-        state = process.listener_state
-
-        if state == EventListenerStates.UNKNOWN:
-            # this is a fatal state
-            self.state_buffer = ''
-            return
+        logger = process.config.options.logger
+        pos = 0 # offset of the first byte of data not yet consumed
+        end = len(data)
+        scanned = self.line_scanned
+        self.line_scanned = 0
+
+        # each pass consumes at most one protocol step and then looks at
+        # the rest of the data in the light of the listener's new state;
+        # state_buffer is only cut down once, after the last step
+        while pos < end:
+            state = process.listener_state
+
+            if state == EventListenerStates.UNKNOWN:
+                # this is a fatal state
+                pos = end
+
+            elif state == EventListenerStates.ACKNOWLEDGED:
+                if end - pos < self.READY_FOR_EVENTS_LEN:
+                    # not enough info to make a decision
+                    break
+                elif data.startswith(self.READY_FOR_EVENTS_TOKEN, pos):
+                    logger.debug('%(name)s: ACKNOWLEDGED -> READY',
+                                 name=procname)
+                    process.listener_state = EventListenerStates.READY
+                    pos += self.READY_FOR_EVENTS_LEN
+                    process.event = None
+                    self._listener_ready()
+                else:
+                    logger.debug('%(name)s: ACKNOWLEDGED -> UNKNOWN',
+                                 name=procname)
+                    process.listener_state = EventListenerStates.UNKNOWN
+                    pos = end
+                    process.event = None
 
-        if state == EventListenerStates.ACKNOWLEDGED:
-            if len(data) < self.READY_FOR_EVENTS_LEN:
-                # not enough info to make a decision
-                return
-            elif data.startswith(self.READY_FOR_EVENTS_TOKEN):
-                msg = '%s: ACKNOWLEDGED -> READY' % procname
-                process.config.options.logger.debug(msg)
-                process.listener_state = EventListenerStates.READY
-                tokenlen = self.READY_FOR_EVENTS_LEN
-                self.state_buffer = self.state_buffer[tokenlen:]
-                process.event = None
-            else:
-                msg = '%s: ACKNOWLEDGED -> UNKNOWN' % procname
-                process.config.options.logger.debug(msg)
+            elif state == EventListenerStates.READY and not process.window:
+                # the process sent some spurious data, be a hardass about it
+                logger.debug('%(name)s: READY -> UNKNOWN', name=procname)
                 process.listener_state = EventListenerStates.UNKNOWN
-                self.state_buffer = ''
+                pos = end
                 process.event = None
-            if self.state_buffer:
-                # keep going til its too short
-                self.handle_listener_state_change()
-            else:
-                return
-
-        elif state == EventListenerStates.READY:
-            # the process sent some spurious data, be a hardass about it
-            msg = '%s: READY -> UNKNOWN' % procname
-            process.config.options.logger.debug(msg)
-            process.listener_state = EventListenerStates.UNKNOWN
-            self.state_buffer = ''
-            process.event = None
-            return
-
-        elif state == EventListenerStates.BUSY:
-            if self.resultlen is None:
-                # we haven't begun gathering result data yet
-                pos = data.find('\n')
-                if pos == -1:
-                    # we can't make a determination yet, we dont have a full
-                    # results line
-                    return
-
-                result_line = self.state_buffer[:pos]
-                self.state_buffer = self.state_buffer[pos+1:] # rid LF
-                resultlen = result_line[self.RESULT_TOKEN_START_LEN:]
-                try:
-                    self.resultlen = int(resultlen)
-                except ValueError:
-                    msg = ('%s: BUSY -> UNKNOWN (bad result line %r)'
-                           % (procname, result_line))
-                    process.config.options.logger.debug(msg)
-                    process.listener_state = EventListenerStates.UNKNOWN
-                    self.state_buffer = ''
-                    notify(EventRejectedEvent(process, process.event))
-                    process.event = None
-                    return
 
             else:
-                needed = self.resultlen - len(self.result)
-
+                # BUSY, or READY with windowed events awaiting their results
+                if self.resultlen is None:
+                    # we haven't begun gathering result data yet
+                    eol = data.find('\n', pos + scanned)
+                    if eol == -1:
+                        # we can't make a determination yet, we dont have a
+                        # full results line; don't search the part we've
+                        # seen again when more data arrives
+                        self.line_scanned = end - pos
+                        break
+
+                    result_line = data[pos:eol]
+                    pos = eol + 1 # rid LF
+                    scanned = 0
+                    resultargs = result_line[self.RESULT_TOKEN_START_LEN:]
+                    resultargs = resultargs.split()
+                    try:
+                        self.resultlen = int(resultargs[0])
+                        if process.window is not None:
+                            # a windowed result names the serial of its event
+                            self.resultserial = resultargs[1]
+                            if self._window_index(self.resultserial) is None:
+                                raise ValueError(self.resultserial)
+                    except (ValueError, IndexError):
+                        logger.debug(
+                            '%(name)s: %(state)s -> UNKNOWN '
+                            '(bad result line %(line)r)', name=procname,
+                            state=getEventListenerStateDescription(state),
+                            line=result_line)
+                        process.listener_state = EventListenerStates.UNKNOWN
+                        pos = end
+                        self._reject(self._in_flight())
+                        process.event = None
+                        process.batch = None
+                        if process.window is not None:
+                            process.window = []
+                        self._clear_result()
+                        break
+
+                needed = self.resultlen - self.resultreceived
                 if needed:
-                    self.result += self.state_buffer[:needed]
-                    self.state_buffer = self.state_buffer[needed:]
-                    needed = self.resultlen - len(self.result)
-
-                if not needed:
-                    self.handle_result(self.result)
-                    self.process.event = None
-                    self.result = ''
-                    self.resultlen = None
-
-            if self.state_buffer:
-                # keep going til its too short
-                self.handle_listener_state_change()
-            else:
-                return
-
-    def handle_result(self, result):
+                    chunk = data[pos:pos + needed]
+                    pos += len(chunk)
+                    self.resultchunks.append(chunk)
+                    self.resultreceived += len(chunk)
+                    if self.resultreceived < self.resultlen:
+                        break
+
+                result = ''.join(self.resultchunks)
+                serial = self.resultserial
+                self._clear_result()
+                self.handle_result(result, serial)
+                self.process.event = None
+                self.process.batch = None
+
+        if pos:
+            self.state_buffer = data[pos:]
+
+    def _clear_result(self):
+        self.resultchunks = []
+        self.resultreceived = 0
+        self.resultlen = None
+        self.resultserial = None
+
+    def _in_flight(self):
+        """ The events sent to the listener which it hasn't answered """
+        if self.process.window is not None:
+            return self.process.window
+        if self.process.batch is not None:
+            return self.process.batch
+        return [self.process.event]
+
+    def _window_index(self, serial):
+        for i, event in enumerate(self.process.window):
+            if str(event.serial) == serial:
+                return i
+        return None
+
+    def _reject(self, events):
+        # each rejected event is rebuffered at the head of the pool's
+        # buffer, so reject them newest first to keep them in order
+        for event in reversed(events):
+            notify(EventRejectedEvent(self.process, event))
+
+    def handle_result(self, result, serial=None):
         process = self.process
         procname = process.config.name
-
-        try:
-            self.process.group.config.result_handler(process.event, result)
-            msg = '%s: BUSY -> ACKNOWLEDGED (processed)' % procname
-            process.listener_state = EventListenerStates.ACKNOWLEDGED
-        except RejectEvent:
-            msg = '%s: BUSY -> ACKNOWLEDGED (rejected)' % procname
-            process.listener_state = EventListenerStates.ACKNOWLEDGED
-            notify(EventRejectedEvent(process, process.event))
-        except:
-            msg = '%s: BUSY -> UNKNOWN' % procname
-            process.listener_state = EventListenerStates.UNKNOWN
-            notify(EventRejectedEvent(process, process.event))
-
+        result_handler = process.group.config.result_handler
+        before = getEventListenerStateDescription(process.listener_state)
+        after = EventListenerStates.ACKNOWLEDGED
+
+        if process.window is not None:
+            # a windowed listener answers one event at a time and needn't
+            # say READY again before it is sent the next one
+            events = [process.window.pop(self._window_index(serial))]
+            after = EventListenerStates.READY
+        else:
+            events = self._in_flight()
+        results = [result]
+        if len(events) > 1:
+            # a batch may be answered with one result line per event, or
+            # with one result for all of them
+            results = result.split('\n')
+            if len(results) != len(events):
+                results = [result] * len(events)
+
+        afterdesc = getEventListenerStateDescription(after)
+        msg = '%s: %s -> %s (processed)' % (procname, before, afterdesc)
+        process.listener_state = after
+        rejected = []
+
+        for event, event_result in zip(events, results):
+            try:
+                result_handler(event, event_result)
+            except RejectEvent:
+                if process.listener_state != EventListenerStates.UNKNOWN:
+                    msg = '%s: %s -> %s (rejected)' % (procname, before,
+                                                       afterdesc)
+                rejected.append(event)
+            except:
+                msg = '%s: %s -> UNKNOWN' % (procname, before)
+                process.listener_state = EventListenerStates.UNKNOWN
+                rejected.append(event)
+
+        if process.listener_state == EventListenerStates.UNKNOWN:
+            # no more results will be read from this listener
+            if process.window:
+                rejected.extend(process.window)
+                process.window = []
+        if process.group is not None:
+            process.group.listener_answered(process, events)
+        self._reject(rejected)
+        if process.listener_state == EventListenerStates.READY:
+            self._listener_ready()
         process.config.options.logger.debug(msg)
 
+    def _listener_ready(self):
+        # queue the listener in its pool, which sends the next event to
+        # the listener that has been ready longest
+        if self.process.group is not None:
+            self.process.group.listener_ready(self.process)
+
 class PInputDispatcher(PDispatcher):
     """ Input (stdin) dispatcher """
     process = None # process which "owns" this dispatcher
@@ -459,31 +646,176 @@ class PInputDispatcher(PDispatcher):
                 else:
                     raise
 
+class PNotifyDispatcher(PDispatcher):
+    """ Reads what a process writes to its notify pipe (see the
+    notify_ready program setting): newline separated VAR=value
+    assignments like the ones sd_notify sends.  Only READY=1 means
+    anything to us; the rest is ignored. """
+    process = None # process which "owns" this dispatcher
+    channel = None # 'notify'
+    notify_buffer = '' # an assignment not yet ended by a newline
+
+    READY_TOKEN = 'READY=1'
+    MAX_LINE = 4096 # longest partial assignment we keep
+
+    def __init__(self, process, channel, fd):
+        self.process = process
+        self.channel = channel
+        self.fd = fd
+        self.notify_buffer = ''
+
+    def readable(self):
+        if self.closed:
+            return False
+        return True
+
+    def writable(self):
+        return False
+
+    def handle_read_event(self):
+        data = self.process.config.options.readfd(self.fd)
+        if not data:
+            # the child has closed the pipe or ended
+            self.close()
+            return
+        lines = (self.notify_buffer + data).split('\n')
+        self.notify_buffer = lines.pop()[-self.MAX_LINE:]
+        if self.notify_buffer == self.READY_TOKEN:
+            # READY=1 written without a newline, as sd_notify does
+            lines.append(self.notify_buffer)
+            self.notify_buffer = ''
+        for line in lines:
+            if line.strip() == self.READY_TOKEN:
+                self.process.report_ready()
+
 ANSI_ESCAPE_BEGIN = '\x1b['
 ANSI_TERMINATORS = ('H', 'f', 'A', 'B', 'C', 'D', 'R', 's', 'u', 'J',
                     'K', 'h', 'l', 'p', 'm')
+ANSI_ESCAPE_MAXLEN = 64 # longest partial escape held back between chunks
+
+_terminators = ''.join(ANSI_TERMINATORS)
+# an escape runs from ESC[ up to and including the first terminator, or
+# to the end of the string if no terminator follows it
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[^%s]*(?:[%s]|\Z)' % (_terminators,
+                                                           _terminators))
+ANSI_PARTIAL_ESCAPE_RE = re.compile(r'\x1b(?:\[[^%s]*)?\Z' % _terminators)
+del _terminators
 
 def stripEscapes(string):
     """
     Remove all ANSI color escapes from the given string.
     """
-    result = ''
-    show = 1
-    i = 0
-    L = len(string)
-    while i < L:
-        if show == 0 and string[i] in ANSI_TERMINATORS:
-            show = 1
-        elif show:
-            n = string.find(ANSI_ESCAPE_BEGIN, i)
-            if n == -1:
-                return result + string[i:]
+    if ANSI_ESCAPE_BEGIN not in string:
+        return string
+    return ANSI_ESCAPE_RE.sub('', string)
+
+class ANSIEscapeStripper:
+    """ Removes ANSI escapes from a stream of output chunks.  An escape
+    sequence split across two reads is held back until the rest of it
+    arrives, so it is stripped as a whole. """
+
+    def __init__(self):
+        self.pending = '' # start of an escape seen at the end of a chunk
+
+    def strip(self, data):
+        if self.pending:
+            data = self.pending + data
+            self.pending = ''
+        pos = data.rfind('\x1b')
+        if pos == -1:
+            return data
+        if len(data) - pos <= ANSI_ESCAPE_MAXLEN:
+            if ANSI_PARTIAL_ESCAPE_RE.match(data, pos) is not None:
+                self.pending = data[pos:]
+                data = data[:pos]
+        return stripEscapes(data)
+
+class PTriggerDispatcher(PDispatcher):
+    """ Dispatcher for the read end of a pipe which makes the mainloop's
+    select return immediately, rather than after its timeout, when
+    trigger() is called.  The owner (e.g. an event listener pool) does
+    its work in its transition(), which runs later in the same mainloop
+    iteration. """
+
+    channel = 'trigger'
+
+    def __init__(self, owner):
+        self.process = owner # for __repr__ and handle_error
+        self.options = owner.config.options
+        self.fd, self.trigger_fd = self.options.make_trigger()
+        self.triggered = False
+
+    def readable(self):
+        return not self.closed
+
+    def writable(self):
+        return False
+
+    def trigger(self):
+        if self.triggered or self.closed:
+            # one byte in the pipe is enough to wake up select
+            return
+        self.triggered = True
+        try:
+            self.options.write(self.trigger_fd, 'x')
+        except OSError, why:
+            if why[0] != errno.EAGAIN:
+                raise
+
+    def handle_read_event(self):
+        self.options.readfd(self.fd)
+        self.triggered = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.options.close_fd(self.fd)
+            self.options.close_fd(self.trigger_fd)
+
+class OutputFilter:
+    """ Filters a stream of output chunks line by line.  A line is dropped
+    if it matches any of the drop patterns, or if there are keep patterns
+    and it matches none of them.  An incomplete line at the end of a chunk
+    is held back until the rest of it arrives. """
+
+    maxline = 1 << 16 # longest incomplete line held back
+
+    def __init__(self, drop=(), keep=()):
+        # all patterns of a list are tried in a single search
+        self.drop = self.keep = None
+        if drop:
+            self.drop = re.compile('|'.join(['(?:%s)' % x for x in drop]))
+        if keep:
+            self.keep = re.compile('|'.join(['(?:%s)' % x for x in keep]))
+        self.pending = '' # incomplete line seen at the end of a chunk
+
+    def filter(self, data, final=False):
+        """ Return a tuple of (kept data, lines dropped, bytes dropped).
+        If final is true, any incomplete line is filtered too. """
+        if self.pending:
+            data = self.pending + data
+            self.pending = ''
+        end = data.rfind('\n') + 1
+        if not final and len(data) - end < self.maxline:
+            self.pending = data[end:]
+        else:
+            end = len(data)
+
+        drop, keep = self.drop, self.keep
+        kept = []
+        lines = bytes = 0
+        start = 0
+        while start < end:
+            stop = data.find('\n', start, end) + 1 or end
+            line = data[start:stop]
+            if ((keep is not None and keep.search(line) is None) or
+                (drop is not None and drop.search(line) is not None)):
+                lines += 1
+                bytes += len(line)
             else:
-                result = result + string[i:n]
-                i = n
-                show = 0
-        i = i + 1
-    return result
+                kept.append(line)
+            start = stop
+        return ''.join(kept), lines, bytes
 
 class RejectEvent(Exception):
     """ The exception type expected by a dispatcher when a handler wants
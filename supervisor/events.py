@@ -1,9 +1,13 @@
 from supervisor.states import getProcessStateDescription
+from supervisor.states import getHealthStateDescription
 
 callbacks = []
 
 def subscribe(type, callback):
     callbacks.append((type, callback))
+
+def unsubscribe(type, callback):
+    callbacks.remove((type, callback))
     
 def notify(event):
     for type, callback in callbacks:
@@ -151,6 +155,30 @@ class ProcessStateStoppedEvent(ProcessStateEvent):
     def get_extra_values(self):
         return [('pid', self.process.pid)]
 
+class ProcessHealthEvent(Event):
+    """ Abstract class, never raised directly """
+    def __init__(self, process, from_state):
+        self.process = process
+        self.from_state = from_state
+        self.pid = process.pid
+
+    def __str__(self):
+        groupname = ''
+        if self.process.group is not None:
+            groupname = self.process.group.config.name
+        L = []
+        L.append(('processname',  self.process.config.name))
+        L.append(('groupname', groupname))
+        L.append(('from_state', getHealthStateDescription(self.from_state)))
+        L.append(('pid', self.pid))
+        return ' '.join( [ '%s:%s' % (name, val) for (name, val) in L ] )
+
+class ProcessHealthHealthyEvent(ProcessHealthEvent):
+    pass
+
+class ProcessHealthUnhealthyEvent(ProcessHealthEvent):
+    pass
+
 class TickEvent(Event):
     """ Abstract """
     def __init__(self, when, supervisord):
@@ -171,6 +199,30 @@ class Tick3600Event(TickEvent):
 
 TICK_EVENTS = [ Tick5Event, Tick60Event, Tick3600Event ] # imported elsewhere
 
+class EventPoolStatsEvent(Event):
+    """ Sent by each event listener pool every 60 seconds """
+    def __init__(self, pool_name, stats):
+        self.pool_name = pool_name
+        self.stats = stats # a snapshot, see EventListenerPool.get_metrics
+
+    def __str__(self):
+        stats = self.stats
+        tokens = ['poolname:%s' % self.pool_name]
+        for key in ('depth', 'overflows', 'rejected', 'rebuffered'):
+            tokens.append('%s:%s' % (key, stats[key]))
+        for kind in ('enqueue', 'result'):
+            latency = stats['%s_latency' % kind]
+            tokens.append('%s_count:%s' % (kind, latency['count']))
+            for key in ('mean_ms', 'p50_ms', 'p99_ms', 'max_ms'):
+                tokens.append('%s_%s:%.3f' % (kind, key, latency[key]))
+        for prefix, key in (('rate', 'rates'), ('busy', 'busy')):
+            values = stats[key]
+            names = values.keys()
+            names.sort()
+            for name in names:
+                tokens.append('%s.%s:%.3f' % (prefix, name, values[name]))
+        return ' '.join(tokens)
+
 class EventTypes:
     EVENT = Event # abstract
     PROCESS_STATE = ProcessStateEvent # abstract
@@ -182,6 +234,9 @@ class EventTypes:
     PROCESS_STATE_FATAL = ProcessStateFatalEvent
     PROCESS_STATE_RUNNING = ProcessStateRunningEvent
     PROCESS_STATE_UNKNOWN = ProcessStateUnknownEvent
+    PROCESS_HEALTH = ProcessHealthEvent # abstract
+    PROCESS_HEALTH_HEALTHY = ProcessHealthHealthyEvent
+    PROCESS_HEALTH_UNHEALTHY = ProcessHealthUnhealthyEvent
     PROCESS_COMMUNICATION = ProcessCommunicationEvent # abstract
     PROCESS_COMMUNICATION_STDOUT = ProcessCommunicationStdoutEvent
     PROCESS_COMMUNICATION_STDERR = ProcessCommunicationStderrEvent
@@ -196,11 +251,19 @@ class EventTypes:
     TICK_5 = Tick5Event
     TICK_60 = Tick60Event
     TICK_3600 = Tick3600Event
+    EVENT_POOL_STATS = EventPoolStatsEvent
+
+_eventNames = {} # cache for getEventNameByType, keyed by event type
 
 def getEventNameByType(requested):
-    for name, typ in EventTypes.__dict__.items():
-        if typ is requested:
-            return name
+    try:
+        return _eventNames[requested]
+    except KeyError:
+        for name, typ in EventTypes.__dict__.items():
+            if typ is requested:
+                _eventNames[requested] = name
+                return name
 
 def register(name, event):
     EventTypes.__dict__[name] = event
+    _eventNames.clear()
@@ -0,0 +1,307 @@
+""" A UNIX domain socket server which lets programs that supervisord did
+not start subscribe to events.
+
+A subscriber connects and sends a single line::
+
+  SUBSCRIBE events:PROCESS_STATE,TICK_60 events_filter_groups:web
+
+naming the event types it wants and, optionally, the buffer_size,
+window_size and events_filter_* settings of an ``[eventlistener:x]``
+section.  supervisord answers ``OK`` (or ``ERROR <reason>`` and hangs up)
+and from then on treats the subscriber as the only listener of an event
+listener pool of its own: the subscriber says READY, is sent events with
+the same envelope and serials a pool listener gets, and answers each one
+with a RESULT.  Events are buffered, and rejected ones sent again,
+exactly as they are for a pool. """
+
+import errno
+import os
+import pwd
+import socket
+
+from supervisor.medusa import asyncore_25 as asyncore
+from supervisor.medusa.asyncore_25 import compact_traceback
+
+from supervisor import events
+from supervisor.datatypes import boolean
+from supervisor.datatypes import integer
+from supervisor.datatypes import list_of_strings
+from supervisor.dispatchers import PEventListenerDispatcher
+from supervisor.dispatchers import default_handler
+from supervisor.options import EventListenerPoolConfig
+from supervisor.states import EventListenerStates
+from supervisor.states import ProcessStates
+
+SUBSCRIBE_TOKEN = 'SUBSCRIBE '
+MAX_SUBSCRIBE_LEN = 4096 # longest subscription line we will wait for
+
+class EventServer(asyncore.dispatcher):
+    """ Accepts subscriber connections on the [unix_event_server] socket """
+
+    def __init__(self, options, socketname, sockchmod, sockchown):
+        asyncore.dispatcher.__init__(self)
+        self.options = options
+        self.socketname = socketname
+        self.subscribers = [] # connected EventSubscriber instances
+        self.connections = 0 # number of subscribers accepted so far
+        if os.path.exists(socketname):
+            if self.checkused(socketname):
+                # cooperate with 'openeventserver' in supervisord
+                raise socket.error(errno.EADDRINUSE)
+            # stale socket from a supervisord which didn't clean up
+            os.unlink(socketname)
+        self.create_socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.bind(socketname)
+            os.chmod(socketname, sockchmod)
+            try:
+                os.chown(socketname, sockchown[0], sockchown[1])
+            except OSError, why:
+                if why[0] == errno.EPERM:
+                    raise ValueError(
+                        'Not permitted to chown %s to uid/gid %s; adjust '
+                        '"chown" value in [unix_event_server] to values that '
+                        'the current user (%s) can successfully chown' % (
+                        socketname, repr(sockchown),
+                        pwd.getpwuid(os.geteuid())[0]))
+                raise
+            self.listen(5)
+        except:
+            self.close()
+            raise
+
+    def checkused(self, socketname):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(socketname)
+        except socket.error:
+            return False
+        s.close()
+        return True
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return False
+
+    def handle_accept(self):
+        try:
+            accepted = self.accept()
+        except socket.error:
+            # the client hung up before we got to it
+            return
+        if accepted is None:
+            return
+        conn, addr = accepted
+        self.connections += 1
+        name = 'subscriber-%s' % self.connections
+        self.subscribers.append(EventSubscriber(self, conn, name))
+        self.options.logger.info('event subscriber %s connected' % name)
+
+    def handle_error(self):
+        nil, t, v, tbinfo = compact_traceback()
+        self.options.logger.critical(
+            'uncaptured python exception in event server (%s:%s %s)' % (
+            t, v, tbinfo))
+
+    def remove(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+    def transition(self):
+        """ Send each subscriber the events waiting in its pool """
+        for subscriber in self.subscribers[:]:
+            if subscriber.group is not None:
+                subscriber.group.transition()
+
+    def get_dispatchers(self):
+        """ The mainloop dispatchers of the subscribers' pools; the
+        subscribers' sockets are in the asyncore socket map """
+        dispatchers = {}
+        for subscriber in self.subscribers:
+            if subscriber.group is not None:
+                dispatchers.update(subscriber.group.get_dispatchers())
+        return dispatchers
+
+    def close(self):
+        for subscriber in self.subscribers[:]:
+            subscriber.close()
+        asyncore.dispatcher.close(self)
+
+class SubscriberConfig:
+    """ The parts of a process config an event listener dispatcher reads """
+    stdout_logfile = None
+    stderr_logfile = None
+
+    def __init__(self, options, name):
+        self.options = options
+        self.name = name
+
+class EventSubscriber(asyncore.dispatcher):
+    """ A connection from a subscriber.  Once it has subscribed it stands
+    in for a listener process in its EventListenerPool. """
+
+    # the process attributes an EventListenerPool and the listener
+    # dispatcher use
+    state = ProcessStates.RUNNING
+    listener_state = EventListenerStates.ACKNOWLEDGED
+    event = None
+    batch = None
+    window = None
+    group = None # the subscriber's EventListenerPool, once it subscribed
+    dispatchers = {} # its socket is in the asyncore socket map instead
+    healthcheck = None
+    closed = False
+
+    def __init__(self, server, sock, name):
+        asyncore.dispatcher.__init__(self, sock)
+        self.server = server
+        self.config = SubscriberConfig(server.options, name)
+        self.input_buffer = '' # a subscription line still being read
+        self.output_buffer = '' # data not yet sent to the subscriber
+        self.listener = None # parses the subscriber's READY and RESULTs
+
+    def get_state(self):
+        return self.state
+
+    def transition(self):
+        pass
+
+    def write(self, chars):
+        if self.closed:
+            raise OSError(errno.EPIPE, 'Subscriber has disconnected')
+        self.output_buffer += chars
+
+    def readable(self):
+        return not self.closed
+
+    def writable(self):
+        return bool(self.output_buffer) and not self.closed
+
+    def handle_write(self):
+        try:
+            sent = self.send(self.output_buffer)
+        except socket.error, why:
+            if why[0] not in (errno.EPIPE, errno.ECONNRESET):
+                raise
+            self.close()
+            return
+        self.output_buffer = self.output_buffer[sent:]
+
+    def handle_read(self):
+        data = self.recv(4096)
+        if not data:
+            return
+        if self.listener is None:
+            self.input_buffer += data
+            eol = self.input_buffer.find('\n')
+            if eol == -1:
+                if len(self.input_buffer) > MAX_SUBSCRIBE_LEN:
+                    self.refuse('subscription line too long')
+                return
+            line = self.input_buffer[:eol]
+            data = self.input_buffer[eol+1:]
+            self.input_buffer = ''
+            try:
+                self.subscribe(line)
+            except ValueError, why:
+                self.refuse(why[0])
+                return
+            self.output_buffer += 'OK\n'
+            if not data:
+                return
+        self.listener.state_buffer += data
+        self.listener.handle_listener_state_change()
+
+    def subscribe(self, line):
+        """ Make the pool described by a SUBSCRIBE line """
+        if not line.startswith(SUBSCRIBE_TOKEN):
+            raise ValueError('expected %s' % SUBSCRIBE_TOKEN.strip())
+        settings = {}
+        for token in line[len(SUBSCRIBE_TOKEN):].split():
+            if not ':' in token:
+                raise ValueError('bad token %s' % token)
+            key, value = token.split(':', 1)
+            settings[key] = value
+        name = self.config.name
+
+        event_names = list_of_strings(settings.pop('events', ''))
+        if not event_names:
+            raise ValueError('no events')
+        pool_events = []
+        for event_name in event_names:
+            event_type = getattr(events.EventTypes, event_name.upper(), None)
+            if event_type is None:
+                raise ValueError('unknown event type %s' % event_name)
+            if not event_type in pool_events:
+                pool_events.append(event_type)
+
+        buffer_size = integer(settings.pop('buffer_size', 10))
+        window_size = integer(settings.pop('window_size', 1))
+        if buffer_size < 1 or window_size < 1:
+            raise ValueError('buffer_size and window_size must be at least 1')
+        filter_processes = list_of_strings(
+            settings.pop('events_filter_processes', None))
+        filter_groups = list_of_strings(
+            settings.pop('events_filter_groups', None))
+        filter_expected = settings.pop('events_filter_expected', None)
+        if filter_expected is not None:
+            filter_expected = boolean(filter_expected)
+        if settings:
+            unknown = settings.keys()
+            unknown.sort()
+            raise ValueError('unknown setting %s' % unknown[0])
+
+        config = EventListenerPoolConfig(
+            self.config.options, name, 0, [], buffer_size, pool_events,
+            default_handler, window_size=window_size,
+            filter_processes=filter_processes, filter_groups=filter_groups,
+            filter_expected=filter_expected)
+        pool = config.make_group()
+        pool.processes = {name:self}
+        self.group = pool
+        if window_size > 1:
+            self.window = []
+        self.listener = PEventListenerDispatcher(self, 'stdout', None)
+        self.config.options.logger.info(
+            'event subscriber %s subscribed to %s' % (
+            name, ', '.join(event_names)))
+
+    def refuse(self, reason):
+        self.config.options.logger.warn(
+            'event subscriber %s refused: %s' % (self.config.name, reason))
+        try:
+            self.send('ERROR %s\n' % reason)
+        except socket.error:
+            pass
+        self.close()
+
+    def handle_close(self):
+        self.close()
+
+    def handle_error(self):
+        nil, t, v, tbinfo = compact_traceback()
+        self.config.options.logger.critical(
+            'uncaptured python exception, closing event subscriber %s '
+            '(%s:%s %s)' % (self.config.name, t, v, tbinfo))
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.state = ProcessStates.EXITED
+        self.listener_state = EventListenerStates.UNKNOWN
+        if self.group is not None:
+            # the events buffered for the subscriber go with it
+            self.group.before_remove()
+        self.server.remove(self)
+        asyncore.dispatcher.close(self)
+        self.config.options.logger.info(
+            'event subscriber %s disconnected' % self.config.name)
+
+def make_event_server(options):
+    config = options.event_server_config
+    return EventServer(options, config['file'], config['chmod'],
+                       config['chown'])
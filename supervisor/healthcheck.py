@@ -0,0 +1,345 @@
+""" Active health checks of RUNNING processes (see the healthcheck
+program setting).  A check is made every healthcheck_interval seconds
+by a probe which never blocks the main loop: a nonblocking TCP connect,
+a minimal HTTP GET, or a command run in a child process.  A process
+whose checks fail healthcheck_retries times in a row is UNHEALTHY and,
+if healthcheck_restart is set, restarted. """
+
+import errno
+import os
+import random
+import signal
+import socket
+import time
+
+from supervisor.medusa.asyncore_25 import compact_traceback
+
+from supervisor import events
+from supervisor.options import decode_wait_status
+from supervisor.states import HealthStates
+from supervisor.states import ProcessStates
+from supervisor.states import SupervisorStates
+from supervisor.states import getHealthStateDescription
+
+JITTER = 0.1 # intervals are made up to this fraction longer or shorter
+MAX_RESPONSE = 4096 # most of an HTTP response read for its status line
+MAX_PROBES = 64 # most probes running at once, over all processes
+
+running_probes = 0 # probes running now, over all processes
+
+class HealthCheck:
+    """ The health of one process, and the probe checking it if there is
+    one running """
+
+    state = HealthStates.UNKNOWN
+    probe = None # the probe running now
+    next_check = None # when the next probe starts; None until RUNNING
+    failures = 0 # probes failed in a row
+    restarting = False # we stopped the process to start it again
+
+    def __init__(self, process):
+        self.process = process
+        self.config = process.config
+        self.address = None # (family, sockaddr) to probe, see _getAddress
+
+    def get_dispatchers(self):
+        if self.probe is None or self.probe.fd is None:
+            return {}
+        return {self.probe.fd:self.probe}
+
+    def transition(self, now=None):
+        """ Called by the process' transition: start a probe when one is
+        due, and give up on one which has run out of time """
+        if now is None:
+            now = time.time()
+        process = self.process
+
+        if self.restarting:
+            if process.administrative_stop:
+                # stopped by hand while we restarted it: leave it stopped
+                self.restarting = False
+            elif process.state in (ProcessStates.STOPPED,
+                                   ProcessStates.EXITED):
+                self.restarting = False
+                if self.config.options.mood > SupervisorStates.RESTARTING:
+                    process.spawn()
+
+        if process.state != ProcessStates.RUNNING:
+            self.reset()
+            return
+
+        interval = self.config.healthcheck_interval
+        if self.next_check is None:
+            # the first check comes anywhere in the first interval, so
+            # that processes which started together are not checked
+            # together
+            self.next_check = now + random.random() * interval
+
+        if self.probe is not None:
+            if now >= self.probe.deadline:
+                self.probe_finished(self.probe, False, 'timed out after %s '
+                                    'seconds' % self.config.healthcheck_timeout)
+            return
+
+        if now >= self.next_check:
+            self._startProbe(now)
+
+    def _startProbe(self, now):
+        global running_probes
+        if running_probes >= MAX_PROBES:
+            # too many checks at once; try again in about a second
+            self.next_check = now + random.uniform(0.5, 1.5)
+            return
+        deadline = now + self.config.healthcheck_timeout
+        try:
+            probe = self._makeProbe(deadline)
+        except (socket.error, OSError), why:
+            probe = Probe(self, deadline)
+            reason = str(why)
+        else:
+            reason = None
+        self.probe = probe
+        running_probes += 1
+        if reason is not None:
+            self.probe_finished(probe, False, reason)
+
+    def _makeProbe(self, deadline):
+        spec = self.config.healthcheck
+        kind = spec[0]
+        if kind == 'exec':
+            return ExecProbe(self, deadline, spec[1])
+        family, sockaddr = self._getAddress()
+        if kind == 'tcp':
+            return TCPProbe(self, deadline, family, sockaddr)
+        host, port, path = spec[1:]
+        request = ('GET %s HTTP/1.0\r\nHost: %s:%s\r\n'
+                   'Connection: close\r\n\r\n' % (path, host, port))
+        return HTTPProbe(self, deadline, family, sockaddr, request)
+
+    def _getAddress(self):
+        # healthcheck_spec only accepts IP addresses, so this never waits
+        # for a DNS lookup
+        if self.address is None:
+            host, port = self.config.healthcheck[1:3]
+            info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM, 0,
+                                      socket.AI_NUMERICHOST)
+            family, socktype, proto, canonname, sockaddr = info[0]
+            self.address = (family, sockaddr)
+        return self.address
+
+    def probe_finished(self, probe, ok, reason):
+        if probe is not self.probe:
+            # a probe we already gave up on
+            return
+        self._endProbe()
+        interval = self.config.healthcheck_interval
+        self.next_check = time.time() + interval * random.uniform(
+            1 - JITTER, 1 + JITTER)
+        logger = self.config.options.logger
+        if ok:
+            self.failures = 0
+            logger.trace('health check of %s passed (%s)' % (
+                self.config.name, reason))
+            self.change_state(HealthStates.HEALTHY)
+            return
+
+        self.failures += 1
+        logger.info('health check of %s failed (%s)' % (self.config.name,
+                                                        reason))
+        if self.failures < self.config.healthcheck_retries:
+            return
+        self.change_state(HealthStates.UNHEALTHY)
+        if self.config.healthcheck_restart and not self.restarting:
+            logger.warn('restarting unhealthy %s' % self.config.name)
+            if self.process.kill(self.config.stopsignal) is None:
+                self.restarting = True
+
+    def _endProbe(self):
+        global running_probes
+        self.probe.close()
+        self.probe = None
+        running_probes -= 1
+
+    def change_state(self, new_state):
+        old_state = self.state
+        if new_state == old_state:
+            return
+        self.state = new_state
+        if new_state == HealthStates.UNKNOWN:
+            return
+        self.config.options.logger.info('health: %s is %s' % (
+            self.config.name, getHealthStateDescription(new_state)))
+        if new_state == HealthStates.HEALTHY:
+            event_class = events.ProcessHealthHealthyEvent
+        else:
+            event_class = events.ProcessHealthUnhealthyEvent
+        events.notify(event_class(self.process, old_state))
+
+    def reset(self):
+        """ The process is not RUNNING: forget what we knew about it """
+        if self.probe is not None:
+            self._endProbe()
+        self.next_check = None
+        self.failures = 0
+        self.change_state(HealthStates.UNKNOWN)
+
+class Probe:
+    """ One check of a process' health, finished by calling the
+    HealthCheck's probe_finished """
+    fd = None # the fd the main loop waits on, if there is one
+    closed = False
+
+    def __init__(self, check, deadline):
+        self.check = check
+        self.deadline = deadline
+
+    def finished(self, ok, reason):
+        self.check.probe_finished(self, ok, reason)
+
+    def close(self):
+        self.closed = True
+
+class TCPProbe(Probe):
+    """ Passes if a connection can be made """
+
+    def __init__(self, check, deadline, family, sockaddr):
+        Probe.__init__(self, check, deadline)
+        self.connected = False
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.fd = self.sock.fileno()
+        self.sock.setblocking(0)
+        err = self.sock.connect_ex(sockaddr)
+        if err == 0:
+            self.connected = True
+        elif err not in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.close()
+            raise socket.error(err, os.strerror(err))
+
+    def __repr__(self):
+        return '<%s at %s for %s>' % (self.__class__.__name__, id(self),
+                                      self.check.config.name)
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        # a nonblocking connect is done when the socket is writable
+        return not self.closed
+
+    def handle_read_event(self):
+        pass
+
+    def handle_write_event(self):
+        if not self.connected:
+            err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                self.finished(False, 'connect failed: %s' % os.strerror(err))
+                return
+            self.connected = True
+        self.handle_connect()
+
+    def handle_connect(self):
+        self.finished(True, 'connected')
+
+    def handle_error(self):
+        nil, t, v, tbinfo = compact_traceback()
+        self.finished(False, '%s: %s' % (t, v))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.sock.close()
+
+class HTTPProbe(TCPProbe):
+    """ Passes if a GET is answered with a 2xx or 3xx status """
+
+    def __init__(self, check, deadline, family, sockaddr, request):
+        self.request = request # not yet sent
+        self.response = '' # received so far
+        TCPProbe.__init__(self, check, deadline, family, sockaddr)
+
+    def readable(self):
+        return self.connected and not self.request and not self.closed
+
+    def writable(self):
+        return (not self.connected or self.request) and not self.closed
+
+    def handle_connect(self):
+        sent = self.sock.send(self.request)
+        self.request = self.request[sent:]
+
+    def handle_read_event(self):
+        data = self.sock.recv(MAX_RESPONSE)
+        self.response += data
+        if data and not '\n' in self.response:
+            if len(self.response) < MAX_RESPONSE:
+                return
+        self.finished(*http_status(self.response))
+
+def http_status(response):
+    """ Whether an HTTP response passes a check, and why """
+    line = response.split('\n', 1)[0].strip()
+    parts = line.split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        return False, 'bad response %r' % line[:80]
+    try:
+        code = int(parts[1])
+    except ValueError:
+        return False, 'bad response %r' % line[:80]
+    return 200 <= code < 400, 'status %s' % code
+
+class ExecProbe(Probe):
+    """ Passes if a command run with /bin/sh exits with status 0.  The
+    child is reaped by supervisord like a process' child is: see
+    finish. """
+
+    def __init__(self, check, deadline, command):
+        Probe.__init__(self, check, deadline)
+        options = check.config.options
+        self.pid = options.fork()
+        if self.pid == 0:
+            self._run(command)
+        else:
+            options.pidhistory[self.pid] = self
+
+    def _run(self, command):
+        process = self.check.process
+        options = self.check.config.options
+        try:
+            # a process group of its own, so that a timeout kills
+            # whatever the shell started too
+            options.setpgrp()
+            null = os.open('/dev/null', os.O_RDWR)
+            for fd in (0, 1, 2):
+                options.dup2(null, fd)
+            for fd in range(3, options.minfds):
+                options.close_fd(fd)
+            if process.set_uid():
+                return # finally clause will exit the child process
+            env = os.environ.copy()
+            env['SUPERVISOR_ENABLED'] = '1'
+            env['SUPERVISOR_PROCESS_NAME'] = self.check.config.name
+            if process.group is not None:
+                env['SUPERVISOR_GROUP_NAME'] = process.group.config.name
+            if self.check.config.environment is not None:
+                env.update(self.check.config.environment)
+            if self.check.config.directory is not None:
+                options.chdir(self.check.config.directory)
+            options.execve('/bin/sh', ['/bin/sh', '-c', command], env)
+        finally:
+            options._exit(127)
+
+    def finish(self, pid, sts):
+        es, msg = decode_wait_status(sts)
+        self.pid = 0
+        self.finished(es == 0, msg)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.pid:
+                # timed out: it is reaped, and ignored, when it ends
+                try:
+                    self.check.config.options.kill(-self.pid, signal.SIGKILL)
+                except OSError:
+                    pass
@@ -6,6 +6,7 @@ import socket
 import errno
 import pwd
 import urllib
+import fnmatch
 
 try:
     from hashlib import sha1
@@ -21,6 +22,8 @@ from supervisor.medusa import default_handler
 
 from supervisor.medusa.auth_handler import auth_handler
 
+from supervisor import events
+
 class NOT_DONE_YET:
     pass
 
@@ -346,12 +349,41 @@ class deferring_http_channel(http_server.http_channel):
     ac_out_buffer_size = 4096
 
     delay = False
+    deferred = None # the producer which last returned NOT_DONE_YET
+    closed = False
     writable_check = time.time()
+    close_callbacks = () # called when the channel closes, see below
+
+    def add_close_callback(self, callback):
+        """ Call callback when the channel closes; producers fed from
+        outside the channel (group_tail_producer) use this to stop
+        listening once their client has gone away """
+        if not self.close_callbacks:
+            self.close_callbacks = []
+        self.close_callbacks.append(callback)
+
+    def remove_close_callback(self, callback):
+        if callback in self.close_callbacks:
+            self.close_callbacks.remove(callback)
+
+    def close(self):
+        self.closed = True
+        stop_waiting = getattr(self.deferred, 'stop_waiting', None)
+        if stop_waiting is not None:
+            stop_waiting()
+        callbacks = self.close_callbacks
+        self.close_callbacks = ()
+        for callback in callbacks:
+            callback()
+        http_server.http_channel.close(self)
 
     def writable(self, t=time.time):
         now = t()
         if self.delay:
             # we called a deferred producer via this channel (see refill_buffer)
+            if getattr(self.deferred, 'woken', False):
+                # what it waits for has happened, call it again now
+                return True
             last_writable_check = self.writable_check
             self.writable_check = now
             elapsed = now - last_writable_check
@@ -383,11 +415,13 @@ class deferring_http_channel(http_server.http_channel):
 
                 if data is NOT_DONE_YET:
                     self.delay = p.delay
+                    self.deferred = p
                     return
 
                 elif data:
                     self.ac_out_buffer = self.ac_out_buffer + data
                     self.delay = False
+                    self.deferred = None
                     return
                 else:
                     self.producer_fifo.pop()
@@ -672,6 +706,112 @@ class tail_f_producer:
     def fsize(self):
         return os.fstat(self.file.fileno())[stat.ST_SIZE]
 
+class group_tail_producer:
+    """ Merge the output of several processes into a single stream of
+    lines, each prefixed with the name of the process that wrote it.  The
+    producer is fed directly by the output dispatchers of the processes
+    rather than by polling their log files.  It keeps listening to a
+    process while it is stopped, so that it follows restarts, and stops
+    once its group is removed, or for all of them when the client goes
+    away. """
+    def __init__(self, request, supervisord, processes, channel,
+                 maxbytes=1<<20):
+        # processes is a sequence of (name, process) tuples
+        self.request = request
+        self.supervisord = supervisord
+        self.channel = channel
+        self.maxbytes = maxbytes
+        self.delay = 0.1
+        self.processes = {} # id(process) -> process still listened to
+        self.prefixes = {} # id(process) -> line prefix
+        self.partial = {} # id(process) -> trailing incomplete line
+        self.lines = []
+        self.buffered = 0
+        self.dropped = 0
+        for name, process in processes:
+            self.processes[id(process)] = process
+            self.prefixes[id(process)] = '%s | ' % name
+            process.output_listeners.append(self.feed)
+        events.subscribe(events.ProcessStateEvent, self.state_changed)
+        request.channel.add_close_callback(self.detach)
+
+    def detach(self, process=None):
+        """ Stop listening to a process, or to all of them """
+        if process is None:
+            processes = self.processes.values()
+        else:
+            processes = [process]
+        for process in processes:
+            self.flush_partial(process)
+            if self.feed in process.output_listeners:
+                process.output_listeners.remove(self.feed)
+            del self.processes[id(process)]
+        if not self.processes:
+            events.unsubscribe(events.ProcessStateEvent, self.state_changed)
+            self.request.channel.remove_close_callback(self.detach)
+
+    def state_changed(self, event):
+        process = event.process
+        if not self.processes.has_key(id(process)):
+            return
+        if isinstance(event, (events.ProcessStateStoppedEvent,
+                              events.ProcessStateExitedEvent,
+                              events.ProcessStateBackoffEvent,
+                              events.ProcessStateFatalEvent)):
+            # its output ended with it, even without a newline
+            self.flush_partial(process)
+
+    def flush_partial(self, process):
+        rest = self.partial.pop(id(process), None)
+        if rest is not None:
+            self.add_lines(process, [rest])
+
+    def feed(self, process, channel, data):
+        if channel != self.channel:
+            return
+        key = id(process)
+        data = self.partial.pop(key, '') + data
+        lines = data.split('\n')
+        rest = lines.pop()
+        if len(rest) >= self.maxbytes:
+            # never hold back more than we are willing to buffer
+            lines.append(rest)
+        elif rest:
+            self.partial[key] = rest
+        self.add_lines(process, lines)
+
+    def add_lines(self, process, lines):
+        prefix = self.prefixes[id(process)]
+        for line in lines:
+            if self.buffered >= self.maxbytes:
+                # the client isn't keeping up, drop output rather than
+                # buffering it without bound
+                self.dropped = self.dropped + len(line) + 1
+                continue
+            line = '%s%s\n' % (prefix, line)
+            self.lines.append(line)
+            self.buffered = self.buffered + len(line)
+
+    def more(self):
+        process_groups = self.supervisord.process_groups
+        for process in self.processes.values():
+            group = process.group
+            if (group is None or
+                process_groups.get(group.config.name) is not group):
+                # its group was removed
+                self.detach(process)
+        if not self.lines and not self.dropped:
+            if not self.processes:
+                return ''
+            return NOT_DONE_YET
+        if self.dropped:
+            self.lines.append('==> %d bytes dropped <==\n' % self.dropped)
+            self.dropped = 0
+        data = ''.join(self.lines)
+        self.lines = []
+        self.buffered = 0
+        return data
+
 class logtail_handler:
     IDENT = 'Logtail HTTP Request Handler'
     path = '/logtail'
@@ -737,6 +877,70 @@ class logtail_handler:
 
         request.done()
 
+class grouptail_handler:
+    IDENT = 'Group Logtail HTTP Request Handler'
+    path = '/logtail-group'
+
+    def __init__(self, supervisord):
+        self.supervisord = supervisord
+
+    def match(self, request):
+        return request.uri.startswith(self.path)
+
+    def handle_request(self, request):
+        if request.command != 'GET':
+            request.error (400) # bad request
+            return
+
+        path, params, query, fragment = request.split_uri()
+
+        if '%' in path:
+            path = http_server.unquote(path)
+
+        # strip off all leading slashes
+        while path and path[0] == '/':
+            path = path[1:]
+
+        path, pattern_and_channel = path.split('/', 1)
+
+        try:
+            pattern, channel = pattern_and_channel.split('/', 1)
+        except ValueError:
+            # no channel specified, default channel to stdout
+            pattern = pattern_and_channel
+            channel = 'stdout'
+
+        if channel not in ('stdout', 'stderr'):
+            request.error(404) # not found
+            return
+
+        if ':' not in pattern:
+            # a bare group name means every process in the group
+            pattern = pattern + ':*'
+
+        from supervisor.options import make_namespec
+        processes = []
+        for group_name, group in self.supervisord.process_groups.items():
+            for process_name, process in group.processes.items():
+                namespec = '%s:%s' % (group_name, process_name)
+                if fnmatch.fnmatchcase(namespec, pattern):
+                    name = make_namespec(group_name, process_name)
+                    processes.append((name, process))
+
+        if not processes:
+            request.error(404) # not found
+            return
+
+        processes.sort()
+        request['Content-Type'] = 'text/plain'
+        # the lack of a Content-Length header makes the outputter
+        # send a 'Transfer-Encoding: chunked' response
+
+        request.push(group_tail_producer(request, self.supervisord,
+                                         processes, channel))
+
+        request.done()
+
 class mainlogtail_handler:
     IDENT = 'Main Logtail HTTP Request Handler'
     path = '/mainlogtail'
@@ -811,6 +1015,7 @@ def make_http_servers(options, supervisord):
                               SystemNamespaceRPCInterface(subinterfaces)))
         xmlrpchandler = supervisor_xmlrpc_handler(supervisord, subinterfaces)
         tailhandler = logtail_handler(supervisord)
+        grouptailhandler = grouptail_handler(supervisord)
         maintailhandler = mainlogtail_handler(supervisord)
         uihandler = supervisor_ui_handler(supervisord)
         here = os.path.abspath(os.path.dirname(__file__))
@@ -827,6 +1032,8 @@ def make_http_servers(options, supervisord):
             users = {username:password}
             xmlrpchandler = supervisor_auth_handler(users, xmlrpchandler)
             tailhandler = supervisor_auth_handler(users, tailhandler)
+            grouptailhandler = supervisor_auth_handler(users,
+                                                       grouptailhandler)
             maintailhandler = supervisor_auth_handler(users, maintailhandler)
             uihandler = supervisor_auth_handler(users, uihandler)
             defaulthandler = supervisor_auth_handler(users, defaulthandler)
@@ -840,6 +1047,8 @@ def make_http_servers(options, supervisord):
         hs.install_handler(uihandler)
         hs.install_handler(maintailhandler)
         hs.install_handler(tailhandler)
+        # must be checked before tailhandler, which matches its path too
+        hs.install_handler(grouptailhandler)
         hs.install_handler(xmlrpchandler) # last for speed (first checked)
         servers.append((config, hs))
 
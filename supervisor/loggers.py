@@ -92,16 +92,58 @@ class Handler:
 
 class FileHandler(Handler):
     """File handler which supports reopening of logs.
+
+    If a FileHandlerPool is passed as ``pool``, the file is not held open
+    until the first record is emitted, and the pool may close it again
+    when too many files are open at once.  It is still created right
+    away, so that the log of a process which has not written anything
+    can be read.
     """
 
-    def __init__(self, filename, mode="a"):
-        self.stream = open(filename, mode)
+    def __init__(self, filename, mode="a", pool=None):
         self.baseFilename = filename
         self.mode = mode
+        self.pool = pool
+        self.stream = None # opened on demand by the pool, if any
+        self._open_or_create()
+
+    def _open_or_create(self):
+        stream = open(self.baseFilename, self.mode)
+        if self.pool is None:
+            self.stream = stream
+        else:
+            stream.close()
+
+    def open(self):
+        self.stream = open(self.baseFilename, self.mode)
+        # position at the end so tell() reports the size of the file
+        # even before anything has been written to the new stream
+        self.stream.seek(0, 2)
+
+    def close(self):
+        if self.stream is None:
+            return
+        Handler.close(self)
+        if self.pool is not None:
+            self.pool.release(self)
+            self.stream = None
+
+    def flush(self):
+        if self.stream is not None:
+            Handler.flush(self)
+
+    def emit(self, record):
+        if self.pool is not None:
+            try:
+                self.pool.acquire(self)
+            except:
+                self.handleError(record)
+                return
+        Handler.emit(self, record)
 
     def reopen(self):
         self.close()
-        self.stream = open(self.baseFilename, self.mode)
+        self._open_or_create()
 
     def remove(self):
         try:
@@ -110,6 +152,40 @@ class FileHandler(Handler):
             if why[0] != errno.ENOENT:
                 raise
 
+class FileHandlerPool:
+    """ Limits the number of files held open by the FileHandlers which
+    share the pool.  A handler's file is opened when it first emits a
+    record; when more than ``maxopen`` files are open, the least recently
+    written ones are closed and reopened (at the end of the file) on
+    their next write. """
+
+    def __init__(self, maxopen):
+        self.maxopen = maxopen
+        self.handlers = {} # open handler -> serial of its last write
+        self.serial = 0
+
+    def acquire(self, handler):
+        if handler.stream is None:
+            if len(self.handlers) >= self.maxopen:
+                self.evict()
+            handler.open()
+        self.serial += 1
+        self.handlers[handler] = self.serial
+
+    def release(self, handler):
+        if handler in self.handlers:
+            del self.handlers[handler]
+
+    def evict(self):
+        # close a tenth of the pool at once so that a stream of writes to
+        # files which are not open doesn't sort the pool on every write
+        count = len(self.handlers) - self.maxopen + 1
+        count = max(count, self.maxopen // 10, 1)
+        lru = [ (serial, id(h), h) for h, serial in self.handlers.items() ]
+        lru.sort()
+        for serial, ignored, handler in lru[:count]:
+            handler.close()
+
 class StreamHandler(Handler):
     def __init__(self, strm=None):
         self.stream = strm
@@ -146,7 +222,7 @@ class BoundIO:
 
 class RotatingFileHandler(FileHandler):
     def __init__(self, filename, mode='a', maxBytes=512*1024*1024,
-                 backupCount=10):
+                 backupCount=10, pool=None):
         """
         Open the specified file and use it as the stream for logging.
 
@@ -169,7 +245,7 @@ class RotatingFileHandler(FileHandler):
         """
         if maxBytes > 0:
             mode = 'a' # doesn't make sense otherwise!
-        FileHandler.__init__(self, filename, mode)
+        FileHandler.__init__(self, filename, mode, pool)
         self.maxBytes = maxBytes
         self.backupCount = backupCount
         self.counter = 0
@@ -192,6 +268,10 @@ class RotatingFileHandler(FileHandler):
         if self.maxBytes <= 0:
             return
 
+        if self.stream is None:
+            # a pooled file which could not be opened
+            return
+
         if not (self.stream.tell() >= self.maxBytes):
             return
 
@@ -321,7 +401,7 @@ class SyslogHandler(Handler):
             self.handleError(record)
 
 def getLogger(filename, level, fmt, rotating=False, maxbytes=0, backups=0,
-              stdout=False):
+              stdout=False, pool=None):
 
     handlers = []
 
@@ -339,9 +419,10 @@ def getLogger(filename, level, fmt, rotating=False, maxbytes=0, backups=0,
 
     else:
         if rotating is False:
-            handlers.append(FileHandler(filename))
+            handlers.append(FileHandler(filename, pool=pool))
         else:
-            handlers.append(RotatingFileHandler(filename,'a',maxbytes,backups))
+            handlers.append(RotatingFileHandler(filename, 'a', maxbytes,
+                                                backups, pool))
 
     if stdout:
         handlers.append(StreamHandler(sys.stdout))
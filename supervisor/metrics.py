@@ -0,0 +1,119 @@
+""" Cheap running statistics about the events an event listener pool
+handles.  Everything here is updated in constant time and space, so it is
+always on. """
+
+from bisect import bisect_left
+
+# upper bounds of the latency histogram buckets in milliseconds; a last,
+# unbounded bucket holds everything slower
+LATENCY_BOUNDS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+class Histogram:
+    """ Counts values into fixed buckets """
+
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, percent):
+        """ An upper bound for the given percentile: the upper bound of the
+        bucket it falls in, or the largest value if that is lower """
+        if not self.count:
+            return 0.0
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for i in range(len(self.bounds)):
+            seen += self.counts[i]
+            if seen >= wanted:
+                return min(float(self.bounds[i]), self.max)
+        return self.max
+
+class PoolMetrics:
+    """ What an event listener pool has done since it was created """
+
+    def __init__(self, now):
+        self.started = now
+        self.enqueue_latency = Histogram() # ms from buffering to sending
+        self.result_latency = Histogram() # ms from sending to the result
+        self.accepted = {} # event name -> number of events buffered
+        self.rejected = 0 # results which rejected an event
+        self.rebuffered = 0 # rejected events put back to be sent again
+        self.busy_since = {} # listener name -> when it was sent work
+        self.busy_time = {} # listener name -> seconds busy before that
+        # accepted counts when rates were last computed, see rates()
+        self.rates_from = (now, {})
+        self.last_rates = None
+
+    def accept(self, event_name):
+        self.accepted[event_name] = self.accepted.get(event_name, 0) + 1
+
+    def busy(self, listener, now):
+        if not self.busy_since.has_key(listener):
+            self.busy_since[listener] = now
+
+    def idle(self, listener, now):
+        since = self.busy_since.pop(listener, None)
+        if since is not None:
+            self.busy_time[listener] = (self.busy_time.get(listener, 0) +
+                                        now - since)
+
+    def busy_seconds(self, listeners, now):
+        """ The time the listeners have spent with events in flight, all
+        together """
+        busy = 0
+        for listener in listeners:
+            busy += self.busy_time.get(listener, 0)
+            since = self.busy_since.get(listener)
+            if since is not None:
+                busy += now - since
+        return busy
+
+    def busy_ratios(self, listeners, now):
+        """ The fraction of the pool's lifetime each listener spent with
+        events in flight """
+        elapsed = now - self.started
+        ratios = {}
+        for listener in listeners:
+            busy = self.busy_time.get(listener, 0)
+            since = self.busy_since.get(listener)
+            if since is not None:
+                busy += now - since
+            if elapsed > 0:
+                ratios[listener] = min(float(busy) / elapsed, 1.0)
+            else:
+                ratios[listener] = 0.0
+        return ratios
+
+    def rates(self, now, roll=False):
+        """ Events accepted per second, by event name, over the last
+        reporting period (or since the pool started, before the first
+        report).  roll ends the current reporting period. """
+        if roll or self.last_rates is None:
+            since, counts = self.rates_from
+            elapsed = now - since
+            rates = {}
+            for name, count in self.accepted.items():
+                if elapsed > 0:
+                    rates[name] = float(count - counts.get(name, 0)) / elapsed
+                else:
+                    rates[name] = 0.0
+            if not roll:
+                return rates
+            self.rates_from = (now, self.accepted.copy())
+            self.last_rates = rates
+        return self.last_rates
@@ -35,6 +35,7 @@ from supervisor.datatypes import list_of_exitcodes
 from supervisor.datatypes import dict_of_key_value_pairs
 from supervisor.datatypes import logfile_name
 from supervisor.datatypes import list_of_strings
+from supervisor.datatypes import list_of_regexes
 from supervisor.datatypes import octal_type
 from supervisor.datatypes import existing_directory
 from supervisor.datatypes import logging_level
@@ -45,6 +46,7 @@ from supervisor.datatypes import UnixStreamSocketConfig
 from supervisor.datatypes import url
 from supervisor.datatypes import Automatic
 from supervisor.datatypes import auto_restart
+from supervisor.datatypes import healthcheck_spec
 from supervisor.datatypes import profile_options
 from supervisor.datatypes import set_here
 
@@ -387,8 +389,11 @@ class ServerOptions(Options):
     nodaemon = None
     environment = None
     httpservers = ()
+    event_server_config = None
+    eventserver = None
     unlink_socketfiles = True
     mood = states.SupervisorStates.RUNNING
+    childlog_pool = None
 
     def __init__(self):
         Options.__init__(self)
@@ -422,6 +427,8 @@ class ServerOptions(Options):
                  "a:", "minfds=", int, default=1024)
         self.add("minprocs", "supervisord.minprocs",
                  "", "minprocs=", int, default=200)
+        self.add("childlog_maxfds", "supervisord.childlog_maxfds",
+                 "", "childlog_maxfds=", int, default=0)
         self.add("nocleanup", "supervisord.nocleanup",
                  "k", "nocleanup", flag=1, default=0)
         self.add("strip_ansi", "supervisord.strip_ansi",
@@ -442,7 +449,7 @@ class ServerOptions(Options):
     def getLogger(self, filename, level, fmt, rotating=False, maxbytes=0,
                   backups=0, stdout=False):
         return loggers.getLogger(filename, level, fmt, rotating, maxbytes,
-                                 backups, stdout)
+                                 backups, stdout, self.childlog_pool)
 
     def realize(self, *arg, **kw):
         Options.realize(self, *arg, **kw)
@@ -479,6 +486,7 @@ class ServerOptions(Options):
         self.serverurl = None
 
         self.server_configs = sconfigs = section.server_configs
+        self.event_server_config = section.event_server_config
 
         # we need to set a fallback serverurl that process.spawn can use
 
@@ -504,6 +512,13 @@ class ServerOptions(Options):
 
         self.identifier = section.identifier
 
+        # child log files are only opened lazily and closed when idle if
+        # there is a limit on how many of them may be open at once
+        if self.childlog_maxfds:
+            self.childlog_pool = loggers.FileHandlerPool(self.childlog_maxfds)
+        else:
+            self.childlog_pool = None
+
     def process_config(self, do_usage=True):
         Options.process_config(self, do_usage=do_usage)
 
@@ -555,6 +570,7 @@ class ServerOptions(Options):
         get = parser.getdefault
         section.minfds = integer(get('minfds', 1024))
         section.minprocs = integer(get('minprocs', 200))
+        section.childlog_maxfds = integer(get('childlog_maxfds', 0))
 
         directory = get('directory', None)
         if directory is None:
@@ -596,6 +612,8 @@ class ServerOptions(Options):
                 env.update(proc.environment)
                 proc.environment = env
         section.server_configs = self.server_configs_from_parser(parser)
+        section.event_server_config = self.event_server_config_from_parser(
+            parser)
         section.profile_options = None
         return section
 
@@ -649,6 +667,38 @@ class ServerOptions(Options):
             # and stopped last at mainloop exit
             priority = integer(get(section, 'priority', -1))
             buffer_size = integer(get(section, 'buffer_size', 10))
+            batch_size = integer(get(section, 'batch_size', 1))
+            if batch_size < 1:
+                raise ValueError('batch_size must be at least 1 in [%s]' %
+                                 section)
+            max_batch_latency = integer(get(section, 'max_batch_latency', 0))
+            window_size = integer(get(section, 'window_size', 1))
+            if window_size < 1:
+                raise ValueError('window_size must be at least 1 in [%s]' %
+                                 section)
+            if window_size > 1 and batch_size > 1:
+                raise ValueError('window_size and batch_size cannot both be '
+                                 'greater than 1 in [%s]' % section)
+            spool_file = get(section, 'spool_file', None)
+            if spool_file:
+                spool_file = existing_dirpath(spool_file)
+            spool_maxbytes = byte_size(get(section, 'spool_maxbytes', '50MB'))
+            max_retries = integer(get(section, 'max_retries', 0))
+            retry_delay = integer(get(section, 'retry_delay', 0))
+            dead_letter_size = integer(get(section, 'dead_letter_size', 100))
+            filter_processes = list_of_strings(
+                get(section, 'events_filter_processes', ''))
+            filter_groups = list_of_strings(
+                get(section, 'events_filter_groups', ''))
+            filter_expected = get(section, 'events_filter_expected', None)
+            if filter_expected is not None:
+                filter_expected = boolean(filter_expected)
+            numprocs_max = integer(get(section, 'numprocs_max', 0))
+            numprocs_min = integer(get(section, 'numprocs_min', 1))
+            numprocs_idle_secs = integer(get(section, 'numprocs_idle_secs', 60))
+            if numprocs_max and not (0 <= numprocs_min <= numprocs_max):
+                raise ValueError('numprocs_min must be between 0 and '
+                                 'numprocs_max in [%s]' % section)
             result_handler = get(section, 'result_handler',
                                        'supervisor.dispatchers:default_handler')
             try:
@@ -670,13 +720,23 @@ class ServerOptions(Options):
                     raise ValueError('Unknown event type %s in [%s] events' %
                                      (pool_event_name, section))
                 pool_events.append(pool_event)
+            # an autoscaling pool has a process for each of numprocs_max,
+            # most of which it leaves stopped until it needs them
             processes=self.processes_from_section(parser, section, pool_name,
-                                                  EventListenerConfig)
+                                                  EventListenerConfig,
+                                                  numprocs_max or None)
 
             groups.append(
                 EventListenerPoolConfig(self, pool_name, priority, processes,
                                         buffer_size, pool_events,
-                                        result_handler)
+                                        result_handler, batch_size,
+                                        max_batch_latency, window_size,
+                                        spool_file, spool_maxbytes,
+                                        max_retries, retry_delay,
+                                        dead_letter_size, filter_processes,
+                                        filter_groups, filter_expected,
+                                        numprocs_min, numprocs_max,
+                                        numprocs_idle_secs)
                 )
 
         # process fastcgi homogeneous groups
@@ -772,7 +832,7 @@ class ServerOptions(Options):
         return pwrec[3]
 
     def processes_from_section(self, parser, section, group_name,
-                               klass=None):
+                               klass=None, numprocs=None):
         if klass is None:
             klass = ProcessConfig
         programs = []
@@ -789,13 +849,43 @@ class ServerOptions(Options):
         killasgroup = boolean(get(section, 'killasgroup', stopasgroup))
         exitcodes = list_of_exitcodes(get(section, 'exitcodes', '0,2'))
         redirect_stderr = boolean(get(section, 'redirect_stderr','false'))
-        numprocs = integer(get(section, 'numprocs', 1))
+        notify_ready = boolean(get(section, 'notify_ready', 'false'))
+        healthcheck = healthcheck_spec(get(section, 'healthcheck', ''))
+        healthcheck_interval = integer(get(section, 'healthcheck_interval', 30))
+        healthcheck_timeout = integer(get(section, 'healthcheck_timeout', 5))
+        healthcheck_retries = integer(get(section, 'healthcheck_retries', 3))
+        healthcheck_restart = boolean(get(section, 'healthcheck_restart',
+                                          'true'))
+        if min(healthcheck_interval, healthcheck_timeout,
+               healthcheck_retries) < 1:
+            raise ValueError(
+                'healthcheck_interval, healthcheck_timeout and '
+                'healthcheck_retries must be at least 1 in section %s' %
+                section)
+        if numprocs is None:
+            numprocs = integer(get(section, 'numprocs', 1))
         numprocs_start = integer(get(section, 'numprocs_start', 0))
         environment_str = get(section, 'environment', '')
         stdout_cmaxbytes = byte_size(get(section,'stdout_capture_maxbytes','0'))
         stdout_events = boolean(get(section, 'stdout_events_enabled','false'))
+        stdout_events_flush_ms = integer(get(section,
+                                             'stdout_events_flush_ms', 0))
+        stdout_events_max_bytes = byte_size(get(section,
+                                                'stdout_events_max_bytes','0'))
+        stdout_filter_drop = list_of_regexes(get(section,
+                                                 'stdout_filter_drop', ''))
+        stdout_filter_keep = list_of_regexes(get(section,
+                                                 'stdout_filter_keep', ''))
         stderr_cmaxbytes = byte_size(get(section,'stderr_capture_maxbytes','0'))
         stderr_events = boolean(get(section, 'stderr_events_enabled','false'))
+        stderr_events_flush_ms = integer(get(section,
+                                             'stderr_events_flush_ms', 0))
+        stderr_events_max_bytes = byte_size(get(section,
+                                                'stderr_events_max_bytes','0'))
+        stderr_filter_drop = list_of_regexes(get(section,
+                                                 'stderr_filter_drop', ''))
+        stderr_filter_keep = list_of_regexes(get(section,
+                                                 'stderr_filter_keep', ''))
         directory = get(section, 'directory', None)
         serverurl = get(section, 'serverurl', None)
         if serverurl and serverurl.strip().upper() == 'AUTO':
@@ -885,11 +975,19 @@ class ServerOptions(Options):
                 stdout_logfile=logfiles['stdout_logfile'],
                 stdout_capture_maxbytes = stdout_cmaxbytes,
                 stdout_events_enabled = stdout_events,
+                stdout_events_flush_ms = stdout_events_flush_ms,
+                stdout_events_max_bytes = stdout_events_max_bytes,
+                stdout_filter_drop = stdout_filter_drop,
+                stdout_filter_keep = stdout_filter_keep,
                 stdout_logfile_backups=logfiles['stdout_logfile_backups'],
                 stdout_logfile_maxbytes=logfiles['stdout_logfile_maxbytes'],
                 stderr_logfile=logfiles['stderr_logfile'],
                 stderr_capture_maxbytes = stderr_cmaxbytes,
                 stderr_events_enabled = stderr_events,
+                stderr_events_flush_ms = stderr_events_flush_ms,
+                stderr_events_max_bytes = stderr_events_max_bytes,
+                stderr_filter_drop = stderr_filter_drop,
+                stderr_filter_keep = stderr_filter_keep,
                 stderr_logfile_backups=logfiles['stderr_logfile_backups'],
                 stderr_logfile_maxbytes=logfiles['stderr_logfile_maxbytes'],
                 stopsignal=stopsignal,
@@ -899,7 +997,13 @@ class ServerOptions(Options):
                 exitcodes=exitcodes,
                 redirect_stderr=redirect_stderr,
                 environment=environment,
-                serverurl=serverurl)
+                serverurl=serverurl,
+                notify_ready=notify_ready,
+                healthcheck=healthcheck,
+                healthcheck_interval=healthcheck_interval,
+                healthcheck_timeout=healthcheck_timeout,
+                healthcheck_retries=healthcheck_retries,
+                healthcheck_restart=healthcheck_restart)
 
             programs.append(pconfig)
 
@@ -982,6 +1086,36 @@ class ServerOptions(Options):
 
         return configs
 
+    def event_server_config_from_parser(self, parser):
+        section = 'unix_event_server'
+        if not parser.has_section(section):
+            return None
+        get = parser.saneget
+        sfile = get(section, 'file', None)
+        if sfile is None:
+            raise ValueError('section [%s] has no file value' % section)
+        sfile = expand(sfile.strip(), {'here':self.here}, 'socket file')
+        config = {'file':normalize_path(sfile)}
+        chown = get(section, 'chown', None)
+        if chown is not None:
+            try:
+                chown = colon_separated_user_group(chown)
+            except ValueError:
+                raise ValueError('Invalid chown value %s' % chown)
+        else:
+            chown = (-1, -1)
+        config['chown'] = chown
+        chmod = get(section, 'chmod', None)
+        if chmod is not None:
+            try:
+                chmod = octal_type(chmod)
+            except (TypeError, ValueError):
+                raise ValueError('Invalid chmod value %s' % chmod)
+        else:
+            chmod = 0700
+        config['chmod'] = chmod
+        return config
+
     def daemonize(self):
         # To daemonize, we need to become the leader of our own session
         # (process) group.  If we do not, signals sent to our
@@ -1057,6 +1191,11 @@ class ServerOptions(Options):
                             pass
         except OSError:
             pass
+        if self.eventserver is not None and self.unlink_socketfiles:
+            try:
+                os.unlink(self.eventserver.socketname)
+            except OSError:
+                pass
         try:
             os.unlink(self.pidfile)
         except OSError:
@@ -1082,6 +1221,11 @@ class ServerOptions(Options):
                 if dispatcher_server is server:
                     dispatcher.close()
 
+    def close_eventserver(self):
+        if self.eventserver is not None:
+            self.eventserver.close()
+            self.eventserver = None
+
     def close_logger(self):
         self.logger.close()
 
@@ -1118,6 +1262,22 @@ class ServerOptions(Options):
         except ValueError, why:
             self.usage(why[0])
 
+    def openeventserver(self):
+        if self.event_server_config is None:
+            return
+        try:
+            self.eventserver = self.make_event_server()
+        except socket.error, why:
+            if why[0] == errno.EADDRINUSE:
+                self.usage('Another program is already listening on '
+                           'the socket file that [unix_event_server] is '
+                           'configured to use.  Shut this program '
+                           'down first before starting supervisord.')
+            else:
+                self.usage('Cannot open the event server: %s' % (why,))
+        except ValueError, why:
+            self.usage(why[0])
+
     def get_autochildlog_name(self, name, identifier, channel):
         prefix='%s-%s---%s-' % (name, channel, identifier)
         logfile = self.mktempfile(
@@ -1326,6 +1486,10 @@ class ServerOptions(Options):
         from supervisor.http import make_http_servers
         return make_http_servers(self, supervisord)
 
+    def make_event_server(self):
+        from supervisor.eventserver import make_event_server
+        return make_event_server(self)
+
     def close_fd(self, fd):
         try:
             os.close(fd)
@@ -1420,18 +1584,21 @@ class ServerOptions(Options):
     def chdir(self, dir):
         os.chdir(dir)
 
-    def make_pipes(self, stderr=True):
+    def make_pipes(self, stderr=True, notify=False):
         """ Create pipes for parent to child stdin/stdout/stderr
         communications.  Open fd in nonblocking mode so we can read them
         in the mainloop without blocking.  If stderr is False, don't
-        create a pipe for stderr. """
+        create a pipe for stderr.  If notify is True, also create a pipe
+        on which the child reports that it is ready. """
 
         pipes = {'child_stdin':None,
                  'stdin':None,
                  'stdout':None,
                  'child_stdout':None,
                  'stderr':None,
-                 'child_stderr':None}
+                 'child_stderr':None,
+                 'notify':None,
+                 'child_notify':None}
         try:
             stdin, child_stdin = os.pipe()
             pipes['child_stdin'], pipes['stdin'] = stdin, child_stdin
@@ -1440,7 +1607,11 @@ class ServerOptions(Options):
             if stderr:
                 stderr, child_stderr = os.pipe()
                 pipes['stderr'], pipes['child_stderr'] = stderr, child_stderr
-            for fd in (pipes['stdout'], pipes['stderr'], pipes['stdin']):
+            if notify:
+                notify, child_notify = os.pipe()
+                pipes['notify'], pipes['child_notify'] = notify, child_notify
+            for fd in (pipes['stdout'], pipes['stderr'], pipes['stdin'],
+                       pipes['notify']):
                 if fd is not None:
                     fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | os.O_NDELAY)
             return pipes
@@ -1449,15 +1620,24 @@ class ServerOptions(Options):
                 if fd is not None:
                     self.close_fd(fd)
 
+    def make_trigger(self):
+        """ Create a nonblocking pipe used to wake up the mainloop's
+        select.  Returns a tuple of (read fd, write fd). """
+        r, w = os.pipe()
+        for fd in (r, w):
+            fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | os.O_NDELAY)
+        return r, w
+
     def close_parent_pipes(self, pipes):
-        for fdname in ('stdin', 'stdout', 'stderr'):
-            fd = pipes[fdname]
+        for fdname in ('stdin', 'stdout', 'stderr', 'notify'):
+            fd = pipes.get(fdname)
             if fd is not None:
                 self.close_fd(fd)
 
     def close_child_pipes(self, pipes):
-        for fdname in ('child_stdin', 'child_stdout', 'child_stderr'):
-            fd = pipes[fdname]
+        for fdname in ('child_stdin', 'child_stdout', 'child_stderr',
+                       'child_notify'):
+            fd = pipes.get(fdname)
             if fd is not None:
                 self.close_fd(fd)
 
@@ -1626,13 +1806,20 @@ class ProcessConfig(Config):
         'autostart', 'autorestart', 'startsecs', 'startretries',
         'stdout_logfile', 'stdout_capture_maxbytes',
         'stdout_events_enabled',
+        'stdout_events_flush_ms', 'stdout_events_max_bytes',
+        'stdout_filter_drop', 'stdout_filter_keep',
         'stdout_logfile_backups', 'stdout_logfile_maxbytes',
         'stderr_logfile', 'stderr_capture_maxbytes',
         'stderr_logfile_backups', 'stderr_logfile_maxbytes',
         'stderr_events_enabled',
+        'stderr_events_flush_ms', 'stderr_events_max_bytes',
+        'stderr_filter_drop', 'stderr_filter_keep',
         'stopsignal', 'stopwaitsecs', 'stopasgroup', 'killasgroup',
         'exitcodes', 'redirect_stderr' ]
-    optional_param_names = [ 'environment', 'serverurl' ]
+    optional_param_names = [ 'environment', 'serverurl', 'notify_ready',
+                             'healthcheck', 'healthcheck_interval',
+                             'healthcheck_timeout', 'healthcheck_retries',
+                             'healthcheck_restart' ]
 
     def __init__(self, options, **params):
         self.options = options
@@ -1671,11 +1858,12 @@ class ProcessConfig(Config):
 
     def make_dispatchers(self, proc):
         use_stderr = not self.redirect_stderr
-        p = self.options.make_pipes(use_stderr)
+        p = self.options.make_pipes(use_stderr, bool(self.notify_ready))
         stdout_fd,stderr_fd,stdin_fd = p['stdout'],p['stderr'],p['stdin']
         dispatchers = {}
         from supervisor.dispatchers import POutputDispatcher
         from supervisor.dispatchers import PInputDispatcher
+        from supervisor.dispatchers import PNotifyDispatcher
         from supervisor import events
         if stdout_fd is not None:
             etype = events.ProcessCommunicationStdoutEvent
@@ -1685,6 +1873,10 @@ class ProcessConfig(Config):
             dispatchers[stderr_fd] = POutputDispatcher(proc,etype, stderr_fd)
         if stdin_fd is not None:
             dispatchers[stdin_fd] = PInputDispatcher(proc, 'stdin', stdin_fd)
+        notify_fd = p.get('notify')
+        if notify_fd is not None:
+            dispatchers[notify_fd] = PNotifyDispatcher(proc, 'notify',
+                                                       notify_fd)
         return dispatchers, p
 
 class EventListenerConfig(ProcessConfig):
@@ -1757,7 +1949,12 @@ class ProcessGroupConfig(Config):
 
 class EventListenerPoolConfig(Config):
     def __init__(self, options, name, priority, process_configs, buffer_size,
-                 pool_events, result_handler):
+                 pool_events, result_handler, batch_size=1,
+                 max_batch_latency=0, window_size=1, spool_file=None,
+                 spool_maxbytes=0, max_retries=0, retry_delay=0,
+                 dead_letter_size=100, filter_processes=(),
+                 filter_groups=(), filter_expected=None, numprocs_min=1,
+                 numprocs_max=0, numprocs_idle_secs=60):
         self.options = options
         self.name = name
         self.priority = priority
@@ -1765,6 +1962,23 @@ class EventListenerPoolConfig(Config):
         self.buffer_size = buffer_size
         self.pool_events = pool_events
         self.result_handler = result_handler
+        self.batch_size = batch_size # events per envelope, 1 is unbatched
+        self.max_batch_latency = max_batch_latency # in milliseconds
+        self.window_size = window_size # events in flight per listener
+        self.spool_file = spool_file # overflow from buffer_size goes here
+        self.spool_maxbytes = spool_maxbytes
+        self.max_retries = max_retries # 0 retries a rejected event forever
+        self.retry_delay = retry_delay # ms before the first retry, doubling
+        self.dead_letter_size = dead_letter_size
+        # globs of the process and group names whose events are accepted
+        self.filter_processes = filter_processes
+        self.filter_groups = filter_groups
+        # None accepts both expected and unexpected PROCESS_STATE_EXITED
+        self.filter_expected = filter_expected
+        # numprocs_max is 0 unless the pool scales with its event backlog
+        self.numprocs_min = numprocs_min
+        self.numprocs_max = numprocs_max
+        self.numprocs_idle_secs = numprocs_idle_secs
 
     def __eq__(self, other):
         if not isinstance(other, EventListenerPoolConfig):
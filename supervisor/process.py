@@ -2,10 +2,13 @@ import os
 import sys
 import time
 import errno
+import re
 import shlex
+import fnmatch
 import StringIO
 import traceback
 import signal
+from collections import deque
 
 from supervisor.medusa import asyncore_25 as asyncore
 
@@ -19,12 +22,29 @@ from supervisor.options import signame
 from supervisor.options import ProcessException, BadCommand
 
 from supervisor.dispatchers import EventListenerStates
+from supervisor.dispatchers import PTriggerDispatcher
 
 from supervisor import events
 
 from supervisor.datatypes import RestartUnconditionally
 
+# the fd on which a program with notify_ready set reports that it is ready
+NOTIFY_FD = 3
+
 from supervisor.socket_manager import SocketManager
+from supervisor.spool import EventSpool
+from supervisor.metrics import PoolMetrics
+from supervisor.healthcheck import HealthCheck
+
+# an autoscaling pool whose listeners are busy this fraction of the time
+# is short of listeners
+AUTOSCALE_BUSY = 0.8
+
+# the states in which a listener held in standby may be started again
+STANDBY_STARTABLE_STATES = (ProcessStates.STOPPED,
+                            ProcessStates.EXITED,
+                            ProcessStates.FATAL,
+                            ProcessStates.BACKOFF)
 
 class Subprocess:
 
@@ -37,6 +57,8 @@ class Subprocess:
     state = None # process state code
     listener_state = None # listener state code (if we're an event listener)
     event = None # event currently being processed (if we're an event listener)
+    batch = None # events being processed (if we're a batching listener)
+    window = None # events sent and not yet answered (if we're windowed)
     laststart = 0 # Last time the subprocess was started; 0 if never
     laststop = 0  # Last time the subprocess was stopped; 0 if never
     delay = 0 # If nonzero, delay starting or killing until this time
@@ -49,6 +71,10 @@ class Subprocess:
     exitstatus = None # status attached to dead process by finsh()
     spawnerr = None # error message attached by spawn() if any
     group = None # ProcessGroup instance if process is in the group
+    output_listeners = None # callables passed (process, channel, data) logged
+    dropped_lines = 0 # lines of output discarded by stdout/stderr_filter_*
+    dropped_bytes = 0 # bytes of output discarded by stdout/stderr_filter_*
+    healthcheck = None # HealthCheck instance if the program has a healthcheck
 
     def __init__(self, config):
         """Constructor.
@@ -58,7 +84,10 @@ class Subprocess:
         self.config = config
         self.dispatchers = {}
         self.pipes = {}
+        self.output_listeners = []
         self.state = ProcessStates.STOPPED
+        if config.healthcheck:
+            self.healthcheck = HealthCheck(self)
 
     def removelogs(self):
         for dispatcher in self.dispatchers.values():
@@ -70,6 +99,22 @@ class Subprocess:
             if hasattr(dispatcher, 'reopenlogs'):
                 dispatcher.reopenlogs()
 
+    def flush_log_events(self, now=None):
+        for dispatcher in self.dispatchers.values():
+            if hasattr(dispatcher, 'flush_log_events'):
+                dispatcher.flush_log_events(now)
+
+    def next_wakeup(self):
+        """ When output held back for coalescing must be sent as a log
+        event, or None """
+        wakeup = None
+        for dispatcher in self.dispatchers.values():
+            if getattr(dispatcher, 'events_buffer', None):
+                deadline = dispatcher.events_deadline
+                if wakeup is None or deadline < wakeup:
+                    wakeup = deadline
+        return wakeup
+
     def drain(self):
         for dispatcher in self.dispatchers.values():
             # note that we *must* call readable() for every
@@ -272,9 +317,18 @@ class Subprocess:
             options.dup2(self.pipes['child_stdout'], 2)
         else:
             options.dup2(self.pipes['child_stderr'], 2)
-        for i in range(3, options.minfds):
+        for i in range(self._prepare_notify_fd(), options.minfds):
             options.close_fd(i)
 
+    def _prepare_notify_fd(self):
+        # put the child's end of the notify pipe, if any, on NOTIFY_FD;
+        # return the first fd after the ones the child is to keep
+        child_notify = self.pipes.get('child_notify')
+        if child_notify is None:
+            return 3
+        self.config.options.dup2(child_notify, NOTIFY_FD)
+        return NOTIFY_FD + 1
+
     def _spawn_as_child(self, filename, argv):
         options = self.config.options
         try:
@@ -310,6 +364,8 @@ class Subprocess:
             env['SUPERVISOR_PROCESS_NAME'] = self.config.name
             if self.group:
                 env['SUPERVISOR_GROUP_NAME'] = self.group.config.name
+            if self.pipes.get('child_notify') is not None:
+                env['SUPERVISOR_NOTIFY_FD'] = str(NOTIFY_FD)
             if self.config.environment is not None:
                 env.update(self.config.environment)
 
@@ -351,6 +407,18 @@ class Subprocess:
         self.administrative_stop = 1
         return self.kill(self.config.stopsignal)
 
+    def report_ready(self):
+        """ The process has written READY=1 to its notify pipe: it is
+        RUNNING without waiting for startsecs to pass """
+        if self.state != ProcessStates.STARTING:
+            return
+        self.delay = 0
+        self.backoff = 0
+        self.change_state(ProcessStates.RUNNING)
+        self.config.options.logger.info(
+            'success: %s entered RUNNING state, process reported that it '
+            'was ready' % self.config.name)
+
     def give_up(self):
         self.delay = 0
         self.backoff = 0
@@ -421,10 +489,47 @@ class Subprocess:
 
         return None
 
+    def signal(self, sig):
+        """Send a signal to the subprocess without stopping it: unlike
+        kill, the process stays in the state it is in.
+
+        Return None if the signal was sent, or an error message string
+        if an error occurred or if the subprocess is not running.
+        """
+        options = self.config.options
+        if not self.pid:
+            msg = ("attempted to send %s sig %s but it wasn't running" %
+                   (self.config.name, signame(sig)))
+            options.logger.debug(msg)
+            return msg
+
+        options.logger.debug('sending %s (pid %s) sig %s'
+                             % (self.config.name, self.pid, signame(sig)))
+
+        self._assertInState(ProcessStates.RUNNING,ProcessStates.STARTING,
+                            ProcessStates.STOPPING)
+
+        try:
+            options.kill(self.pid, sig)
+        except:
+            io = StringIO.StringIO()
+            traceback.print_exc(file=io)
+            tb = io.getvalue()
+            msg = 'unknown problem sending sig %s (%s):%s' % (
+                self.config.name, self.pid, tb)
+            options.logger.critical(msg)
+            return msg
+
+        return None
+
     def finish(self, pid, sts):
         """ The process was reaped and we need to report and manage its state
         """
         self.drain()
+        for dispatcher in self.dispatchers.values():
+            if hasattr(dispatcher, 'flush_output_filter'):
+                dispatcher.flush_output_filter()
+        self.flush_log_events()
 
         es, msg = decode_wait_status(sts)
 
@@ -432,7 +537,10 @@ class Subprocess:
         self.laststop = now
         processname = self.config.name
 
-        tooquickly = now - self.laststart < self.config.startsecs
+        # a process which reported that it was ready is RUNNING already,
+        # however soon it exits
+        tooquickly = (now - self.laststart < self.config.startsecs and
+                      self.state == ProcessStates.STARTING)
         exit_expected = es in self.config.exitcodes
 
         if self.killing:
@@ -498,6 +606,16 @@ class Subprocess:
             # state when finish() was called.
             events.notify(events.EventRejectedEvent(self, self.event))
             self.event = None
+        if self.batch is not None:
+            # each rejected event is rebuffered at the head, so reject
+            # them newest first to keep them in order
+            for event in reversed(self.batch):
+                events.notify(events.EventRejectedEvent(self, event))
+            self.batch = None
+        if self.window:
+            for event in reversed(self.window):
+                events.notify(events.EventRejectedEvent(self, event))
+            self.window = []
 
     def set_uid(self):
         if self.config.uid is None:
@@ -524,6 +642,9 @@ class Subprocess:
 
         logger = self.config.options.logger
 
+        # send coalesced log events which have waited long enough
+        self.flush_log_events(now)
+
         if self.config.options.mood > SupervisorStates.RESTARTING:
             # dont start any processes if supervisor is shutting down
             if state == ProcessStates.EXITED:
@@ -579,6 +700,9 @@ class Subprocess:
                                                       self.pid))
                 self.kill(signal.SIGKILL)
 
+        if self.healthcheck is not None:
+            self.healthcheck.transition(now)
+
 class FastCGISubprocess(Subprocess):
     """Extends Subprocess class to handle FastCGI subprocesses"""
 
@@ -637,7 +761,7 @@ class FastCGISubprocess(Subprocess):
             options.dup2(self.pipes['child_stdout'], 2)
         else:
             options.dup2(self.pipes['child_stderr'], 2)
-        for i in range(3, options.minfds):
+        for i in range(self._prepare_notify_fd(), options.minfds):
             options.close_fd(i)
 
 class ProcessGroupBase:
@@ -685,12 +809,31 @@ class ProcessGroupBase:
         return [ x for x in self.processes.values() if x.get_state() not in
                  STOPPED_STATES ]
 
+    def in_standby(self, process):
+        """ Whether the group holds the process stopped on purpose """
+        return False
+
+    def next_wakeup(self):
+        """ When the group next has work to do that no fd will wake the
+        mainloop for, or None """
+        wakeups = [ process.next_wakeup() for process in
+                    self.processes.values() ]
+        wakeups = [ wakeup for wakeup in wakeups if wakeup is not None ]
+        if not wakeups:
+            return None
+        return min(wakeups)
+
     def get_dispatchers(self):
         dispatchers = {}
         for process in self.processes.values():
             dispatchers.update(process.dispatchers)
+            if process.healthcheck is not None:
+                dispatchers.update(process.healthcheck.get_dispatchers())
         return dispatchers
 
+    def before_remove(self):
+        pass
+
 class ProcessGroup(ProcessGroupBase):
     def transition(self):
         for proc in self.processes.values():
@@ -710,34 +853,211 @@ class FastCGIProcessGroup(ProcessGroup):
         except Exception, e:
             raise ValueError('Could not create FastCGI socket %s: %s' % (self.socket_manager.config(), e))
 
+MAX_RETRY_DELAY = 60 # seconds, the longest a rejected event is held back
+
 class EventListenerPool(ProcessGroupBase):
     def __init__(self, config):
         ProcessGroupBase.__init__(self, config)
-        self.event_buffer = []
+        # a deque so that taking the oldest event, rebuffering a rejected
+        # one at the head and discarding on overflow are all O(1)
+        self.event_buffer = deque()
+        self.buffer_high_water = 0 # largest len(event_buffer) seen
+        self.buffer_overflows = 0 # events discarded because it was full
+        if config.window_size > 1:
+            # each listener may be sent several events before it answers
+            for process in self.processes.values():
+                process.window = []
+        # listeners in the order they became READY, so that the one which
+        # has waited longest is sent the next event without a scan
+        self.ready_listeners = deque()
+        self.ready_ids = {} # id() of each process in ready_listeners
+        # names of the processes an autoscaling pool keeps stopped
+        self.standby = {}
+        if config.numprocs_max:
+            for pconfig in config.process_configs[config.numprocs_min:]:
+                self.standby[pconfig.name] = True
+        self.idle_since = None # when the pool last became idle
+        # (when, busy seconds) of the active listeners at the start of
+        # the current busy measurement, and how busy they were during the
+        # last one (None before the first has ended); see _measureBusy
+        self.busy_sample = None
+        self.busy_fraction = None
+        # compiled once so that unwanted events are cheap to turn away
+        self.process_filter = _compileGlobs(config.filter_processes)
+        self.group_filter = _compileGlobs(config.filter_groups)
+        # rejected events waiting out their retry_delay, as (due, event)
+        self.retry_events = []
+        # events rejected more than max_retries times
+        self.dead_letters = deque()
+        # holds the events which overflow event_buffer, if configured
+        self.spool = None
+        if config.spool_file:
+            try:
+                self.spool = EventSpool(config.spool_file,
+                                        config.spool_maxbytes)
+            except (IOError, OSError), why:
+                config.options.logger.error(
+                    'pool %s cannot open event spool %s: %s' % (
+                    config.name, config.spool_file, why))
+        self.metrics = PoolMetrics(time.time())
         for event_type in self.config.pool_events:
             events.subscribe(event_type, self._acceptEvent)
         events.subscribe(events.EventRejectedEvent, self.handle_rejected)
+        events.subscribe(events.Tick60Event, self._reportMetrics)
         self.serial = -1
         self.last_dispatch = 0
         self.dispatch_throttle = 0 # in seconds: .00195 is an interesting one
+        # wakes up the mainloop when an event is accepted, so that it is
+        # dispatched without waiting for select to time out
+        self.trigger = PTriggerDispatcher(self)
+        # the parts of the envelope header which are the same for every
+        # event this pool sends, see _eventEnvelope
+        self.envelope_header = (
+            'ver:3.0 server:%s serial:%%s pool:%s poolserial:%%s '
+            'eventname:%%s len:%%s\n' % (
+            config.options.identifier.replace('%', '%%'),
+            config.name.replace('%', '%%')))
+        self.batch_header = 'ver:3.1 server:%s pool:%s batch:%%s len:%%s\n' % (
+            config.options.identifier.replace('%', '%%'),
+            config.name.replace('%', '%%'))
+        self.batch_deadline = 0 # when a partial batch must be sent
+
+    def get_dispatchers(self):
+        dispatchers = ProcessGroupBase.get_dispatchers(self)
+        dispatchers[self.trigger.fd] = self.trigger
+        return dispatchers
+
+    def before_remove(self):
+        for event_type in self.config.pool_events:
+            events.unsubscribe(event_type, self._acceptEvent)
+        events.unsubscribe(events.EventRejectedEvent, self.handle_rejected)
+        events.unsubscribe(events.Tick60Event, self._reportMetrics)
+        self.trigger.close()
+        if self.spool is not None:
+            self.spool.close()
 
     def handle_rejected(self, event):
         process = event.process
         procs = self.processes.values()
         if process in procs: # this is one of our processes
+            if process.state != ProcessStates.RUNNING:
+                # it died with the event in flight, which says nothing
+                # about the event: send it again without counting it
+                # against max_retries or waiting out retry_delay
+                self.metrics.idle(process.config.name, time.time())
+                self._acceptEvent(event.event, head=True)
+                self.metrics.rebuffered += 1
+            else:
+                self.metrics.rejected += 1
+                self._retryEvent(event.event)
+
+    def _retryEvent(self, event):
+        pool_name = self.config.name
+        if not hasattr(event, 'pool_rejections'):
+            event.pool_rejections = {}
+        rejections = event.pool_rejections.get(pool_name, 0) + 1
+        event.pool_rejections[pool_name] = rejections
+
+        max_retries = self.config.max_retries
+        if max_retries and rejections > max_retries:
+            self._deadLetter(event)
+        elif self.config.retry_delay:
+            # hold the event back without holding up the ones behind it
+            delay = self.config.retry_delay * 2 ** (rejections - 1) / 1000.0
+            delay = min(delay, MAX_RETRY_DELAY)
+            self.retry_events.append((time.time() + delay, event))
+            self.metrics.rebuffered += 1
+        else:
             # rebuffer the event
-            self._acceptEvent(event.event, head=True)
+            self._acceptEvent(event, head=True)
+            self.metrics.rebuffered += 1
+
+    def _requeueRetries(self, now=None):
+        # rebuffer the rejected events whose retry_delay has passed
+        if not self.retry_events:
+            return
+        if now is None:
+            now = time.time()
+        waiting = []
+        for due, event in self.retry_events:
+            if due <= now:
+                self._acceptEvent(event, head=True)
+            else:
+                waiting.append((due, event))
+        self.retry_events = waiting
+
+    def next_wakeup(self):
+        # the mainloop must not sleep through a retry_delay, nor hold a
+        # partial batch past max_batch_latency
+        wakeups = [ due for due, event in self.retry_events ]
+        wakeup = ProcessGroupBase.next_wakeup(self)
+        if wakeup is not None:
+            wakeups.append(wakeup)
+        if (self.config.batch_size > 1 and self.config.max_batch_latency and
+            0 < len(self.event_buffer) < self.config.batch_size and
+            self.batch_deadline > time.time()):
+            # once it has passed, the batch is sent by the next transition
+            # with a listener ready, which its READY wakes the mainloop for
+            wakeups.append(self.batch_deadline)
+        if not wakeups:
+            return None
+        return min(wakeups)
+
+    def _deadLetter(self, event):
+        pool_name = self.config.name
+        logger = self.config.options.logger
+        if self.config.dead_letter_size < 1:
+            logger.error(
+                'pool %s discarding event %s, rejected %s times' % (
+                pool_name, event.serial, event.pool_rejections[pool_name]))
+            return
+        if len(self.dead_letters) >= self.config.dead_letter_size:
+            discarded = self.dead_letters.popleft()
+            logger.error(
+                'pool %s dead letter queue is full, discarding event %s' % (
+                pool_name, discarded.serial))
+        self.dead_letters.append(event)
+        logger.warn(
+            'pool %s moved event %s to the dead letter queue after %s '
+            'rejections' % (pool_name, event.serial,
+                            event.pool_rejections[pool_name]))
+
+    def replay_dead_letters(self):
+        """ Buffer the dead letters again as new events, oldest first, and
+        return how many there were """
+        dead_letters = self.dead_letters
+        self.dead_letters = deque()
+        for event in dead_letters:
+            event.pool_rejections[self.config.name] = 0
+            self._acceptEvent(event)
+        return len(dead_letters)
 
     def transition(self):
+        self._requeueRetries()
         processes = self.processes.values()
         dispatch_capable = False
         for process in processes:
+            if self.standby.has_key(process.config.name):
+                state = process.get_state()
+                if (state in STOPPED_STATES or
+                    state == ProcessStates.BACKOFF):
+                    # held back by autoscaling, or it failed to start when
+                    # the pool scaled up: don't let it autostart
+                    continue
+                if state != ProcessStates.STOPPING:
+                    # started by hand, it's part of the pool again
+                    del self.standby[process.config.name]
             process.transition()
             # this is redundant, we do it in _dispatchEvent too, but we
             # want to reduce function call overhead
             if process.state == ProcessStates.RUNNING:
                 if process.listener_state == EventListenerStates.READY:
                     dispatch_capable = True
+                    # the dispatcher queues a listener when it becomes
+                    # READY; this catches one made READY any other way
+                    self.listener_ready(process)
+        if self.config.numprocs_max:
+            self._autoscale(dispatch_capable)
         if dispatch_capable:
             if self.dispatch_throttle:
                 now = time.time()
@@ -745,22 +1065,244 @@ class EventListenerPool(ProcessGroupBase):
                     return
             self.dispatch()
 
+    def _autoscale(self, ready, now=None):
+        if now is None:
+            now = time.time()
+        active = self._activeListeners()
+        self._measureBusy(active, now)
+        busy = self.busy_fraction
+        backlog = len(self.event_buffer)
+        if self.spool is not None:
+            backlog += self.spool.pending
+        if backlog and (not ready or
+                        (busy is not None and busy >= AUTOSCALE_BUSY)):
+            # events are waiting, and every listener is busy now or the
+            # listeners have been busy nearly all the time lately
+            self.idle_since = None
+            self._scaleUp()
+        elif ready and not backlog:
+            if self.idle_since is None:
+                self.idle_since = now
+            elif now - self.idle_since >= self.config.numprocs_idle_secs:
+                self.idle_since = now
+                # the work of the listener stopped falls to the others,
+                # which must not be left nearly always busy
+                if (busy is None or len(active) < 2 or
+                    busy * len(active) / (len(active) - 1) < AUTOSCALE_BUSY):
+                    self._scaleDown()
+        else:
+            self.idle_since = None
+
+    def _activeListeners(self):
+        """ The names of the RUNNING listeners autoscaling has not stopped """
+        active = []
+        for name, process in self.processes.items():
+            if (not self.standby.has_key(name) and
+                process.get_state() == ProcessStates.RUNNING):
+                active.append(name)
+        return active
+
+    def _measureBusy(self, active, now):
+        """ Update busy_fraction, the fraction of the time the active
+        listeners spent busy, once every numprocs_idle_secs """
+        busy = self.metrics.busy_seconds(active, now)
+        if self.busy_sample is None:
+            self.busy_sample = (now, busy)
+            return
+        since, busy_then = self.busy_sample
+        elapsed = now - since
+        if elapsed < self.config.numprocs_idle_secs:
+            return
+        if active:
+            self.busy_fraction = max(0.0, min(1.0, float(busy - busy_then) /
+                                              (elapsed * len(active))))
+        else:
+            self.busy_fraction = None
+        self.busy_sample = (now, busy)
+
+    def in_standby(self, process):
+        return self.standby.has_key(process.config.name)
+
+    def _scaleUp(self):
+        standby = []
+        for pconfig in self.config.process_configs:
+            process = self.processes[pconfig.name]
+            if not self.standby.has_key(pconfig.name):
+                if process.get_state() == ProcessStates.STARTING:
+                    # wait for the last one we started to come up
+                    return
+            elif process.get_state() in STANDBY_STARTABLE_STATES:
+                # not one still STOPPING after being scaled down
+                standby.append(process)
+        if standby:
+            process = standby[0]
+            self.config.options.logger.info(
+                'pool %s is congested, starting %s' % (
+                self.config.name, process.config.name))
+            if process.spawn():
+                del self.standby[process.config.name]
+
+    def _scaleDown(self):
+        active = [ pconfig for pconfig in self.config.process_configs
+                   if not self.standby.has_key(pconfig.name) ]
+        if len(active) <= self.config.numprocs_min:
+            return
+        active.reverse()
+        for pconfig in active:
+            process = self.processes[pconfig.name]
+            if (process.get_state() == ProcessStates.RUNNING and
+                process.listener_state == EventListenerStates.READY):
+                self.standby[pconfig.name] = True
+                self.config.options.logger.info(
+                    'pool %s is idle, stopping %s' % (
+                    self.config.name, pconfig.name))
+                process.stop()
+                return
+
     def dispatch(self):
+        self._requeueRetries()
+        if self.config.batch_size > 1:
+            self._dispatchBatches()
+        else:
+            while self.event_buffer:
+                # dispatch the oldest event
+                event = self.event_buffer.popleft()
+                ok = self._dispatchEvent(event)
+                if not ok:
+                    # if we can't dispatch an event, rebuffer it and stop
+                    # trying to process any further events in the buffer
+                    self._acceptEvent(event, head=True)
+                    break
+                self._drainSpool()
+        self.last_dispatch = time.time()
+
+    def _dispatchBatches(self):
+        batch_size = self.config.batch_size
         while self.event_buffer:
-            # dispatch the oldest event
-            event = self.event_buffer.pop(0)
-            ok = self._dispatchEvent(event)
+            if (len(self.event_buffer) < batch_size and
+                self.config.max_batch_latency and
+                time.time() < self.batch_deadline):
+                # give the batch a chance to fill up
+                break
+            # dispatch the oldest events
+            batch = []
+            while self.event_buffer and len(batch) < batch_size:
+                batch.append(self.event_buffer.popleft())
+            ok = self._dispatchBatch(batch)
             if not ok:
-                # if we can't dispatch an event, rebuffer it and stop trying
-                # to process any further events in the buffer
-                self._acceptEvent(event, head=True)
+                batch.reverse()
+                for event in batch:
+                    self._acceptEvent(event, head=True)
                 break
-        self.last_dispatch = time.time()
+            self._drainSpool()
+
+    def _drainSpool(self):
+        # move spooled events into the room dispatching has made
+        spool = self.spool
+        if spool is None:
+            return
+        buffer_size = self.config.buffer_size
+        while spool.pending and len(self.event_buffer) < buffer_size:
+            self.event_buffer.append(spool.read(self.config.name))
+
+    def listener_answered(self, process, answered):
+        """ Record that a listener has sent the results for events """
+        now = time.time()
+        pool_name = self.config.name
+        latency = self.metrics.result_latency
+        for event in answered:
+            sent = getattr(event, 'pool_times', {}).get(pool_name)
+            if sent is not None:
+                latency.add((now - sent) * 1000)
+        if not process.window:
+            self.metrics.idle(process.config.name, now)
+
+    def _recordDispatch(self, process, sent):
+        now = time.time()
+        pool_name = self.config.name
+        latency = self.metrics.enqueue_latency
+        for event in sent:
+            if not hasattr(event, 'pool_times'):
+                # read back from the spool, which doesn't keep the time
+                event.pool_times = {}
+            else:
+                queued = event.pool_times.get(pool_name)
+                if queued is not None:
+                    latency.add((now - queued) * 1000)
+            event.pool_times[pool_name] = now
+        self.metrics.busy(process.config.name, now)
+
+    def get_metrics(self, now=None, roll=False):
+        """ The pool's metrics as a dict of plain values; roll starts a
+        new period for the events per second figures """
+        if now is None:
+            now = time.time()
+        metrics = self.metrics
+        listeners = self.processes.keys()
+        return {'rejected': metrics.rejected,
+                'rebuffered': metrics.rebuffered,
+                'enqueue_latency': _latencyStats(metrics.enqueue_latency),
+                'result_latency': _latencyStats(metrics.result_latency),
+                'accepted': metrics.accepted.copy(),
+                'rates': metrics.rates(now, roll),
+                'busy': metrics.busy_ratios(listeners, now)}
+
+    def _reportMetrics(self, tick):
+        stats = self.get_metrics(roll=True)
+        stats['depth'] = len(self.event_buffer)
+        stats['overflows'] = self.buffer_overflows
+        events.notify(events.EventPoolStatsEvent(self.config.name, stats))
+
+    def listener_ready(self, process):
+        """ Queue a listener which has become READY to be sent events """
+        if not self.ready_ids.has_key(id(process)):
+            self.ready_ids[id(process)] = True
+            self.ready_listeners.append(process)
+
+    def _nextListener(self):
+        """ Dequeue the listener which has been READY longest, skipping
+        any which have died or changed state since they were queued """
+        while self.ready_listeners:
+            process = self.ready_listeners.popleft()
+            del self.ready_ids[id(process)]
+            if (process.state == ProcessStates.RUNNING and
+                process.listener_state == EventListenerStates.READY):
+                return process
+        return None
+
+    def _wantsEvent(self, event):
+        """ Apply the pool's events_filter_* options to a new event """
+        process = getattr(event, 'process', None)
+        if process is None:
+            # not about a process, e.g. TICK or SUPERVISOR_STATE_CHANGE
+            return True
+        if self.process_filter is not None:
+            if self.process_filter.match(process.config.name) is None:
+                return False
+        if self.group_filter is not None:
+            if process.group is None:
+                return False
+            if self.group_filter.match(process.group.config.name) is None:
+                return False
+        expected = self.config.filter_expected
+        if expected is not None:
+            if isinstance(event, events.ProcessStateExitedEvent):
+                if bool(event.expected) != expected:
+                    return False
+        return True
 
     def _acceptEvent(self, event, head=False):
+        if not head and not self._wantsEvent(event):
+            return
         # events are required to be instances
         # this has a side effect to fail with an attribute error on 'old style' classes
         event_type = event.__class__ 
+        if not head:
+            self.metrics.accept(events.getEventNameByType(event_type))
+        if not hasattr(event, 'pool_times'):
+            event.pool_times = {}
+        # when the event started waiting in this pool's buffer
+        event.pool_times[self.config.name] = time.time()
         if not hasattr(event, 'serial'):
             event.serial = new_serial(GlobalSerial)
         if not hasattr(event, 'pool_serials'):
@@ -772,62 +1314,151 @@ class EventListenerPool(ProcessGroupBase):
                 'rebuffering event %s for pool %s (bufsize %s)' % (
                 (event.serial, self.config.name, len(self.event_buffer))))
 
-        if len(self.event_buffer) >= self.config.buffer_size:
+        full = len(self.event_buffer) >= self.config.buffer_size
+        if self.spool is not None:
+            if not head and (full or self.spool.pending):
+                # once one event is spooled, later ones must follow it
+                self._spoolEvent(event)
+                return
+            if head:
+                # a rebuffered event is never discarded, there are at
+                # most as many of them as events sent to listeners
+                self.event_buffer.appendleft(event)
+                self._updateHighWater()
+                return
+
+        if full:
             if self.event_buffer:
                 # discard the oldest event
-                discarded_event = self.event_buffer.pop(0)
+                discarded_event = self.event_buffer.popleft()
+                self.buffer_overflows += 1
                 self.config.options.logger.error(
                     'pool %s event buffer overflowed, discarding event %s' % (
                     (self.config.name, discarded_event.serial)))
         if head:
-            self.event_buffer.insert(0, event)
+            self.event_buffer.appendleft(event)
         else:
             self.event_buffer.append(event)
+            if (len(self.event_buffer) == 1 and
+                self.config.max_batch_latency):
+                self.batch_deadline = (time.time() +
+                                       self.config.max_batch_latency / 1000.0)
+            # a rebuffered event is dispatched by a transition() that is
+            # already underway, a new one may arrive after ours has run
+            self.trigger.trigger()
+        self._updateHighWater()
+
+    def _updateHighWater(self):
+        depth = len(self.event_buffer)
+        if depth > self.buffer_high_water:
+            self.buffer_high_water = depth
+
+    def _spoolEvent(self, event):
+        if not hasattr(event, 'rendered_payload'):
+            event.rendered_payload = str(event)
+        if not self.spool.append(event, self.config.name):
+            self.buffer_overflows += 1
+            self.config.options.logger.error(
+                'pool %s event spool is full, discarding event %s' % (
+                (self.config.name, event.serial)))
 
     def _dispatchEvent(self, event):
         pool_serial = event.pool_serials[self.config.name]
 
-        for process in self.processes.values():
-            if process.state != ProcessStates.RUNNING:
+        while 1:
+            process = self._nextListener()
+            if process is None:
+                return False
+            if not hasattr(event, 'rendered_payload'):
+                # render once, however many pools or retries send it
+                event.rendered_payload = str(event)
+            payload = event.rendered_payload
+            try:
+                event_type = event.__class__
+                serial = event.serial
+                envelope = self._eventEnvelope(event_type, serial,
+                                               pool_serial, payload)
+                process.write(envelope)
+            except OSError, why:
+                if why[0] != errno.EPIPE:
+                    raise
                 continue
-            if process.listener_state == EventListenerStates.READY:
-                payload = str(event)
-                try:
-                    event_type = event.__class__
-                    serial = event.serial
-                    envelope = self._eventEnvelope(event_type, serial,
-                                                   pool_serial, payload)
-                    process.write(envelope)
-                except OSError, why:
-                    if why[0] != errno.EPIPE:
-                        raise
-                    continue
 
+            if process.window is None:
                 process.listener_state = EventListenerStates.BUSY
                 process.event = event
-                self.config.options.logger.debug(
-                    'event %s sent to listener %s' % (
-                    event.serial, process.config.name))
-                return True
+            else:
+                # a windowed listener stays READY until its window is
+                # full, and goes to the back of the queue meanwhile
+                process.window.append(event)
+                if len(process.window) >= self.config.window_size:
+                    process.listener_state = EventListenerStates.BUSY
+                else:
+                    self.listener_ready(process)
+            self._recordDispatch(process, [event])
+            self.config.options.logger.debug(
+                'event %s sent to listener %s' % (
+                event.serial, process.config.name))
+            return True
+
+    def _dispatchBatch(self, batch):
+        pool_name = self.config.name
+        envelope = None
+
+        while 1:
+            process = self._nextListener()
+            if process is None:
+                return False
+            if envelope is None:
+                envelopes = []
+                for event in batch:
+                    if not hasattr(event, 'rendered_payload'):
+                        event.rendered_payload = str(event)
+                    envelopes.append(self._eventEnvelope(
+                        event.__class__, event.serial,
+                        event.pool_serials[pool_name],
+                        event.rendered_payload))
+                body = ''.join(envelopes)
+                envelope = self.batch_header % (len(batch), len(body))
+                envelope = envelope + body
+            try:
+                process.write(envelope)
+            except OSError, why:
+                if why[0] != errno.EPIPE:
+                    raise
+                continue
 
-        return False
+            process.listener_state = EventListenerStates.BUSY
+            process.batch = batch
+            self._recordDispatch(process, batch)
+            self.config.options.logger.debug(
+                'events %s sent to listener %s' % (
+                ', '.join([ str(event.serial) for event in batch ]),
+                process.config.name))
+            return True
 
     def _eventEnvelope(self, event_type, serial, pool_serial, payload):
         event_name = events.getEventNameByType(event_type)
-        payload_len = len(payload)
-        D = {
-            'ver':'3.0',
-            'sid':self.config.options.identifier,
-            'serial':serial,
-            'pool_name':self.config.name,
-            'pool_serial':pool_serial,
-            'event_name':event_name,
-            'len':payload_len,
-            'payload':payload,
-             }
-        return ('ver:%(ver)s server:%(sid)s serial:%(serial)s '
-                'pool:%(pool_name)s poolserial:%(pool_serial)s '
-                'eventname:%(event_name)s len:%(len)s\n%(payload)s' % D)
+        header = self.envelope_header % (serial, pool_serial, event_name,
+                                         len(payload))
+        return header + payload
+
+def _latencyStats(histogram):
+    return {'count': histogram.count,
+            'mean_ms': histogram.mean(),
+            'p50_ms': histogram.percentile(50),
+            'p90_ms': histogram.percentile(90),
+            'p99_ms': histogram.percentile(99),
+            'max_ms': histogram.max,
+            'buckets': histogram.counts[:]}
+
+def _compileGlobs(patterns):
+    """ Compile a list of glob patterns into one regular expression, or
+    return None if there are none """
+    if not patterns:
+        return None
+    return re.compile('|'.join([ '(?:%s)' % fnmatch.translate(pattern)
+                                 for pattern in patterns ]))
 
 class GlobalSerial:
     def __init__(self):
@@ -1,7 +1,10 @@
 import os
+import re
 import time
+import fnmatch
 import datetime
 import errno
+from xmlrpclib import MAXINT
 
 from supervisor.options import readFile
 from supervisor.options import tailFile
@@ -12,7 +15,10 @@ from supervisor.options import make_namespec
 from supervisor.options import split_namespec
 from supervisor.options import VERSION
 
+from supervisor.datatypes import signal_number
+
 from supervisor.events import notify
+from supervisor.events import getEventNameByType
 from supervisor.events import RemoteCommunicationEvent
 
 from supervisor.http import NOT_DONE_YET
@@ -24,12 +30,18 @@ from supervisor.states import getSupervisorStateDescription
 from supervisor.states import ProcessStates
 from supervisor.states import getProcessStateDescription
 from supervisor.states import RUNNING_STATES
+from supervisor.states import HealthStates
+from supervisor.states import getHealthStateDescription
 
 API_VERSION  = '3.0'
 
+# a name pattern with any of these in it is a glob, see _matchProcesses
+GLOB_CHARS = re.compile(r'[*?[]')
+
 class SupervisorNamespaceRPCInterface:
     def __init__(self, supervisord):
         self.supervisord = supervisord
+        self.name_index = None # see _getNameIndex
 
     def _update(self, text):
         self.update_text = text # for unit tests, mainly
@@ -201,6 +213,11 @@ class SupervisorNamespaceRPCInterface:
             raise RPCError(Faults.STILL_RUNNING)
         return True
 
+    def _checkConcurrency(self, max_concurrency):
+        if type(max_concurrency) is not int or max_concurrency < 0:
+            raise RPCError(Faults.BAD_ARGUMENTS,
+                           'max_concurrency must be an integer of 0 or more')
+
     def _getAllProcesses(self, lexical=False):
         # if lexical is true, return processes sorted in lexical order,
         # otherwise, sort in priority order
@@ -228,6 +245,63 @@ class SupervisorNamespaceRPCInterface:
 
         return all_processes
 
+    def _getNameIndex(self):
+        # the 'group:name' of every process in priority order, and where
+        # each 'group:name' and group name is in it; made again only when
+        # a group has been added or removed
+        groups = self.supervisord.process_groups
+        key = [ (name, id(group)) for name, group in groups.items() ]
+        key.sort()
+        if self.name_index is None or self.name_index[0] != key:
+            entries = []
+            positions = {}
+            for group, process in self._getAllProcesses():
+                spec = '%s:%s' % (group.config.name, process.config.name)
+                positions[spec] = [len(entries)]
+                positions.setdefault(group.config.name, []).append(
+                    len(entries))
+                entries.append((spec, group, process))
+            self.name_index = (key, entries, positions)
+        return self.name_index[1:]
+
+    def _matchProcesses(self, patterns):
+        # the (group, process) pairs which match any of the patterns, in
+        # priority order
+        if not isinstance(patterns, (list, tuple)):
+            patterns = [patterns]
+        entries, positions = self._getNameIndex()
+        matched = {}
+        for pattern in patterns:
+            if not isinstance(pattern, basestring):
+                raise RPCError(Faults.BAD_ARGUMENTS,
+                               'patterns must be strings')
+            if pattern.startswith('re:'):
+                try:
+                    regex = re.compile('(?:%s)\\Z' % pattern[3:])
+                except re.error, why:
+                    raise RPCError(Faults.BAD_ARGUMENTS,
+                                   '%s: %s' % (pattern, why))
+            elif GLOB_CHARS.search(pattern):
+                if not ':' in pattern:
+                    # a bare group name means all of the group
+                    pattern = pattern + ':*'
+                regex = re.compile(fnmatch.translate(pattern))
+            else:
+                # no wildcards, so no need to look at every process
+                regex = None
+            if regex is None:
+                found = positions.get(pattern, [])
+            else:
+                found = [ i for i in range(len(entries))
+                          if regex.match(entries[i][0]) ]
+            if not found:
+                raise RPCError(Faults.BAD_NAME, pattern)
+            for i in found:
+                matched[i] = True
+        indexes = matched.keys()
+        indexes.sort()
+        return [ entries[i][1:] for i in indexes ]
+
     def _getGroupAndProcess(self, name):
         # get process to start from name
         group_name, process_name = split_namespec(name)
@@ -278,6 +352,9 @@ class SupervisorNamespaceRPCInterface:
                 if process.get_state() in RUNNING_STATES:
                     raise RPCError(Faults.ALREADY_STARTED, name)
 
+                # taken before the process records its own start time, so
+                # that startsecs is up for us once it is RUNNING
+                spawned = time.time()
                 process.spawn()
 
                 if process.spawnerr:
@@ -288,7 +365,7 @@ class SupervisorNamespaceRPCInterface:
                 # function appears to not work (symptom: 2nd or 3rd
                 # call through, it forgets about 'started', claiming
                 # it's undeclared).
-                started.append(time.time())
+                started.append(spawned)
 
             if not wait or not startsecs:
                 return True
@@ -300,6 +377,10 @@ class SupervisorNamespaceRPCInterface:
             if state not in (ProcessStates.STARTING, ProcessStates.RUNNING):
                 raise RPCError(Faults.ABNORMAL_TERMINATION, name)
 
+            if state == ProcessStates.RUNNING and process.config.notify_ready:
+                # it reported that it was ready before startsecs
+                return True
+
             if runtime < startsecs:
                 return NOT_DONE_YET
 
@@ -308,18 +389,24 @@ class SupervisorNamespaceRPCInterface:
 
             raise RPCError(Faults.ABNORMAL_TERMINATION, name)
 
+        def waits_for(other):
+            return other is process
+
         startit.delay = 0.05
+        startit.waits_for = waits_for
         startit.rpcinterface = self
         return startit # deferred
 
-    def startProcessGroup(self, name, wait=True):
+    def startProcessGroup(self, name, wait=True, max_concurrency=0):
         """ Start all processes in the group named 'name'
 
         @param string name     The group name
         @param boolean wait    Wait for each process to be fully started
+        @param int max_concurrency  Most processes to start at once (0: all)
         @return array result   An array of process status info structs
         """
         self._update('startProcessGroup')
+        self._checkConcurrency(max_concurrency)
 
         group = self.supervisord.process_groups.get(name)
 
@@ -331,23 +418,28 @@ class SupervisorNamespaceRPCInterface:
         processes = [ (group, process) for process in processes ]
 
         startall = make_allfunc(processes, isNotRunning, self.startProcess,
-                                wait=wait)
+                                max_concurrency, tiered=True, wait=wait)
 
         startall.delay = 0.05
         startall.rpcinterface = self
         return startall # deferred
 
-    def startAllProcesses(self, wait=True):
+    def startAllProcesses(self, wait=True, max_concurrency=0):
         """ Start all processes listed in the configuration file
 
         @param boolean wait    Wait for each process to be fully started
+        @param int max_concurrency  Most processes to start at once (0: all)
         @return array result   An array of process status info structs
         """
         self._update('startAllProcesses')
+        self._checkConcurrency(max_concurrency)
 
-        processes = self._getAllProcesses()
+        # listeners an autoscaling pool holds in standby are the pool's to
+        # start when it needs them
+        processes = [ (group, process) for group, process in
+                      self._getAllProcesses() if not group.in_standby(process) ]
         startall = make_allfunc(processes, isNotRunning, self.startProcess,
-                                wait=wait)
+                                max_concurrency, tiered=True, wait=wait)
 
         startall.delay = 0.05
         startall.rpcinterface = self
@@ -395,18 +487,24 @@ class SupervisorNamespaceRPCInterface:
             else:
                 return True
 
+        def waits_for(other):
+            return other is process
+
         killit.delay = 0.2
+        killit.waits_for = waits_for
         killit.rpcinterface = self
         return killit # deferred
 
-    def stopProcessGroup(self, name, wait=True):
+    def stopProcessGroup(self, name, wait=True, max_concurrency=0):
         """ Stop all processes in the process group named 'name'
 
         @param string name     The group name
         @param boolean wait    Wait for each process to be fully stopped
+        @param int max_concurrency  Most processes to stop at once (0: all)
         @return array result   An array of process status info structs
         """
         self._update('stopProcessGroup')
+        self._checkConcurrency(max_concurrency)
 
         group = self.supervisord.process_groups.get(name)
 
@@ -418,29 +516,262 @@ class SupervisorNamespaceRPCInterface:
         processes = [ (group, process) for process in processes ]
 
         killall = make_allfunc(processes, isRunning, self.stopProcess,
-                               wait=wait)
+                               max_concurrency, wait=wait)
 
         killall.delay = 0.05
         killall.rpcinterface = self
         return killall # deferred
 
-    def stopAllProcesses(self, wait=True):
+    def stopAllProcesses(self, wait=True, max_concurrency=0):
         """ Stop all processes in the process list
 
         @param  boolean wait   Wait for each process to be fully stopped
+        @param int max_concurrency  Most processes to stop at once (0: all)
         @return array result   An array of process status info structs
         """
         self._update('stopAllProcesses')
+        self._checkConcurrency(max_concurrency)
 
         processes = self._getAllProcesses()
 
         killall = make_allfunc(processes, isRunning, self.stopProcess,
-                               wait=wait)
+                               max_concurrency, wait=wait)
 
         killall.delay = 0.05
         killall.rpcinterface = self
         return killall # deferred
 
+    def startProcesses(self, patterns, wait=True, max_concurrency=0):
+        """ Start all processes whose names match any of the patterns
+
+        @param array patterns  Patterns matched against 'group:name'
+        @param boolean wait    Wait for each process to be fully started
+        @param int max_concurrency  Most processes to start at once (0: all)
+        @return array result   An array of process status info structs
+        """
+        self._update('startProcesses')
+        self._checkConcurrency(max_concurrency)
+
+        processes = self._matchProcesses(patterns)
+        startall = make_allfunc(processes, isNotRunning, self.startProcess,
+                                max_concurrency, tiered=True, wait=wait)
+
+        startall.delay = 0.05
+        startall.rpcinterface = self
+        return startall # deferred
+
+    def stopProcesses(self, patterns, wait=True, max_concurrency=0):
+        """ Stop all processes whose names match any of the patterns
+
+        @param array patterns  Patterns matched against 'group:name'
+        @param boolean wait    Wait for each process to be fully stopped
+        @param int max_concurrency  Most processes to stop at once (0: all)
+        @return array result   An array of process status info structs
+        """
+        self._update('stopProcesses')
+        self._checkConcurrency(max_concurrency)
+
+        processes = self._matchProcesses(patterns)
+        killall = make_allfunc(processes, isRunning, self.stopProcess,
+                               max_concurrency, wait=wait)
+
+        killall.delay = 0.05
+        killall.rpcinterface = self
+        return killall # deferred
+
+    def rollingRestart(self, name, batch_size=1, min_running=0, pause=0):
+        """ Restart the processes of the group named 'name' a batch at a
+        time, so that the others keep running
+
+        @param string name      The group name
+        @param int batch_size   Most processes to restart at once
+        @param int min_running  Fewest processes to leave running
+        @param int pause        Seconds to wait between batches
+        @return array result    An array of process status info structs
+        """
+        self._update('rollingRestart')
+
+        group = self.supervisord.process_groups.get(name)
+        if group is None:
+            raise RPCError(Faults.BAD_NAME, name)
+
+        if type(batch_size) is not int or batch_size < 1:
+            raise RPCError(Faults.BAD_ARGUMENTS,
+                           'batch_size must be an integer of 1 or more')
+        if type(min_running) is not int or min_running < 0:
+            raise RPCError(Faults.BAD_ARGUMENTS,
+                           'min_running must be an integer of 0 or more')
+        if type(pause) not in (int, float) or pause < 0:
+            raise RPCError(Faults.BAD_ARGUMENTS,
+                           'pause must be a number of 0 or more')
+
+        def result(process, code, description):
+            return {'name':process.config.name,
+                    'group':group.config.name,
+                    'status':code,
+                    'description':description}
+
+        def count_running():
+            running = 0
+            for process in group.processes.values():
+                if process.get_state() == ProcessStates.RUNNING:
+                    running += 1
+            return running
+
+        if min_running and min_running >= count_running():
+            raise RPCError(Faults.BAD_ARGUMENTS,
+                           'min_running must be less than the number of '
+                           'running processes in the group')
+
+        # only processes which are up, or on their way up, are restarted;
+        # one which is stopped stays stopped
+        restartable = (ProcessStates.STARTING, ProcessStates.RUNNING,
+                       ProcessStates.BACKOFF)
+        processes = group.processes.values()
+        processes.sort()
+        waiting = [] # the processes not restarted yet
+        results = []
+        for process in processes:
+            if process.get_state() in restartable:
+                waiting.append(process)
+            else:
+                results.append(result(process, Faults.NOT_RUNNING,
+                                      'NOT_RUNNING'))
+
+        batch = [] # the processes being restarted
+        # use mutables for lexical scoping; see startProcess
+        phase = ['next'] # 'next', 'stopping' or 'starting'
+        resume = [0] # when the next batch may begin
+        failed = [False] # a process of the batch could not be restarted
+
+        def next_batch():
+            """ Take the next batch from waiting, leaving at least
+            min_running processes RUNNING """
+            allowed = count_running() - min_running
+            while waiting and len(batch) < batch_size:
+                process = waiting[0]
+                state = process.get_state()
+                if state not in restartable:
+                    # stopped since the restart began
+                    del waiting[0]
+                    results.append(result(process, Faults.NOT_RUNNING,
+                                          'NOT_RUNNING'))
+                    continue
+                if state == ProcessStates.RUNNING:
+                    if allowed < 1:
+                        break
+                    allowed -= 1
+                del waiting[0]
+                batch.append(process)
+
+        def restartit():
+            while 1:
+                if phase[0] == 'next':
+                    if not waiting or failed[0]:
+                        return results
+                    if time.time() < resume[0]:
+                        return NOT_DONE_YET
+                    batch[:] = []
+                    next_batch()
+                    if waiting and not batch:
+                        # other processes have gone down meanwhile
+                        for process in waiting:
+                            results.append(result(
+                                process, Faults.FAILED,
+                                'would leave fewer than %s processes '
+                                'RUNNING' % min_running))
+                        return results
+                    for process in batch[:]:
+                        # a process without a pid (e.g. in BACKOFF) has
+                        # nothing to stop and is simply started again
+                        if process.get_state() in (ProcessStates.STARTING,
+                                                   ProcessStates.RUNNING):
+                            msg = process.stop()
+                            if msg is not None:
+                                batch.remove(process)
+                                results.append(result(process, Faults.FAILED,
+                                                      msg))
+                                failed[0] = True
+                    phase[0] = 'stopping'
+
+                if phase[0] == 'stopping':
+                    for process in batch:
+                        if process.get_state() in (ProcessStates.STARTING,
+                                                   ProcessStates.RUNNING,
+                                                   ProcessStates.STOPPING):
+                            return NOT_DONE_YET
+                    for process in batch:
+                        process.spawn()
+                    phase[0] = 'starting'
+
+                # starting: wait for the batch to be RUNNING, letting
+                # processes which failed to start be retried until
+                # they are RUNNING or have given up
+                for process in batch:
+                    state = process.get_state()
+                    if state in (ProcessStates.STARTING,
+                                 ProcessStates.BACKOFF):
+                        return NOT_DONE_YET
+                    if state != ProcessStates.RUNNING:
+                        failed[0] = True
+                for process in batch:
+                    if process.get_state() == ProcessStates.RUNNING:
+                        results.append(result(process, Faults.SUCCESS, 'OK'))
+                    else:
+                        results.append(result(
+                            process, Faults.ABNORMAL_TERMINATION,
+                            make_namespec(group.config.name,
+                                          process.config.name)))
+                if failed[0]:
+                    # leave the rest of the group as it is
+                    return results
+                resume[0] = time.time() + pause
+                phase[0] = 'next'
+
+        def waits_for(other):
+            for process in batch:
+                if process is other:
+                    return True
+            return False
+
+        restartit.delay = 0.05
+        restartit.waits_for = waits_for
+        restartit.rpcinterface = self
+        return restartit # deferred
+
+    def signalProcesses(self, patterns, signal):
+        """ Send a signal to all processes whose names match any of the
+        patterns
+
+        @param array patterns  Patterns matched against 'group:name'
+        @param string signal   Signal name (e.g. 'HUP') or number
+        @return array result   An array of process status info structs
+        """
+        self._update('signalProcesses')
+        try:
+            sig = signal_number(signal)
+        except ValueError:
+            raise RPCError(Faults.BAD_ARGUMENTS, 'bad signal %s' % signal)
+
+        results = []
+        for group, process in self._matchProcesses(patterns):
+            result = {'name':process.config.name,
+                      'group':group.config.name,
+                      'status':Faults.SUCCESS,
+                      'description':'OK'}
+            if process.get_state() not in (ProcessStates.STARTING,
+                                           ProcessStates.RUNNING,
+                                           ProcessStates.STOPPING):
+                result['status'] = Faults.NOT_RUNNING
+                result['description'] = 'NOT_RUNNING'
+            else:
+                msg = process.signal(sig)
+                if msg is not None:
+                    result['status'] = Faults.FAILED
+                    result['description'] = msg
+            results.append(result)
+        return results
+
     def getAllConfigInfo(self):
         """ Get info about all available process configurations. Each struct
         represents a single process (i.e. groups get flattened).
@@ -474,6 +805,8 @@ class SupervisorNamespaceRPCInterface:
             now_dt = datetime.datetime(*time.gmtime(now)[:6])
             uptime = now_dt - start_dt
             desc = 'pid %s, uptime %s' % (info['pid'], uptime)
+            if info.get('health') == 'UNHEALTHY':
+                desc = desc + ', UNHEALTHY'
 
         elif state in (ProcessStates.FATAL, ProcessStates.BACKOFF):
             desc = info['spawnerr']
@@ -515,6 +848,9 @@ class SupervisorNamespaceRPCInterface:
         exitstatus = process.exitstatus or 0
         stdout_logfile = process.config.stdout_logfile or ''
         stderr_logfile = process.config.stderr_logfile or ''
+        health = HealthStates.NONE
+        if process.healthcheck is not None:
+            health = process.healthcheck.state
 
         info = {
             'name':process.config.name,
@@ -530,6 +866,10 @@ class SupervisorNamespaceRPCInterface:
             'stdout_logfile':stdout_logfile,
             'stderr_logfile':stderr_logfile,
             'pid':process.pid,
+            # XML-RPC ints are 32-bit, so clamp rather than fail
+            'dropped_lines':min(process.dropped_lines, MAXINT),
+            'dropped_bytes':min(process.dropped_bytes, MAXINT),
+            'health':getHealthStateDescription(health),
             }
 
         description = self._interpretProcessInfo(info)
@@ -769,80 +1109,188 @@ class SupervisorNamespaceRPCInterface:
 
         return True
 
-def make_allfunc(processes, predicate, func, **extra_kwargs):
-    """ Return a closure representing a function that calls a
-    function for every process, and returns a result """
+    def getEventPoolStats(self):
+        """ Get statistics about the event buffer of every event listener
+        pool.
+
+        @return array result  An array of structs, one per pool
+        """
+        self._update('getEventPoolStats')
+
+        stats = []
+        groups = self.supervisord.process_groups.values()
+        groups.sort() # asc by priority
+        for group in groups:
+            if not hasattr(group, 'event_buffer'):
+                continue # not an event listener pool
+            spooled = 0
+            if group.spool is not None:
+                spooled = group.spool.pending
+            info = group.get_metrics()
+            for key in ('rejected', 'rebuffered'):
+                info[key] = min(info[key], MAXINT)
+            for key in ('enqueue_latency', 'result_latency'):
+                latency = info[key]
+                latency['count'] = min(latency['count'], MAXINT)
+                latency['buckets'] = [ min(n, MAXINT) for n in
+                                       latency['buckets'] ]
+            for name, count in info['accepted'].items():
+                info['accepted'][name] = min(count, MAXINT)
+            info.update(
+                { 'name': group.config.name,
+                  'buffer_size': group.config.buffer_size,
+                  'depth': len(group.event_buffer),
+                  'high_water': group.buffer_high_water,
+                  'overflows': min(group.buffer_overflows, MAXINT),
+                  'spooled': spooled,
+                  'retrying': len(group.retry_events),
+                  'dead_letters': len(group.dead_letters),
+                  'standby': len(group.standby) })
+            stats.append(info)
+        return stats
+
+    def _getEventPool(self, name):
+        group = self.supervisord.process_groups.get(name)
+        if group is None or not hasattr(group, 'dead_letters'):
+            raise RPCError(Faults.BAD_NAME, name)
+        return group
 
-    callbacks = []
-    results = []
+    def getDeadLetters(self, name):
+        """ Get the events an event listener pool gave up on after they
+        were rejected more than its max_retries times, oldest first.
 
-    def allfunc(processes=processes, predicate=predicate, func=func,
-                extra_kwargs=extra_kwargs, callbacks=callbacks,
-                results=results):
-        if not callbacks:
+        @param string name  Name of the event listener pool
+        @return array result  An array of structs, one per event
+        """
+        self._update('getDeadLetters')
+        pool = self._getEventPool(name)
+
+        result = []
+        for event in pool.dead_letters:
+            payload = getattr(event, 'rendered_payload', None)
+            if payload is None:
+                payload = str(event)
+            result.append(
+                { 'serial': event.serial,
+                  'pool_serial': event.pool_serials[name],
+                  'eventname': getEventNameByType(event.__class__),
+                  'rejections': event.pool_rejections[name],
+                  'payload': payload })
+        return result
+
+    def replayDeadLetters(self, name):
+        """ Send the dead letters of an event listener pool to its
+        listeners again, as though they had just been emitted.
+
+        @param string name  Name of the event listener pool
+        @return int result  The number of events replayed
+        """
+        self._update('replayDeadLetters')
+        pool = self._getEventPool(name)
+        return pool.replay_dead_letters()
+
+    def clearDeadLetters(self, name):
+        """ Discard the dead letters of an event listener pool.
 
+        @param string name  Name of the event listener pool
+        @return int result  The number of events discarded
+        """
+        self._update('clearDeadLetters')
+        pool = self._getEventPool(name)
+        count = len(pool.dead_letters)
+        pool.dead_letters.clear()
+        return count
+
+def make_allfunc(processes, predicate, func, max_concurrency=0,
+                 tiered=False, **extra_kwargs):
+    """ Return a closure representing a function that calls a
+    function for every process, and returns a result.  The processes are
+    dealt with together, at most max_concurrency of them at once if it is
+    not 0.  If tiered, a process is not begun on until those before it
+    with a different priority are done, so a priority tier finishes
+    starting before the next one begins.  Results are in the order of
+    processes. """
+
+    waiting = [] # callbacks not called yet
+    running = [] # callbacks called which haven't finished
+    results = {} # index in processes -> result
+    created = []
+
+    def allfunc(processes=processes, predicate=predicate, func=func,
+                extra_kwargs=extra_kwargs, waiting=waiting, running=running,
+                results=results, created=created):
+        if not created:
+            # use a mutable for lexical scoping; see startProcess
+            created.append(1)
+            index = 0
             for group, process in processes:
                 name = make_namespec(group.config.name, process.config.name)
                 if predicate(process):
                     try:
                         callback = func(name, **extra_kwargs)
-                        callbacks.append((group, process, callback))
+                        waiting.append((index, group, process, callback))
                     except RPCError, e:
-                        results.append({'name':process.config.name,
-                                        'group':group.config.name,
-                                        'status':e.code,
-                                        'description':e.text})
-                        continue
-
-        if not callbacks:
-            return results
-
-        group, process, callback = callbacks.pop(0)
-
-        try:
-            value = callback()
-        except RPCError, e:
-            results.append(
-                {'name':process.config.name,
-                 'group':group.config.name,
-                 'status':e.code,
-                 'description':e.text})
+                        results[index] = {'name':process.config.name,
+                                          'group':group.config.name,
+                                          'status':e.code,
+                                          'description':e.text}
+                index = index + 1
+
+        while 1:
+            while waiting:
+                if max_concurrency and len(running) >= max_concurrency:
+                    break
+                process = waiting[0][2]
+                if tiered and running:
+                    tier = running[0][2].config.priority
+                    if process.config.priority != tier:
+                        break
+                running.append(waiting.pop(0))
+
+            # call every unfinished callback, so that each process is dealt
+            # with as soon as it is ready rather than waiting its turn
+            unfinished = []
+            for index, group, process, callback in running:
+                try:
+                    value = callback()
+                except RPCError, e:
+                    results[index] = {'name':process.config.name,
+                                      'group':group.config.name,
+                                      'status':e.code,
+                                      'description':e.text}
+                    continue
+
+                if value is NOT_DONE_YET:
+                    # it will finish eventually
+                    unfinished.append((index, group, process, callback))
+                else:
+                    results[index] = {'name':process.config.name,
+                                      'group':group.config.name,
+                                      'status':Faults.SUCCESS,
+                                      'description':'OK'}
+            finished = len(running) - len(unfinished)
+            running[:] = unfinished
+            if not (waiting and finished):
+                # nothing more can begin until something else finishes
+                break
+
+        if waiting or running:
             return NOT_DONE_YET
 
-        if value is NOT_DONE_YET:
-            # push it back into the queue; it will finish eventually
-            callbacks.append((group, process, callback))
-        else:
-            results.append(
-                {'name':process.config.name,
-                 'group':group.config.name,
-                 'status':Faults.SUCCESS,
-                 'description':'OK'}
-                )
-
-        if callbacks:
-            return NOT_DONE_YET
+        indexes = results.keys()
+        indexes.sort()
+        return [ results[index] for index in indexes ]
 
-        return results
+    def waits_for(other, running=running):
+        for index, group, process, callback in running:
+            if process is other:
+                return True
+        return False
 
-    # XXX the above implementation has a weakness inasmuch as the
-    # first call into each individual process callback will always
-    # return NOT_DONE_YET, so they need to be called twice.  The
-    # symptom of this is that calling this method causes the
-    # client to block for much longer than it actually requires to
-    # kill all of the running processes.  After the first call to
-    # the killit callback, the process is actually dead, but the
-    # above killall method processes the callbacks one at a time
-    # during the select loop, which, because there is no output
-    # from child processes after e.g. stopAllProcesses is called,
-    # is not busy, so hits the timeout for each callback.  I
-    # attempted to make this better, but the only way to make it
-    # better assumes totally synchronous reaping of child
-    # processes, which requires infrastructure changes to
-    # supervisord that are scary at the moment as it could take a
-    # while to pin down all of the platform differences and might
-    # require a C extension to the Python signal module to allow
-    # the setting of ignore flags to signals.
+    # the deferred is called again as soon as one of the processes it
+    # waits for changes state (see DeferredXMLRPCResponse), rather than
+    # only when its delay has passed
+    allfunc.waits_for = waits_for
     return allfunc
 
 def isRunning(process):
@@ -0,0 +1,90 @@
+""" An append-only file which holds the events an event listener pool
+could not fit in its memory buffer, in the order they were accepted """
+
+import os
+
+from supervisor import events
+
+# the most compact() copies at once, so that compacting a large spool
+# doesn't need as much memory as the events in it
+COMPACT_CHUNK = 1 << 16
+
+class _SpooledEvent:
+    pass
+
+class EventSpool:
+    pending = 0 # number of events written and not yet read back
+
+    def __init__(self, filename, maxbytes):
+        self.filename = filename
+        self.maxbytes = maxbytes
+        # events from a previous supervisord are not replayed: their
+        # serials would collide with the ones we are about to hand out
+        self.file = open(filename, 'w+b')
+        self.read_offset = 0
+        self.write_offset = 0
+
+    def append(self, event, pool_name):
+        """ Spool an event; return False if the spool is full """
+        payload = event.rendered_payload
+        record = '%s %s %s %s\n%s' % (
+            events.getEventNameByType(event.__class__), event.serial,
+            event.pool_serials[pool_name], len(payload), payload)
+        if self.write_offset + len(record) > self.maxbytes:
+            # compacting copies every unread event, so only do it when
+            # it frees at least half the file: each event is then copied
+            # a bounded number of times however long the spool stays full
+            if self.read_offset < self.maxbytes / 2:
+                return False
+            self.compact()
+            if self.write_offset + len(record) > self.maxbytes:
+                return False
+        self.file.seek(self.write_offset)
+        self.file.write(record)
+        self.write_offset += len(record)
+        self.pending += 1
+        return True
+
+    def read(self, pool_name):
+        """ Read back the oldest spooled event.  It is an instance of its
+        original type which carries only what is sent to a listener. """
+        self.file.seek(self.read_offset)
+        name, serial, pool_serial, size = self.file.readline().split()
+        payload = self.file.read(int(size))
+        self.read_offset = self.file.tell()
+        self.pending -= 1
+        event = _SpooledEvent()
+        event.__class__ = getattr(events.EventTypes, name)
+        event.serial = int(serial)
+        event.pool_serials = {pool_name:int(pool_serial)}
+        event.rendered_payload = payload
+        if not self.pending:
+            # everything has been read back, start over at the beginning
+            self.compact()
+        return event
+
+    def compact(self):
+        """ Move the events not yet read back to the start of the file
+        and drop the rest """
+        if not self.read_offset:
+            return
+        size = self.write_offset - self.read_offset
+        # the copy is always behind what is still to be copied, so it
+        # can be done in place one chunk at a time
+        copied = 0
+        while copied < size:
+            self.file.seek(self.read_offset + copied)
+            chunk = self.file.read(min(COMPACT_CHUNK, size - copied))
+            self.file.seek(copied)
+            self.file.write(chunk)
+            copied += len(chunk)
+        self.file.truncate(size)
+        self.read_offset = 0
+        self.write_offset = size
+
+    def close(self):
+        self.file.close()
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
@@ -50,3 +50,13 @@ def getEventListenerStateDescription(code):
         if getattr(EventListenerStates, statename) == code:
             return statename
 
+class HealthStates:
+    NONE = -1 # the process has no health check
+    UNKNOWN = 0 # not checked since it was last started
+    HEALTHY = 10 # the last check passed
+    UNHEALTHY = 20 # healthcheck_retries checks in a row failed
+
+def getHealthStateDescription(code):
+    for statename in HealthStates.__dict__:
+        if getattr(HealthStates, statename) == code:
+            return statename
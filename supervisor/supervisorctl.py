@@ -452,9 +452,18 @@ class DefaultControllerPlugin(ControllerPluginBase):
 
         supervisor = self.ctl.get_supervisor()
 
+        multiple = [ c for c in '*?[' if c in name ]
+
         if bytes is None:
+            if multiple:
+                # one merged stream of lines prefixed with process names
+                return self._tailf('/logtail-group/%s/%s' % (name, channel))
             return self._tailf('/logtail/%s/%s' % (name, channel))
 
+        elif multiple:
+            self.ctl.output('Error: tail of multiple processes requires -f')
+            return
+
         else:
             try:
                 if channel is 'stdout':
@@ -482,6 +491,8 @@ class DefaultControllerPlugin(ControllerPluginBase):
             "Ex:\n"
             "tail -f <name>\t\tContinuous tail of named process stdout\n"
             "\t\t\tCtrl-C to exit.\n"
+            "tail -f <gname>:*\tContinuous tail of all processes in group,\n"
+            "\t\t\teach line prefixed with its process name\n"
             "tail -100 <name>\tlast 100 *bytes* of process stdout\n"
             "tail <name> stderr\tlast 1600 *bytes* of process stderr"
             )
@@ -24,6 +24,8 @@ Options:
 -a/--minfds NUM -- the minimum number of file descriptors for start success
 -t/--strip_ansi -- strip ansi escape codes from process output
 --minprocs NUM  -- the minimum number of processes available for start success
+--childlog_maxfds NUM -- the maximum number of child log files to keep open
+                         at once (default 0, no limit)
 --profile_options OPTIONS -- run supervisord under profiler and output
                              results based on OPTIONS, which  is a comma-sep'd
                              list of 'cumulative', 'calls', and/or 'callers',
@@ -91,6 +93,7 @@ class Supervisor:
                 self.add_process_group(config)
             self.options.process_environment()
             self.options.openhttpservers(self)
+            self.options.openeventserver()
             self.options.setsignals()
             if (not self.options.nodaemon) and self.options.first:
                 self.options.daemonize()
@@ -128,6 +131,7 @@ class Supervisor:
     def remove_process_group(self, name):
         if self.process_groups[name].get_unstopped_processes():
             return False
+        self.process_groups[name].before_remove()
         del self.process_groups[name]
         return True
 
@@ -136,6 +140,8 @@ class Supervisor:
         pgroups = self.process_groups.values()
         for group in pgroups:
             process_map.update(group.get_dispatchers())
+        if self.options.eventserver is not None:
+            process_map.update(self.options.eventserver.get_dispatchers())
         return process_map
 
     def shutdown_report(self):
@@ -179,8 +185,6 @@ class Supervisor:
 
     def runforever(self):
         events.notify(events.SupervisorRunningEvent())
-        timeout = 1 # this cannot be fewer than the smallest TickEvent (5)
-
         socket_map = self.options.get_socket_map()
 
         while 1:
@@ -206,6 +210,7 @@ class Supervisor:
                     # killing everything), it's OK to swtop or reload
                     raise asyncore.ExitNow
 
+            timeout = self.select_timeout(pgroups)
             r, w, x = [], [], []
 
             for fd, dispatcher in combined_map.items():
@@ -250,6 +255,8 @@ class Supervisor:
                         combined_map[fd].handle_error()
 
             [ group.transition() for group  in pgroups ]
+            if self.options.eventserver is not None:
+                self.options.eventserver.transition()
 
             self.reap()
             self.handle_signal()
@@ -261,6 +268,18 @@ class Supervisor:
             if self.options.test:
                 break
 
+    def select_timeout(self, pgroups, now=None):
+        """ How long select may wait for an fd: a second at most, so that
+        ticks are on time, and less if a group has work due sooner """
+        timeout = 1
+        for group in pgroups:
+            wakeup = group.next_wakeup()
+            if wakeup is not None:
+                if now is None:
+                    now = time.time()
+                timeout = max(0, min(timeout, wakeup - now))
+        return timeout
+
     def tick(self, now=None):
         """ Send one or more 'tick' events when the timeslice related to
         the period for the event type rolls over """
@@ -361,6 +380,7 @@ def main(args=None, test=False):
         if test or (options.mood < SupervisorStates.RESTARTING):
             break
         options.close_httpservers()
+        options.close_eventserver()
         options.close_logger()
         first = False
 
@@ -30,6 +30,8 @@ class DummyOptions:
         self.rlimit_set = False
         self.setuid_called = False
         self.httpservers_opened = False
+        self.eventserver_opened = False
+        self.eventserver = None
         self.signals_set = False
         self.daemonized = False
         self.make_logger_messages = None
@@ -97,6 +99,9 @@ class DummyOptions:
     def openhttpservers(self, supervisord):
         self.httpservers_opened = True
 
+    def openeventserver(self):
+        self.eventserver_opened = True
+
     def daemonize(self):
         self.daemonized = True
 
@@ -148,7 +153,7 @@ class DummyOptions:
             from supervisor.options import NotFound
             raise NotFound('bad filename')
 
-    def make_pipes(self, stderr=True):
+    def make_pipes(self, stderr=True, notify=False):
         if self.make_pipes_error:
             raise OSError(self.make_pipes_error)
         pipes = {}
@@ -158,6 +163,8 @@ class DummyOptions:
             pipes['stderr'], pipes['child_stderr'] = (7, 8)
         else:
             pipes['stderr'], pipes['child_stderr'] = None, None
+        if notify:
+            pipes['notify'], pipes['child_notify'] = (9, 10)
         return pipes
 
     def write(self, fd, chars):
@@ -178,6 +185,9 @@ class DummyOptions:
     def close_fd(self, fd):
         self.fds_closed.append(fd)
 
+    def make_trigger(self):
+        return 98, 99
+
     def close_parent_pipes(self, pipes):
         self.parent_pipes_closed = pipes
 
@@ -373,7 +383,15 @@ class DummyProcess:
     stderr_buffer = '' # buffer of characters from child stderr output to log
     stdin_buffer = '' # buffer of characters to send to child process' stdin
     listener_state = None
+    event = None
+    batch = None
+    window = None
     group = None
+    dropped_lines = 0
+    dropped_bytes = 0
+    healthcheck = None
+    spawn_pid = 1 # returned by spawn(); None makes it fail
+    wakeup = None # returned by next_wakeup()
 
     def __init__(self, config, state=None):
         self.config = config
@@ -387,7 +405,9 @@ class DummyProcess:
         self.state = state
         self.error_at_clear = False
         self.killed_with = None
+        self.signalled_with = None
         self.drained = False
+        self.output_listeners = []
         self.stdout_buffer = ''
         self.stderr_buffer = ''
         self.stdout_logged = ''
@@ -424,14 +444,24 @@ class DummyProcess:
     def kill(self, signal):
         self.killed_with = signal
 
+    def signal(self, signal):
+        self.signalled_with = signal
+
     def spawn(self):
         self.spawned = True
         from supervisor.process import ProcessStates
-        self.state = ProcessStates.RUNNING
+        if self.spawn_pid is None:
+            self.state = ProcessStates.BACKOFF
+        else:
+            self.state = ProcessStates.RUNNING
+        return self.spawn_pid
 
     def drain(self):
         self.drained = True
 
+    def next_wakeup(self):
+        return self.wakeup
+
     def __cmp__(self, other):
         return cmp(self.config.priority, other.config.priority)
 
@@ -480,13 +510,20 @@ class DummyPConfig:
                  autorestart=True, startsecs=10, startretries=999,
                  uid=None, stdout_logfile=None, stdout_capture_maxbytes=0,
                  stdout_events_enabled=False,
+                 stdout_events_flush_ms=0, stdout_events_max_bytes=0,
+                 stdout_filter_drop=(), stdout_filter_keep=(),
                  stdout_logfile_backups=0, stdout_logfile_maxbytes=0,
                  stderr_logfile=None, stderr_capture_maxbytes=0,
                  stderr_events_enabled=False,
+                 stderr_events_flush_ms=0, stderr_events_max_bytes=0,
+                 stderr_filter_drop=(), stderr_filter_keep=(),
                  stderr_logfile_backups=0, stderr_logfile_maxbytes=0,
                  redirect_stderr=False,
                  stopsignal=None, stopwaitsecs=10, stopasgroup=False, killasgroup=False,
-                 exitcodes=(0,2), environment=None, serverurl=None):
+                 exitcodes=(0,2), environment=None, serverurl=None,
+                 notify_ready=False, healthcheck=None,
+                 healthcheck_interval=30, healthcheck_timeout=5,
+                 healthcheck_retries=3, healthcheck_restart=True):
         self.options = options
         self.name = name
         self.command = command
@@ -499,11 +536,19 @@ class DummyPConfig:
         self.stdout_logfile = stdout_logfile
         self.stdout_capture_maxbytes = stdout_capture_maxbytes
         self.stdout_events_enabled = stdout_events_enabled
+        self.stdout_events_flush_ms = stdout_events_flush_ms
+        self.stdout_events_max_bytes = stdout_events_max_bytes
+        self.stdout_filter_drop = stdout_filter_drop
+        self.stdout_filter_keep = stdout_filter_keep
         self.stdout_logfile_backups = stdout_logfile_backups
         self.stdout_logfile_maxbytes = stdout_logfile_maxbytes
         self.stderr_logfile = stderr_logfile
         self.stderr_capture_maxbytes = stderr_capture_maxbytes
         self.stderr_events_enabled = stderr_events_enabled
+        self.stderr_events_flush_ms = stderr_events_flush_ms
+        self.stderr_events_max_bytes = stderr_events_max_bytes
+        self.stderr_filter_drop = stderr_filter_drop
+        self.stderr_filter_keep = stderr_filter_keep
         self.stderr_logfile_backups = stderr_logfile_backups
         self.stderr_logfile_maxbytes = stderr_logfile_maxbytes
         self.redirect_stderr = redirect_stderr
@@ -520,6 +565,12 @@ class DummyPConfig:
         self.umask = umask
         self.autochildlogs_created = False
         self.serverurl = serverurl
+        self.notify_ready = notify_ready
+        self.healthcheck = healthcheck
+        self.healthcheck_interval = healthcheck_interval
+        self.healthcheck_timeout = healthcheck_timeout
+        self.healthcheck_retries = healthcheck_retries
+        self.healthcheck_restart = healthcheck_restart
 
     def create_autochildlogs(self):
         self.autochildlogs_created = True
@@ -531,7 +582,7 @@ class DummyPConfig:
 
     def make_dispatchers(self, proc):
         use_stderr = not self.redirect_stderr
-        pipes = self.options.make_pipes(use_stderr)
+        pipes = self.options.make_pipes(use_stderr, self.notify_ready)
         stdout_fd,stderr_fd,stdin_fd = (pipes['stdout'],pipes['stderr'],
                                         pipes['stdin'])
         dispatchers = {}
@@ -582,9 +633,23 @@ class DummyMedusaServer:
         self.logger = DummyMedusaServerLogger()
 
 class DummyMedusaChannel:
+    closed = False
     def __init__(self):
         self.server = DummyMedusaServer()
         self.producer = None
+        self.close_callbacks = []
+
+    def add_close_callback(self, callback):
+        self.close_callbacks.append(callback)
+
+    def remove_close_callback(self, callback):
+        if callback in self.close_callbacks:
+            self.close_callbacks.remove(callback)
+
+    def close(self):
+        self.closed = True
+        for callback in self.close_callbacks[:]:
+            callback()
 
     def push_with_producer(self, producer):
         self.producer = producer
@@ -909,6 +974,20 @@ class DummyPGroupConfig:
         self.after_setuid_called = False
         self.pool_events = []
         self.buffer_size = 10
+        self.batch_size = 1
+        self.max_batch_latency = 0
+        self.window_size = 1
+        self.spool_file = None
+        self.spool_maxbytes = 0
+        self.max_retries = 0
+        self.retry_delay = 0
+        self.dead_letter_size = 100
+        self.filter_processes = ()
+        self.filter_groups = ()
+        self.filter_expected = None
+        self.numprocs_min = 1
+        self.numprocs_max = 0
+        self.numprocs_idle_secs = 60
 
     def after_setuid(self):
         self.after_setuid_called = True
@@ -932,6 +1011,8 @@ class DummyProcessGroup:
         self.all_stopped = False
         self.dispatchers = {}
         self.unstopped_processes = []
+        self.standby = {}
+        self.wakeup = None
 
     def transition(self):
         self.transitioned = True
@@ -942,8 +1023,23 @@ class DummyProcessGroup:
     def get_unstopped_processes(self):
         return self.unstopped_processes
 
+    def before_remove(self):
+        self.removed = True
+
     def get_dispatchers(self):
         return self.dispatchers
+
+    def listener_answered(self, process, events):
+        self.answered = (process, events)
+
+    def in_standby(self, process):
+        return self.standby.has_key(process.config.name)
+
+    def next_wakeup(self):
+        return self.wakeup
+
+    def __cmp__(self, other):
+        return cmp(self.config.priority, other.config.priority)
         
 class DummyFCGIProcessGroup(DummyProcessGroup):
     
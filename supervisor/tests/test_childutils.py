@@ -1,3 +1,4 @@
+import os
 import sys
 import time
 import unittest
@@ -98,6 +99,35 @@ class TestEventListenerProtocol(unittest.TestCase):
         self.assertEqual(payload, 'hello')
         self.assertEqual(stdout.getvalue(), 'READY\n')
 
+    def test_wait_batch(self):
+        from supervisor.childutils import listener
+        body = ('ver:3.0 eventname:A len:5\nhello'
+                'ver:3.0 eventname:B len:3\nbye')
+        stdin = StringIO('ver:3.1 batch:2 len:%s\n%s' % (len(body), body))
+        stdout = StringIO()
+        events = listener.wait_batch(stdin, stdout)
+        self.assertEqual(events, [
+            ({'ver':'3.0', 'eventname':'A', 'len':'5'}, 'hello'),
+            ({'ver':'3.0', 'eventname':'B', 'len':'3'}, 'bye'),
+            ])
+        self.assertEqual(stdout.getvalue(), 'READY\n')
+
+    def test_wait_batch_unbatched_event(self):
+        from supervisor.childutils import listener
+        stdin = StringIO('ver:3.0 eventname:A len:5\nhello')
+        stdout = StringIO()
+        events = listener.wait_batch(stdin, stdout)
+        self.assertEqual(events, [
+            ({'ver':'3.0', 'eventname':'A', 'len':'5'}, 'hello'),
+            ])
+
+    def test_receive(self):
+        from supervisor.childutils import listener
+        stdin = StringIO('len:5\nhello')
+        headers, payload = listener.receive(stdin)
+        self.assertEqual(headers, {'len':'5'})
+        self.assertEqual(payload, 'hello')
+
     def test_token(self):
         from supervisor.childutils import listener
         from supervisor.dispatchers import PEventListenerDispatcher
@@ -122,6 +152,22 @@ class TestEventListenerProtocol(unittest.TestCase):
         listener.fail(stdout)
         self.assertEqual(stdout.getvalue(), begin + '4\nFAIL')
 
+    def test_ok_with_serial(self):
+        from supervisor.childutils import listener
+        from supervisor.dispatchers import PEventListenerDispatcher
+        begin = PEventListenerDispatcher.RESULT_TOKEN_START
+        stdout = StringIO()
+        listener.ok(stdout, serial=42)
+        self.assertEqual(stdout.getvalue(), begin + '2 42\nOK')
+
+    def test_send_results(self):
+        from supervisor.childutils import listener
+        from supervisor.dispatchers import PEventListenerDispatcher
+        begin = PEventListenerDispatcher.RESULT_TOKEN_START
+        stdout = StringIO()
+        listener.send_results(['OK', 'FAIL'], stdout)
+        self.assertEqual(stdout.getvalue(), begin + '7\nOK\nFAIL')
+
     def test_send(self):
         from supervisor.childutils import listener
         from supervisor.dispatchers import PEventListenerDispatcher
@@ -133,6 +179,187 @@ class TestEventListenerProtocol(unittest.TestCase):
         self.assertEqual(stdout.getvalue(), expected)
         
 
+class PipeTestBase(unittest.TestCase):
+    def setUp(self):
+        self.files = []
+
+    def tearDown(self):
+        for f in self.files:
+            f.close()
+
+    def _pipe(self):
+        r, w = os.pipe()
+        reader = os.fdopen(r, 'rb')
+        writer = os.fdopen(w, 'wb')
+        self.files.extend([reader, writer])
+        return reader, writer
+
+class TestEventReader(PipeTestBase):
+    def _makeOne(self, stdin, bufsize=65536):
+        from supervisor.childutils import EventReader
+        return EventReader(stdin, bufsize)
+
+    def test_read_all_waiting(self):
+        stdin, tochild = self._pipe()
+        reader = self._makeOne(stdin)
+        tochild.write('serial:1 len:5\nhelloserial:2 len:3\nbye')
+        tochild.flush()
+        self.assertEqual(reader.read(), [
+            [({'serial':'1', 'len':'5'}, 'hello')],
+            [({'serial':'2', 'len':'3'}, 'bye')],
+            ])
+
+    def test_read_in_pieces(self):
+        stdin, tochild = self._pipe()
+        reader = self._makeOne(stdin, bufsize=4)
+        tochild.write('serial:1 len:11\nhello world')
+        tochild.write('serial:2 len:0\nserial:3')
+        tochild.flush()
+        self.assertEqual(reader.read(), [
+            [({'serial':'1', 'len':'11'}, 'hello world')],
+            ])
+        self.assertEqual(reader.read(), [
+            [({'serial':'2', 'len':'0'}, '')],
+            ])
+        self.assertEqual(reader.headers, None)
+        tochild.write(' len:2\nab')
+        tochild.flush()
+        self.assertEqual(reader.read(), [
+            [({'serial':'3', 'len':'2'}, 'ab')],
+            ])
+        self.assertEqual(reader.size, 0)
+
+    def test_read_parses_header_once(self):
+        from supervisor import childutils
+        stdin, tochild = self._pipe()
+        reader = self._makeOne(stdin, bufsize=3)
+        lines = []
+        old = childutils.get_headers
+        def get_headers(line):
+            lines.append(line)
+            return old(line)
+        childutils.get_headers = get_headers
+        try:
+            tochild.write('len:12\nhello world!')
+            tochild.flush()
+            reader.read()
+        finally:
+            childutils.get_headers = old
+        self.assertEqual(lines, ['len:12'])
+
+    def test_read_batch(self):
+        stdin, tochild = self._pipe()
+        reader = self._makeOne(stdin)
+        body = 'eventname:A len:5\nhelloeventname:B len:3\nbye'
+        tochild.write('batch:2 len:%s\n%s' % (len(body), body))
+        tochild.flush()
+        self.assertEqual(reader.read(), [[
+            ({'eventname':'A', 'len':'5'}, 'hello'),
+            ({'eventname':'B', 'len':'3'}, 'bye'),
+            ]])
+
+    def test_read_eof(self):
+        stdin, tochild = self._pipe()
+        reader = self._makeOne(stdin)
+        tochild.write('len:5\nhel')
+        tochild.close()
+        self.assertRaises(EOFError, reader.read)
+
+class TestResultWriter(unittest.TestCase):
+    def test_flush_writes_once(self):
+        from supervisor.childutils import ResultWriter
+        class DummyStdout:
+            def __init__(self):
+                self.written = []
+                self.flushed = 0
+            def write(self, data):
+                self.written.append(data)
+            def flush(self):
+                self.flushed += 1
+        stdout = DummyStdout()
+        writer = ResultWriter(stdout)
+        writer.ok(1)
+        writer.fail(2)
+        writer.send_results(['OK', 'FAIL'])
+        writer.ready()
+        self.assertEqual(stdout.written, [])
+        writer.flush()
+        writer.flush()
+        self.assertEqual(stdout.written, [
+            'RESULT 2 1\nOKRESULT 4 2\nFAILRESULT 7\nOK\nFAILREADY\n'])
+        self.assertEqual(stdout.flushed, 1)
+
+class TestRunListener(PipeTestBase):
+    def _run(self, data, **kw):
+        from supervisor.childutils import run_listener
+        stdin, tochild = self._pipe()
+        tochild.write(data)
+        tochild.close()
+        stdout = StringIO()
+        handled = []
+        def handler(headers, payload):
+            handled.append(payload)
+            return payload != 'bad'
+        run_listener(handler, stdin, stdout, **kw)
+        return handled, stdout.getvalue()
+
+    def test_run_listener(self):
+        handled, output = self._run('len:4\ngoodlen:3\nbad')
+        self.assertEqual(handled, ['good', 'bad'])
+        self.assertEqual(output,
+                         'READY\nRESULT 2\nOKREADY\nRESULT 4\nFAILREADY\n')
+
+    def test_run_listener_windowed(self):
+        handled, output = self._run(
+            'serial:7 len:4\ngoodserial:8 len:3\nbad', windowed=True)
+        self.assertEqual(handled, ['good', 'bad'])
+        self.assertEqual(output, 'READY\nRESULT 2 7\nOKRESULT 4 8\nFAIL')
+
+    def test_run_listener_batch(self):
+        body = 'len:4\ngoodlen:3\nbad'
+        handled, output = self._run('batch:2 len:%s\n%s' % (len(body), body))
+        self.assertEqual(handled, ['good', 'bad'])
+        self.assertEqual(output, 'READY\nRESULT 7\nOK\nFAILREADY\n')
+
+class TestStandInPool(unittest.TestCase):
+    def _run(self, windowed='False', **kw):
+        import subprocess
+        from supervisor.childutils import StandInPool
+        here = os.path.dirname(__file__)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(here)))
+        script = ('import sys; sys.path.insert(0, %r)\n'
+                  'from supervisor.childutils import run_listener\n'
+                  'run_listener(lambda h, p: p != "bad", windowed=%s)\n' % (
+                  root, windowed))
+        child = subprocess.Popen([sys.executable, '-c', script],
+                                 stdin=subprocess.PIPE,
+                                 stdout=subprocess.PIPE)
+        try:
+            pool = StandInPool(child.stdin, child.stdout, **kw)
+            events = [('TICK_5', 'when:%s' % i) for i in range(20)]
+            events[3] = events[11] = ('TICK_5', 'bad')
+            return pool.run(events)
+        finally:
+            child.stdin.close()
+            child.wait()
+            child.stdout.close()
+
+    def test_run(self):
+        stats = self._run()
+        self.assertEqual(stats['events'], 20)
+        self.assertEqual(stats['rejected'], 2)
+        self.assertTrue(stats['seconds'] >= 0)
+
+    def test_run_windowed(self):
+        stats = self._run(windowed='True', window_size=4)
+        self.assertEqual(stats['events'], 20)
+        self.assertEqual(stats['rejected'], 2)
+
+    def test_run_batched(self):
+        stats = self._run(batch_size=3)
+        self.assertEqual(stats['events'], 20)
+        self.assertEqual(stats['rejected'], 2)
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
@@ -49,6 +49,18 @@ class DatatypesTest(unittest.TestCase):
         self.assertRaises(ValueError,
                           datatypes.list_of_strings, 42)
 
+    def test_list_of_regexes_returns_empty_list_for_empty_string(self):
+        actual = datatypes.list_of_regexes('')
+        self.assertEqual(actual, [])
+
+    def test_list_of_regexes_returns_one_pattern_per_line(self):
+        actual = datatypes.list_of_regexes('^DEBUG\n  a, b{1,2}  \n\n')
+        self.assertEqual(actual, ['^DEBUG', 'a, b{1,2}'])
+
+    def test_list_of_regexes_raises_value_error_for_bad_pattern(self):
+        self.assertRaises(ValueError,
+                          datatypes.list_of_regexes, 'ok\n(unbalanced')
+
     def test_list_of_ints_returns_empty_list_for_empty_string(self):
         actual = datatypes.list_of_ints('')
         self.assertEqual(actual, [])
@@ -440,6 +452,52 @@ class InetAddressTests(unittest.TestCase):
         self.assertEqual(host, 'localhost')
         self.assertEqual(port, 80)
 
+class HealthcheckSpecTests(unittest.TestCase):
+    def _callFUT(self, s):
+        from supervisor.datatypes import healthcheck_spec
+        return healthcheck_spec(s)
+
+    def test_none(self):
+        self.assertEqual(self._callFUT(''), None)
+        self.assertEqual(self._callFUT('None'), None)
+
+    def test_tcp(self):
+        self.assertEqual(self._callFUT('tcp://10.0.0.1:5432'),
+                         ('tcp', '10.0.0.1', 5432))
+
+    def test_tcp_default_host(self):
+        self.assertEqual(self._callFUT('tcp://*:5432'),
+                         ('tcp', '127.0.0.1', 5432))
+
+    def test_tcp_with_path(self):
+        self.assertRaises(ValueError, self._callFUT, 'tcp://127.0.0.1:80/x')
+
+    def test_http(self):
+        self.assertEqual(self._callFUT('http://:8080/status?full=1'),
+                         ('http', '127.0.0.1', 8080, '/status?full=1'))
+
+    def test_http_default_path(self):
+        self.assertEqual(self._callFUT('http://10.0.0.1:80'),
+                         ('http', '10.0.0.1', 80, '/'))
+
+    def test_http_bad_port(self):
+        self.assertRaises(ValueError, self._callFUT, 'http://10.0.0.1/status')
+
+    def test_hostname(self):
+        # resolving it would block supervisord
+        self.assertRaises(ValueError, self._callFUT, 'tcp://localhost:5432')
+        self.assertRaises(ValueError, self._callFUT, 'http://web1:80/')
+
+    def test_exec(self):
+        self.assertEqual(self._callFUT('exec: pg_isready -q'),
+                         ('exec', 'pg_isready -q'))
+
+    def test_exec_no_command(self):
+        self.assertRaises(ValueError, self._callFUT, 'exec: ')
+
+    def test_unknown_kind(self):
+        self.assertRaises(ValueError, self._callFUT, 'udp://localhost:53')
+
 class TestSocketAddress(unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.datatypes import SocketAddress
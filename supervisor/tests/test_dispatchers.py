@@ -179,6 +179,159 @@ class POutputDispatcherTests(unittest.TestCase):
 
         self.assertEqual(len(L), 0)
 
+    def test_record_output_filters_lines(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_logfile='/tmp/foo',
+                              stdout_events_enabled=True,
+                              stdout_filter_drop=['^DEBUG', 'ping$'])
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+        L = []
+        def doit(event):
+            L.append(event)
+        from supervisor import events
+        events.subscribe(events.EventTypes.PROCESS_LOG_STDOUT, doit)
+        dispatcher.output_buffer = 'DEBUG x\nkeep\nDEB'
+        dispatcher.record_output()
+        dispatcher.output_buffer = 'UG y\nping\npartial'
+        dispatcher.record_output()
+        self.assertEqual(dispatcher.childlog.data, ['keep\n'])
+        self.assertEqual([ e.data for e in L ], ['keep\n'])
+        self.assertEqual(process.dropped_lines, 3)
+        self.assertEqual(process.dropped_bytes, 21)
+        dispatcher.flush_output_filter()
+        self.assertEqual(dispatcher.childlog.data, ['keep\n', 'partial'])
+
+    def test_record_output_capturemode_not_filtered(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_logfile='/tmp/foo',
+                              stdout_capture_maxbytes=100,
+                              stdout_filter_drop=['^debug'])
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+        L = []
+        from supervisor import events
+        events.subscribe(events.EventTypes.PROCESS_COMMUNICATION, L.append)
+        from supervisor.events import ProcessCommunicationEvent
+        dispatcher.output_buffer = ('debug x\nbefore ' +
+                                    ProcessCommunicationEvent.BEGIN_TOKEN +
+                                    'debug payload' +
+                                    ProcessCommunicationEvent.END_TOKEN +
+                                    'after, longer than a begin token\n')
+        dispatcher.record_output()
+        self.assertEqual(len(L), 1)
+        self.assertEqual(L[0].data, 'debug payload')
+        self.assertEqual(dispatcher.mainlog.data,
+                         ['before after, longer than a begin token\n'])
+        self.assertEqual(process.dropped_lines, 1)
+
+    def test_record_output_filters_keep(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_logfile='/tmp/foo',
+                              stdout_filter_keep=['ERROR', 'WARN'],
+                              stdout_filter_drop=['ignore'])
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+        dispatcher.output_buffer = 'INFO a\nERROR b\nWARN ignore\n'
+        dispatcher.record_output()
+        self.assertEqual(dispatcher.childlog.data, ['ERROR b\n'])
+        self.assertEqual(process.dropped_lines, 2)
+
+    def test_record_output_calls_output_listeners(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        L = []
+        def listener(process, channel, data):
+            L.append((process, channel, data))
+        process.output_listeners.append(listener)
+        dispatcher = self._makeOne(process, 'stderr')
+        dispatcher.output_buffer = 'hello'
+        dispatcher.record_output()
+        self.assertEqual(L, [(process, 'stderr', 'hello')])
+
+    def test_record_output_coalesces_stdout_events_into_lines(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_events_enabled=True,
+                              stdout_events_flush_ms=1000,
+                              stdout_events_max_bytes=1024)
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process, 'stdout')
+
+        L = []
+        def doit(event):
+            L.append(event)
+        from supervisor import events
+        events.subscribe(events.EventTypes.PROCESS_LOG_STDOUT, doit)
+        dispatcher.output_buffer = 'line1\nli'
+        dispatcher.record_output()
+        dispatcher.output_buffer = 'ne2\nline'
+        dispatcher.record_output()
+
+        self.assertEqual(len(L), 0)
+        self.assertEqual(dispatcher.events_buffer, 'line1\nline2\nline')
+        deadline = dispatcher.events_deadline
+        dispatcher.flush_log_events(deadline - 1)
+        self.assertEqual(len(L), 0)
+        dispatcher.flush_log_events(deadline)
+        self.assertEqual(len(L), 1)
+        self.assertEqual(L[0].data, 'line1\nline2\n')
+        self.assertEqual(dispatcher.events_buffer, 'line')
+        dispatcher.flush_log_events()
+        self.assertEqual(len(L), 2)
+        self.assertEqual(L[1].data, 'line')
+        self.assertEqual(dispatcher.events_buffer, '')
+        self.assertEqual(dispatcher.events_deadline, None)
+
+    def test_record_output_flushes_stdout_events_at_max_bytes(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_events_enabled=True,
+                              stdout_events_flush_ms=1000,
+                              stdout_events_max_bytes=8)
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process, 'stdout')
+
+        L = []
+        def doit(event):
+            L.append(event)
+        from supervisor import events
+        events.subscribe(events.EventTypes.PROCESS_LOG_STDOUT, doit)
+        dispatcher.output_buffer = 'abc\ndefgh'
+        dispatcher.record_output()
+        self.assertEqual([ e.data for e in L ], ['abc\n'])
+        self.assertEqual(dispatcher.events_buffer, 'defgh')
+        dispatcher.output_buffer = 'ijklmnop'
+        dispatcher.record_output()
+        # no newline to split on, so the whole buffer is sent
+        self.assertEqual([ e.data for e in L ], ['abc\n', 'defghijklmnop'])
+        self.assertEqual(dispatcher.events_buffer, '')
+
+    def test_handle_read_event_flushes_coalesced_events_at_eof(self):
+        options = DummyOptions()
+        options.readfd_result = ''
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_events_enabled=True,
+                              stdout_events_flush_ms=1000,
+                              stdout_events_max_bytes=1024)
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process, 'stdout')
+        dispatcher.events_buffer = 'partial'
+        dispatcher.events_deadline = 0
+
+        L = []
+        def doit(event):
+            L.append(event)
+        from supervisor import events
+        events.subscribe(events.EventTypes.PROCESS_LOG_STDOUT, doit)
+        dispatcher.handle_read_event()
+        self.assertEqual([ e.data for e in L ], ['partial'])
+        self.assertEqual(dispatcher.closed, True)
+
     def test_record_output_emits_stderr_event_when_enabled(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'process1', '/bin/process1',
@@ -377,6 +530,22 @@ class POutputDispatcherTests(unittest.TestCase):
         self.assertEqual(len(dispatcher.childlog.data), 2)
         self.assertEqual(dispatcher.childlog.data[1], ansi)
 
+    def test_strip_ansi_escape_split_across_reads(self):
+        options = DummyOptions()
+        options.strip_ansi = True
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              stdout_logfile='/tmp/foo')
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+
+        dispatcher.output_buffer = 'Hello \x1b[3'
+        dispatcher.record_output()
+        self.assertEqual(dispatcher.childlog.data, ['Hello '])
+
+        dispatcher.output_buffer = '4mworld'
+        dispatcher.record_output()
+        self.assertEqual(dispatcher.childlog.data, ['Hello ', 'world'])
+
     def test_ctor_nologfiles(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'process1', '/bin/process1')
@@ -586,6 +755,79 @@ class PInputDispatcherTests(unittest.TestCase):
         dispatcher.close() # make sure we don't error if we try to close twice
         self.assertEqual(dispatcher.closed, True)
 
+class PNotifyDispatcherTests(unittest.TestCase):
+    def _getTargetClass(self):
+        from supervisor.dispatchers import PNotifyDispatcher
+        return PNotifyDispatcher
+
+    def _makeOne(self, process):
+        return self._getTargetClass()(process, 'notify', 9)
+
+    def _makeProcess(self, options):
+        config = DummyPConfig(options, 'process1', '/bin/process1',
+                              notify_ready=True)
+        process = DummyProcess(config)
+        process.ready_reports = 0
+        def report_ready():
+            process.ready_reports += 1
+        process.report_ready = report_ready
+        return process
+
+    def test_readable_writable(self):
+        options = DummyOptions()
+        dispatcher = self._makeOne(self._makeProcess(options))
+        self.assertEqual(dispatcher.readable(), True)
+        self.assertEqual(dispatcher.writable(), False)
+        dispatcher.close()
+        self.assertEqual(dispatcher.readable(), False)
+
+    def test_handle_read_event_ready(self):
+        options = DummyOptions()
+        process = self._makeProcess(options)
+        dispatcher = self._makeOne(process)
+        options.readfd_result = 'STATUS=warming up\nREADY=1\nMAINPID=4'
+        dispatcher.handle_read_event()
+        self.assertEqual(process.ready_reports, 1)
+        self.assertEqual(dispatcher.notify_buffer, 'MAINPID=4')
+
+    def test_handle_read_event_ready_split_across_reads(self):
+        options = DummyOptions()
+        process = self._makeProcess(options)
+        dispatcher = self._makeOne(process)
+        options.readfd_result = 'REA'
+        dispatcher.handle_read_event()
+        self.assertEqual(process.ready_reports, 0)
+        options.readfd_result = 'DY=1\n'
+        dispatcher.handle_read_event()
+        self.assertEqual(process.ready_reports, 1)
+        self.assertEqual(dispatcher.notify_buffer, '')
+
+    def test_handle_read_event_ready_without_newline(self):
+        options = DummyOptions()
+        process = self._makeProcess(options)
+        dispatcher = self._makeOne(process)
+        options.readfd_result = 'READY=1'
+        dispatcher.handle_read_event()
+        self.assertEqual(process.ready_reports, 1)
+        self.assertEqual(dispatcher.notify_buffer, '')
+
+    def test_handle_read_event_partial_is_capped(self):
+        options = DummyOptions()
+        process = self._makeProcess(options)
+        dispatcher = self._makeOne(process)
+        options.readfd_result = 'x' * (dispatcher.MAX_LINE + 10)
+        dispatcher.handle_read_event()
+        self.assertEqual(len(dispatcher.notify_buffer), dispatcher.MAX_LINE)
+
+    def test_handle_read_event_eof_closes(self):
+        options = DummyOptions()
+        process = self._makeProcess(options)
+        dispatcher = self._makeOne(process)
+        options.readfd_result = ''
+        dispatcher.handle_read_event()
+        self.assertEqual(dispatcher.closed, True)
+        self.assertEqual(process.ready_reports, 0)
+
 class PEventListenerDispatcherTests(unittest.TestCase):
     def setUp(self):
         from supervisor.events import clear
@@ -711,6 +953,22 @@ class PEventListenerDispatcherTests(unittest.TestCase):
                          'process1: ACKNOWLEDGED -> READY')
         self.assertEqual(process.listener_state, EventListenerStates.READY)
 
+    def test_handle_listener_state_change_acknowledged_to_ready_queues(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        L = []
+        class DummyPool:
+            def listener_ready(self, process):
+                L.append(process)
+        process.group = DummyPool()
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher = self._makeOne(process)
+        process.listener_state = EventListenerStates.ACKNOWLEDGED
+        dispatcher.state_buffer = 'READY\n'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(L, [process])
+
     def test_handle_listener_state_change_acknowledged_gobbles(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'process1', '/bin/process1')
@@ -789,7 +1047,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         dispatcher = self._makeOne(process)
         process.listener_state = EventListenerStates.BUSY
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         from supervisor.dispatchers import default_handler
@@ -810,7 +1069,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         dispatcher = self._makeOne(process)
         process.listener_state = EventListenerStates.BUSY
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         from supervisor.dispatchers import default_handler
@@ -848,6 +1108,95 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         self.assertEqual(events[0].process, process)
         self.assertEqual(events[0].event, current_event)
 
+    def _makeWindowed(self, *events):
+        from supervisor.events import EventRejectedEvent
+        from supervisor.events import subscribe
+        from supervisor.dispatchers import default_handler
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        process.window = []
+        dispatcher = self._makeOne(process)
+        process.window.extend(events)
+        class Dummy:
+            pass
+        class DummyPool:
+            def __init__(self):
+                self.ready_listeners = []
+            def listener_ready(self, process):
+                self.ready_listeners.append(process)
+            def listener_answered(self, process, events):
+                self.answered = (process, events)
+        process.group = DummyPool()
+        process.group.config = Dummy()
+        process.group.config.result_handler = default_handler
+        L = []
+        subscribe(EventRejectedEvent, L.append)
+        return dispatcher, process, L
+
+    def test_handle_listener_state_change_windowed_results(self):
+        from supervisor.dispatchers import EventListenerStates
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        dispatcher, process, L = self._makeWindowed(event1, event2)
+        process.listener_state = EventListenerStates.BUSY
+        dispatcher.state_buffer = 'RESULT 4 2\nFAILRESULT 2 1\nOK'
+        self.assertEqual(dispatcher.handle_listener_state_change(), None)
+        self.assertEqual(dispatcher.state_buffer, '')
+        self.assertEqual(process.window, [])
+        self.assertEqual([ x.event for x in L ], [event2])
+        self.assertEqual(process.listener_state, EventListenerStates.READY)
+        self.assertEqual(process.group.ready_listeners, [process, process])
+        self.assertEqual(process.config.options.logger.data, [
+            'process1: BUSY -> READY (rejected)',
+            'process1: READY -> READY (processed)'])
+
+    def test_handle_listener_state_change_windowed_partial_result(self):
+        from supervisor.dispatchers import EventListenerStates
+        event1 = DummyEvent(1)
+        dispatcher, process, L = self._makeWindowed(event1)
+        process.listener_state = EventListenerStates.READY
+        dispatcher.state_buffer = 'RESULT 2 1\nO'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.window, [event1])
+        dispatcher.state_buffer += 'K'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.window, [])
+        self.assertEqual(L, [])
+
+    def test_handle_listener_state_change_windowed_unknown_serial(self):
+        from supervisor.dispatchers import EventListenerStates
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        dispatcher, process, L = self._makeWindowed(event1, event2)
+        process.listener_state = EventListenerStates.READY
+        dispatcher.state_buffer = 'RESULT 2 3\nOK'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.listener_state, EventListenerStates.UNKNOWN)
+        self.assertEqual(process.window, [])
+        self.assertEqual([ x.event for x in L ], [event2, event1])
+        self.assertEqual(process.config.options.logger.data[0],
+            "process1: READY -> UNKNOWN (bad result line 'RESULT 2 3')")
+
+    def test_handle_listener_state_change_windowed_missing_serial(self):
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher, process, L = self._makeWindowed(DummyEvent(1))
+        process.listener_state = EventListenerStates.READY
+        dispatcher.state_buffer = 'RESULT 2\nOK'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.listener_state, EventListenerStates.UNKNOWN)
+        self.assertEqual(len(L), 1)
+
+    def test_handle_listener_state_change_windowed_ready_nothing_sent(self):
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher, process, L = self._makeWindowed()
+        process.listener_state = EventListenerStates.READY
+        dispatcher.state_buffer = 'RESULT 2 1\nOK'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.listener_state, EventListenerStates.UNKNOWN)
+        self.assertEqual(process.config.options.logger.data[0],
+                         'process1: READY -> UNKNOWN')
+
     def test_handle_listener_state_busy_gobbles(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'process1', '/bin/process1')
@@ -856,7 +1205,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         dispatcher = self._makeOne(process)
         process.listener_state = EventListenerStates.BUSY
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         from supervisor.dispatchers import default_handler
@@ -871,6 +1221,94 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         self.assertEqual(process.listener_state,
                          EventListenerStates.UNKNOWN)
 
+    def test_handle_listener_state_change_many_windowed_results(self):
+        # more results than the recursion limit would have allowed
+        from supervisor.dispatchers import EventListenerStates
+        events = [ DummyEvent(i) for i in range(5000) ]
+        dispatcher, process, L = self._makeWindowed(*events)
+        process.listener_state = EventListenerStates.READY
+        dispatcher.state_buffer = ''.join(
+            [ 'RESULT 2 %s\nOK' % i for i in range(5000) ])
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(dispatcher.state_buffer, '')
+        self.assertEqual(process.window, [])
+        self.assertEqual(L, [])
+        self.assertEqual(process.listener_state, EventListenerStates.READY)
+
+    def test_handle_listener_state_change_result_line_in_pieces(self):
+        from supervisor.dispatchers import EventListenerStates
+        event1 = DummyEvent(1)
+        dispatcher, process, L = self._makeWindowed(event1)
+        process.listener_state = EventListenerStates.BUSY
+        dispatcher.state_buffer = 'RESULT'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(dispatcher.state_buffer, 'RESULT')
+        self.assertEqual(dispatcher.line_scanned, 6)
+        dispatcher.state_buffer += ' 2 1'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(dispatcher.line_scanned, 10)
+        dispatcher.state_buffer += '\nOK'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(dispatcher.state_buffer, '')
+        self.assertEqual(dispatcher.line_scanned, 0)
+        self.assertEqual(process.window, [])
+        self.assertEqual(process.listener_state, EventListenerStates.READY)
+
+    def test_handle_listener_state_change_empty_result(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher = self._makeOne(process)
+        process.listener_state = EventListenerStates.BUSY
+        class Dummy:
+            def listener_answered(self, process, events):
+                pass
+        process.group = Dummy()
+        process.group.config = Dummy()
+        L = []
+        def handler(event, result):
+            L.append(result)
+        process.group.config.result_handler = handler
+        dispatcher.state_buffer = 'RESULT 0\n'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(L, [''])
+        self.assertEqual(dispatcher.state_buffer, '')
+        self.assertEqual(process.listener_state,
+                         EventListenerStates.ACKNOWLEDGED)
+
+    def test_handle_read_event_no_debug_output_at_info(self):
+        options = DummyOptions()
+        options.readfd_result = 'READY\n'
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+        dispatcher.handle_read_event()
+        self.assertEqual(options.logger.data,
+                         ['process1: ACKNOWLEDGED -> READY'])
+
+    def test_handle_read_event_debug_output(self):
+        options = DummyOptions()
+        options.loglevel = 10
+        options.readfd_result = 'READY\n'
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        dispatcher = self._makeOne(process)
+        dispatcher.handle_read_event()
+        self.assertEqual(options.logger.data[0],
+                         "'process1' stdout output:\nREADY\n")
+
+    def test_handle_result_tells_group(self):
+        from supervisor.dispatchers import EventListenerStates
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        dispatcher, process, L = self._makeWindowed(event1, event2)
+        process.listener_state = EventListenerStates.BUSY
+        dispatcher.state_buffer = 'RESULT 2 2\nOK'
+        dispatcher.handle_listener_state_change()
+        self.assertEqual(process.group.answered, (process, [event2]))
+        self.assertEqual(process.window, [event1])
+
     def test_handle_result_accept(self):
         from supervisor.events import subscribe
         options = DummyOptions()
@@ -886,7 +1324,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         def handle(event, result):
             pass
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         process.group.config.result_handler = handle
@@ -914,7 +1353,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
             from supervisor.dispatchers import RejectEvent
             raise RejectEvent(result)
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         process.group.config.result_handler = rejected
@@ -927,6 +1367,61 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         result = options.logger.data[0]
         self.assertTrue(result.endswith('BUSY -> ACKNOWLEDGED (rejected)'))
 
+    def _makeBatchDispatcher(self, result_handler):
+        from supervisor.events import subscribe
+        from supervisor import events
+        options = DummyOptions()
+        config = DummyPConfig(options, 'process1', '/bin/process1')
+        process = DummyProcess(config)
+        L = []
+        subscribe(events.EventRejectedEvent, L.append)
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher = self._makeOne(process)
+        class Dummy:
+            def listener_answered(self, process, events):
+                pass
+        process.group = Dummy()
+        process.group.config = Dummy()
+        process.group.config.result_handler = result_handler
+        process.listener_state = EventListenerStates.BUSY
+        process.batch = ['event1', 'event2', 'event3']
+        return dispatcher, process, L
+
+    def test_handle_result_batch_one_result_per_event(self):
+        from supervisor.dispatchers import default_handler
+        from supervisor.dispatchers import EventListenerStates
+        dispatcher, process, L = self._makeBatchDispatcher(default_handler)
+        dispatcher.handle_result('FAIL\nOK\nFAIL')
+        self.assertEqual([ x.event for x in L ], ['event3', 'event1'])
+        self.assertEqual(process.listener_state,
+                         EventListenerStates.ACKNOWLEDGED)
+        result = process.config.options.logger.data[0]
+        self.assertTrue(result.endswith('BUSY -> ACKNOWLEDGED (rejected)'))
+
+    def test_handle_result_batch_one_result_for_all(self):
+        from supervisor.dispatchers import EventListenerStates
+        seen = []
+        def handle(event, result):
+            seen.append((event, result))
+        dispatcher, process, L = self._makeBatchDispatcher(handle)
+        dispatcher.handle_result('OK')
+        self.assertEqual(seen, [('event1', 'OK'), ('event2', 'OK'),
+                                ('event3', 'OK')])
+        self.assertEqual(L, [])
+        self.assertEqual(process.listener_state,
+                         EventListenerStates.ACKNOWLEDGED)
+
+    def test_handle_result_batch_exception(self):
+        from supervisor.dispatchers import EventListenerStates
+        def exception(event, result):
+            if event == 'event2':
+                raise ValueError
+        dispatcher, process, L = self._makeBatchDispatcher(exception)
+        dispatcher.handle_result('OK')
+        self.assertEqual([ x.event for x in L ], ['event2'])
+        self.assertEqual(process.listener_state,
+                         EventListenerStates.UNKNOWN)
+
     def test_handle_result_exception(self):
         from supervisor.events import subscribe
         options = DummyOptions()
@@ -942,7 +1437,8 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         def exception(event, result):
             raise ValueError
         class Dummy:
-            pass
+            def listener_answered(self, process, events):
+                pass
         process.group = Dummy()
         process.group.config = Dummy()
         process.group.config.result_handler = exception
@@ -1053,6 +1549,131 @@ class PEventListenerDispatcherTests(unittest.TestCase):
         dispatcher.close() # make sure we don't error if we try to close twice
         self.assertEqual(dispatcher.closed, True)
 
+class PTriggerDispatcherTests(unittest.TestCase):
+    def _makeOne(self, owner):
+        from supervisor.dispatchers import PTriggerDispatcher
+        return PTriggerDispatcher(owner)
+
+    def _makeOwner(self, options):
+        class DummyOwner:
+            config = DummyPConfig(options, 'pool', '/bin/pool')
+        return DummyOwner()
+
+    def test_ctor(self):
+        options = DummyOptions()
+        dispatcher = self._makeOne(self._makeOwner(options))
+        self.assertEqual(dispatcher.fd, 98)
+        self.assertEqual(dispatcher.trigger_fd, 99)
+        self.assertEqual(dispatcher.readable(), True)
+        self.assertEqual(dispatcher.writable(), False)
+
+    def test_trigger_writes_once_until_read(self):
+        options = DummyOptions()
+        dispatcher = self._makeOne(self._makeOwner(options))
+        dispatcher.trigger()
+        dispatcher.trigger()
+        self.assertEqual(options.written, {99:'x'})
+        dispatcher.handle_read_event()
+        dispatcher.trigger()
+        self.assertEqual(options.written, {99:'xx'})
+
+    def test_trigger_pipe_full(self):
+        import errno
+        options = DummyOptions()
+        options.write_error = errno.EAGAIN
+        dispatcher = self._makeOne(self._makeOwner(options))
+        dispatcher.trigger()
+        self.assertEqual(dispatcher.triggered, True)
+
+    def test_close(self):
+        options = DummyOptions()
+        dispatcher = self._makeOne(self._makeOwner(options))
+        dispatcher.close()
+        dispatcher.close()
+        self.assertEqual(options.fds_closed, [98, 99])
+        self.assertEqual(dispatcher.readable(), False)
+        dispatcher.trigger()
+        self.assertEqual(options.written, {})
+
+class stripEscapesTests(unittest.TestCase):
+    def _callFUT(self, s):
+        from supervisor.dispatchers import stripEscapes
+        return stripEscapes(s)
+
+    def test_zero_length_string(self):
+        self.assertEqual(self._callFUT(''), '')
+
+    def test_no_escapes(self):
+        self.assertEqual(self._callFUT('no escapes'), 'no escapes')
+
+    def test_ansi(self):
+        ansi = '\x1b[34mHello world... this is longer than a token!\x1b[0m'
+        noansi = 'Hello world... this is longer than a token!'
+        self.assertEqual(self._callFUT(ansi), noansi)
+
+    def test_noansi(self):
+        noansi = 'Hello world... this is longer than a token!'
+        self.assertEqual(self._callFUT(noansi), noansi)
+
+    def test_unterminated_escape_strips_to_end(self):
+        self.assertEqual(self._callFUT('abc\x1b[34def'), 'abc')
+
+    def test_lone_escape_char_is_kept(self):
+        self.assertEqual(self._callFUT('abc\x1bdef'), 'abc\x1bdef')
+
+class ANSIEscapeStripperTests(unittest.TestCase):
+    def _makeOne(self):
+        from supervisor.dispatchers import ANSIEscapeStripper
+        return ANSIEscapeStripper()
+
+    def test_strip_whole_escapes(self):
+        stripper = self._makeOne()
+        self.assertEqual(stripper.strip('\x1b[1mbold\x1b[0m'), 'bold')
+        self.assertEqual(stripper.pending, '')
+
+    def test_strip_escape_split_after_esc(self):
+        stripper = self._makeOne()
+        self.assertEqual(stripper.strip('abc\x1b'), 'abc')
+        self.assertEqual(stripper.pending, '\x1b')
+        self.assertEqual(stripper.strip('[31mdef'), 'def')
+        self.assertEqual(stripper.pending, '')
+
+    def test_strip_escape_split_inside_parameters(self):
+        stripper = self._makeOne()
+        self.assertEqual(stripper.strip('abc\x1b[1;3'), 'abc')
+        self.assertEqual(stripper.strip('1mdef\x1b[0m'), 'def')
+        self.assertEqual(stripper.pending, '')
+
+    def test_strip_lone_esc_not_at_end(self):
+        stripper = self._makeOne()
+        self.assertEqual(stripper.strip('a\x1bb'), 'a\x1bb')
+        self.assertEqual(stripper.pending, '')
+
+    def test_strip_overlong_partial_escape_is_dropped(self):
+        from supervisor.dispatchers import ANSI_ESCAPE_MAXLEN
+        stripper = self._makeOne()
+        data = 'abc\x1b[' + '1' * ANSI_ESCAPE_MAXLEN
+        self.assertEqual(stripper.strip(data), 'abc')
+        self.assertEqual(stripper.pending, '')
+
+class OutputFilterTests(unittest.TestCase):
+    def _makeOne(self, drop=(), keep=()):
+        from supervisor.dispatchers import OutputFilter
+        return OutputFilter(drop, keep)
+
+    def test_filter_holds_back_incomplete_line(self):
+        f = self._makeOne(drop=['^x'])
+        self.assertEqual(f.filter('a\nx'), ('a\n', 0, 0))
+        self.assertEqual(f.pending, 'x')
+        self.assertEqual(f.filter('yz\nb'), ('', 1, 4))
+        self.assertEqual(f.filter('', final=True), ('b', 0, 0))
+        self.assertEqual(f.pending, '')
+
+    def test_filter_long_incomplete_line_is_not_held_back(self):
+        f = self._makeOne(drop=['^x'])
+        f.maxline = 4
+        self.assertEqual(f.filter('abcdef'), ('abcdef', 0, 0))
+        self.assertEqual(f.pending, '')
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -20,6 +20,12 @@ class EventSubscriptionNotificationTests(unittest.TestCase):
         events.subscribe(None, None)
         self.assertEqual(events.callbacks, [(None, None)])
 
+    def test_unsubscribe(self):
+        from supervisor import events
+        events.callbacks[:] = [(None, None), (int, None)]
+        events.unsubscribe(int, None)
+        self.assertEqual(events.callbacks, [(None, None)])
+
     def test_clear(self):
         from supervisor import events
         events.callbacks[:] = [(None, None)]
@@ -404,7 +410,32 @@ class TestSerializations(unittest.TestCase):
             event = klass(process1, ProcessStates.STARTING)
             headers, payload = self._deserialize(str(event))
             self.assertEqual(headers['tries'], '2')
-        
+
+    def test_process_health_events(self):
+        from supervisor import events
+        from supervisor.states import HealthStates
+        for klass in (
+            events.ProcessHealthHealthyEvent,
+            events.ProcessHealthUnhealthyEvent,
+            ):
+            options = DummyOptions()
+            pconfig1 = DummyPConfig(options, 'process1', 'process1',
+                                    '/bin/process1')
+            class DummyGroup:
+                config = pconfig1
+            process1 = DummyProcess(pconfig1)
+            process1.group = DummyGroup
+            process1.pid = 1
+            event = klass(process1, HealthStates.UNKNOWN)
+            self.assertTrue(isinstance(event, events.ProcessHealthEvent))
+            headers, payload = self._deserialize(str(event))
+            self.assertEqual(len(headers), 4)
+            self.assertEqual(headers['processname'], 'process1')
+            self.assertEqual(headers['groupname'], 'process1')
+            self.assertEqual(headers['from_state'], 'UNKNOWN')
+            self.assertEqual(headers['pid'], '1')
+            self.assertEqual(payload, '')
+
     def test_process_state_exited_event_expected(self):
         from supervisor import events
         from supervisor.states import ProcessStates
@@ -468,12 +499,47 @@ class TestSerializations(unittest.TestCase):
             self.assertEqual(headers, {'when':'1'})
             self.assertEqual(payload, '')
 
+    def test_event_pool_stats_event(self):
+        from supervisor import events
+        latency = {'count':2, 'mean_ms':3.0, 'p50_ms':5.0, 'p90_ms':5.0,
+                   'p99_ms':5.0, 'max_ms':4.0, 'buckets':[]}
+        stats = {'depth':1, 'overflows':2, 'rejected':3, 'rebuffered':4,
+                 'enqueue_latency':latency, 'result_latency':latency,
+                 'accepted':{'TICK_5':6}, 'rates':{'TICK_5':0.1},
+                 'busy':{'listener_1':0.5, 'listener_0':1.0}}
+        event = events.EventPoolStatsEvent('listeners', stats)
+        headers, payload = self._deserialize(str(event))
+        self.assertEqual(headers['poolname'], 'listeners')
+        self.assertEqual(headers['depth'], '1')
+        self.assertEqual(headers['overflows'], '2')
+        self.assertEqual(headers['rejected'], '3')
+        self.assertEqual(headers['rebuffered'], '4')
+        self.assertEqual(headers['enqueue_count'], '2')
+        self.assertEqual(headers['result_mean_ms'], '3.000')
+        self.assertEqual(headers['result_p99_ms'], '5.000')
+        self.assertEqual(headers['rate.TICK_5'], '0.100')
+        self.assertEqual(headers['busy.listener_0'], '1.000')
+        self.assertEqual(headers['busy.listener_1'], '0.500')
+        self.assertEqual(payload, '')
+
 class TestUtilityFunctions(unittest.TestCase):
     def test_getEventNameByType(self):
         from supervisor import events
         for name, value in events.EventTypes.__dict__.items():
             self.assertEqual(events.getEventNameByType(value), name)
 
+    def test_register_clears_event_name_cache(self):
+        from supervisor import events
+        class FooEvent(events.Event):
+            pass
+        self.assertEqual(events.getEventNameByType(FooEvent), None)
+        events.register('FOO', FooEvent)
+        try:
+            self.assertEqual(events.getEventNameByType(FooEvent), 'FOO')
+        finally:
+            del events.EventTypes.FOO
+            events._eventNames.clear()
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -0,0 +1,251 @@
+"""Test suite for supervisor.eventserver"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+
+from supervisor.tests.base import DummyOptions
+
+class EventServerTests(unittest.TestCase):
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        self.socketname = os.path.join(self.basedir, 'events.sock')
+        self.servers = []
+
+    def tearDown(self):
+        from supervisor.events import clear
+        for server in self.servers:
+            server.close()
+        clear()
+        shutil.rmtree(self.basedir)
+
+    def _getTargetClass(self):
+        from supervisor.eventserver import EventServer
+        return EventServer
+
+    def _makeOne(self, options=None):
+        if options is None:
+            options = DummyOptions()
+        server = self._getTargetClass()(options, self.socketname, 0700,
+                                        (-1, -1))
+        self.servers.append(server)
+        return server
+
+    def _connect(self, server):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.socketname)
+        server.handle_accept()
+        return client, server.subscribers[-1]
+
+    def test_ctor(self):
+        import stat
+        server = self._makeOne()
+        self.assertEqual(server.accepting, True)
+        mode = os.stat(self.socketname)[stat.ST_MODE]
+        self.assertEqual(stat.S_IMODE(mode), 0700)
+
+    def test_ctor_in_use(self):
+        import errno
+        self._makeOne()
+        try:
+            self._makeOne()
+        except socket.error, why:
+            self.assertEqual(why[0], errno.EADDRINUSE)
+        else:
+            self.fail('socket.error not raised')
+
+    def test_ctor_stale_socket(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socketname)
+        sock.close()
+        server = self._makeOne()
+        self.assertEqual(server.accepting, True)
+
+    def test_handle_accept(self):
+        options = DummyOptions()
+        server = self._makeOne(options)
+        client, subscriber = self._connect(server)
+        self.assertEqual(server.subscribers, [subscriber])
+        self.assertEqual(subscriber.config.name, 'subscriber-1')
+        self.assertEqual(subscriber.group, None)
+        self.assertEqual(options.logger.data,
+                         ['event subscriber subscriber-1 connected'])
+        client.close()
+
+    def test_close_closes_subscribers(self):
+        server = self._makeOne()
+        client, subscriber = self._connect(server)
+        server.close()
+        self.servers.remove(server)
+        self.assertEqual(subscriber.closed, True)
+        self.assertEqual(server.subscribers, [])
+        client.close()
+
+    def test_get_dispatchers_and_transition(self):
+        server = self._makeOne()
+        client, subscriber = self._connect(server)
+        self.assertEqual(server.get_dispatchers(), {})
+        subscriber.subscribe('SUBSCRIBE events:TICK_5')
+        transitioned = []
+        subscriber.group.transition = lambda: transitioned.append(True)
+        trigger = subscriber.group.trigger
+        self.assertEqual(server.get_dispatchers(), {trigger.fd:trigger})
+        server.transition()
+        self.assertEqual(transitioned, [True])
+        client.close()
+
+class EventSubscriberTests(unittest.TestCase):
+    def tearDown(self):
+        from supervisor.events import clear
+        clear()
+
+    def _makeOne(self):
+        from supervisor.eventserver import EventSubscriber
+        class DummyServer:
+            def __init__(self):
+                self.options = DummyOptions()
+                self.removed = []
+            def remove(self, subscriber):
+                self.removed.append(subscriber)
+        self.client, sock = socket.socketpair(socket.AF_UNIX,
+                                              socket.SOCK_STREAM)
+        return EventSubscriber(DummyServer(), sock, 'subscriber-1')
+
+    def _read(self, subscriber, data):
+        self.client.send(data)
+        subscriber.handle_read()
+
+    def _flush(self, subscriber):
+        while subscriber.writable():
+            subscriber.handle_write()
+        return self.client.recv(4096)
+
+    def test_subscribe(self):
+        from supervisor.events import EventTypes
+        subscriber = self._makeOne()
+        subscriber.subscribe(
+            'SUBSCRIBE events:PROCESS_STATE,tick_5 buffer_size:50 '
+            'window_size:4 events_filter_processes:web*,db '
+            'events_filter_groups:app events_filter_expected:false')
+        config = subscriber.group.config
+        self.assertEqual(config.name, 'subscriber-1')
+        self.assertEqual(config.pool_events, [EventTypes.PROCESS_STATE,
+                                              EventTypes.TICK_5])
+        self.assertEqual(config.buffer_size, 50)
+        self.assertEqual(config.window_size, 4)
+        self.assertEqual(config.filter_processes, ['web*', 'db'])
+        self.assertEqual(config.filter_groups, ['app'])
+        self.assertEqual(config.filter_expected, False)
+        self.assertEqual(subscriber.group.processes,
+                         {'subscriber-1':subscriber})
+        self.assertEqual(subscriber.window, [])
+        self.assertEqual(subscriber.listener.process, subscriber)
+        subscriber.close()
+
+    def test_subscribe_errors(self):
+        subscriber = self._makeOne()
+        for line in ('events:TICK_5', 'SUBSCRIBE ', 'SUBSCRIBE events:BOGUS',
+                     'SUBSCRIBE events:TICK_5 buffer_size:0',
+                     'SUBSCRIBE events:TICK_5 window_size:x',
+                     'SUBSCRIBE events:TICK_5 numprocs:2',
+                     'SUBSCRIBE events:TICK_5 stray'):
+            self.assertRaises(ValueError, subscriber.subscribe, line)
+        self.assertEqual(subscriber.group, None)
+        subscriber.close()
+
+    def test_handle_read_refuses_bad_subscription(self):
+        subscriber = self._makeOne()
+        self._read(subscriber, 'SUBSCRIBE events:BOGUS\n')
+        self.assertEqual(self.client.recv(4096),
+                         'ERROR unknown event type BOGUS\n')
+        self.assertEqual(subscriber.closed, True)
+        self.assertEqual(subscriber.server.removed, [subscriber])
+
+    def test_handle_read_partial_subscription(self):
+        subscriber = self._makeOne()
+        self._read(subscriber, 'SUBSCRIBE events:')
+        self.assertEqual(subscriber.group, None)
+        self._read(subscriber, 'TICK_5\n')
+        self.assertTrue(subscriber.group is not None)
+        self.assertEqual(self._flush(subscriber), 'OK\n')
+        subscriber.close()
+
+    def test_handle_read_subscription_too_long(self):
+        from supervisor.eventserver import MAX_SUBSCRIBE_LEN
+        subscriber = self._makeOne()
+        self._read(subscriber, 'SUBSCRIBE ')
+        self._read(subscriber, 'x' * MAX_SUBSCRIBE_LEN)
+        self.assertEqual(subscriber.closed, True)
+
+    def test_event_delivery(self):
+        from supervisor import events
+        from supervisor.states import EventListenerStates
+        subscriber = self._makeOne()
+        self._read(subscriber,
+                   'SUBSCRIBE events:TICK_5\nREADY\n')
+        self.assertEqual(subscriber.listener_state,
+                         EventListenerStates.READY)
+        event = events.Tick5Event(1234, None)
+        events.notify(event)
+        subscriber.group.transition()
+        self.assertEqual(subscriber.listener_state, EventListenerStates.BUSY)
+        data = self._flush(subscriber)
+        self.assertEqual(data[:3], 'OK\n')
+        header, payload = data[3:].split('\n', 1)
+        self.assertTrue('pool:subscriber-1 poolserial:0' in header)
+        self.assertTrue('eventname:TICK_5' in header)
+        self.assertEqual(payload, 'when:1234')
+        self._read(subscriber, 'RESULT 2\nOK')
+        self.assertEqual(subscriber.listener_state,
+                         EventListenerStates.ACKNOWLEDGED)
+        self.assertEqual(list(subscriber.group.event_buffer), [])
+        subscriber.close()
+
+    def test_rejected_event_is_sent_again(self):
+        from supervisor import events
+        subscriber = self._makeOne()
+        self._read(subscriber,
+                   'SUBSCRIBE events:TICK_5\nREADY\n')
+        event = events.Tick5Event(1234, None)
+        events.notify(event)
+        subscriber.group.transition()
+        self._read(subscriber, 'RESULT 4\nFAIL')
+        self.assertEqual(list(subscriber.group.event_buffer), [event])
+
+    def test_write_after_close(self):
+        import errno
+        subscriber = self._makeOne()
+        subscriber.close()
+        try:
+            subscriber.write('x')
+        except OSError, why:
+            self.assertEqual(why[0], errno.EPIPE)
+        else:
+            self.fail('OSError not raised')
+
+    def test_close(self):
+        from supervisor import events
+        subscriber = self._makeOne()
+        subscriber.subscribe('SUBSCRIBE events:TICK_5')
+        self.assertEqual(len(events.callbacks), 3)
+        subscriber.close()
+        subscriber.close()
+        self.assertEqual(events.callbacks, [])
+        self.assertEqual(subscriber.server.removed, [subscriber])
+        self.assertEqual(subscriber.config.options.logger.data[-1],
+                         'event subscriber subscriber-1 disconnected')
+
+    def test_handle_read_disconnect(self):
+        subscriber = self._makeOne()
+        self.client.close()
+        subscriber.handle_read()
+        self.assertEqual(subscriber.closed, True)
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,370 @@
+"""Test suite for supervisor.healthcheck"""
+
+import select
+import signal
+import socket
+import sys
+import unittest
+
+from supervisor.tests.base import DummyOptions
+from supervisor.tests.base import DummyPConfig
+from supervisor.tests.base import DummyProcess
+
+class HealthCheckTests(unittest.TestCase):
+    def setUp(self):
+        from supervisor import events
+        self.events = []
+        events.subscribe(events.ProcessHealthEvent, self.events.append)
+
+    def tearDown(self):
+        from supervisor import events
+        from supervisor import healthcheck
+        events.clear()
+        healthcheck.running_probes = 0
+
+    def _makeOne(self, spec=('exec', 'true'), state=None, **kw):
+        from supervisor.healthcheck import HealthCheck
+        from supervisor.states import ProcessStates
+        options = DummyOptions()
+        options.forkpid = 123
+        config = DummyPConfig(options, 'foo', '/bin/foo', healthcheck=spec,
+                              **kw)
+        if state is None:
+            state = ProcessStates.RUNNING
+        process = DummyProcess(config, state)
+        return HealthCheck(process)
+
+    def _startProbe(self, check, now=100):
+        check.next_check = now
+        check.transition(now)
+        return check.probe
+
+    def test_ctor(self):
+        from supervisor.states import HealthStates
+        check = self._makeOne()
+        self.assertEqual(check.state, HealthStates.UNKNOWN)
+        self.assertEqual(check.probe, None)
+        self.assertEqual(check.next_check, None)
+        self.assertEqual(check.get_dispatchers(), {})
+
+    def test_transition_not_running(self):
+        from supervisor.states import ProcessStates
+        check = self._makeOne(state=ProcessStates.STARTING)
+        check.transition(100)
+        self.assertEqual(check.next_check, None)
+        self.assertEqual(check.probe, None)
+
+    def test_transition_schedules_first_check_within_interval(self):
+        check = self._makeOne(healthcheck_interval=10)
+        check.transition(100)
+        self.assertTrue(100 <= check.next_check < 110)
+        self.assertEqual(check.probe, None)
+
+    def test_transition_starts_probe_when_due(self):
+        from supervisor import healthcheck
+        from supervisor.healthcheck import ExecProbe
+        check = self._makeOne(healthcheck_timeout=5)
+        probe = self._startProbe(check)
+        self.assertEqual(probe.__class__, ExecProbe)
+        self.assertEqual(probe.pid, 123)
+        self.assertEqual(probe.deadline, 105)
+        self.assertEqual(check.config.options.pidhistory[123], probe)
+        self.assertEqual(healthcheck.running_probes, 1)
+        # an exec probe has no fd for the main loop
+        self.assertEqual(check.get_dispatchers(), {})
+
+    def test_transition_too_many_probes(self):
+        from supervisor import healthcheck
+        healthcheck.running_probes = healthcheck.MAX_PROBES
+        check = self._makeOne()
+        self._startProbe(check)
+        self.assertEqual(check.probe, None)
+        self.assertTrue(100.5 <= check.next_check <= 101.5)
+
+    def test_transition_probe_cannot_start(self):
+        from supervisor import healthcheck
+        check = self._makeOne(healthcheck_retries=1, healthcheck_restart=False)
+        check.config.options.fork_error = 11
+        self._startProbe(check)
+        self.assertEqual(check.probe, None)
+        self.assertEqual(check.failures, 1)
+        self.assertEqual(healthcheck.running_probes, 0)
+
+    def test_transition_probe_timed_out(self):
+        check = self._makeOne(healthcheck_timeout=5)
+        probe = self._startProbe(check)
+        check.transition(104)
+        self.assertEqual(check.probe, probe)
+        check.transition(105)
+        self.assertEqual(check.probe, None)
+        self.assertEqual(check.failures, 1)
+        self.assertEqual(check.config.options.kills[-123], signal.SIGKILL)
+        self.assertEqual(check.config.options.logger.data[-1],
+                         'health check of foo failed (timed out after 5 '
+                         'seconds)')
+        # its exit, when it comes, is ignored
+        probe.finish(123, 0)
+        self.assertEqual(check.failures, 1)
+
+    def test_probe_passes(self):
+        from supervisor import healthcheck
+        from supervisor.states import HealthStates
+        check = self._makeOne(healthcheck_interval=10)
+        probe = self._startProbe(check)
+        probe.finish(123, 0)
+        self.assertEqual(check.state, HealthStates.HEALTHY)
+        self.assertEqual(check.probe, None)
+        self.assertEqual(probe.closed, True)
+        self.assertEqual(healthcheck.running_probes, 0)
+        self.assertEqual(len(self.events), 1)
+        event = self.events[0]
+        self.assertEqual(event.__class__.__name__,
+                         'ProcessHealthHealthyEvent')
+        self.assertEqual(event.from_state, HealthStates.UNKNOWN)
+        self.assertEqual(check.config.options.logger.data[-1],
+                         'health: foo is HEALTHY')
+
+    def test_probe_finished_schedules_next_check_with_jitter(self):
+        import time
+        check = self._makeOne(healthcheck_interval=10)
+        probe = self._startProbe(check)
+        before = time.time()
+        probe.finish(123, 0)
+        after = time.time()
+        self.assertTrue(before + 9 <= check.next_check <= after + 11)
+
+    def test_probe_fails_until_retries(self):
+        from supervisor.states import HealthStates
+        check = self._makeOne(healthcheck_retries=3)
+        for i in range(2):
+            probe = self._startProbe(check)
+            probe.finish(123, 1 << 8)
+        self.assertEqual(check.failures, 2)
+        self.assertEqual(check.state, HealthStates.UNKNOWN)
+        self.assertEqual(check.process.killed_with, None)
+        self.assertEqual(self.events, [])
+        probe = self._startProbe(check)
+        probe.finish(123, 1 << 8)
+        self.assertEqual(check.state, HealthStates.UNHEALTHY)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].__class__.__name__,
+                         'ProcessHealthUnhealthyEvent')
+        self.assertEqual(check.process.killed_with, signal.SIGTERM)
+        self.assertEqual(check.restarting, True)
+        # a pass clears the count of failures
+        probe = self._startProbe(check)
+        probe.finish(123, 0)
+        self.assertEqual(check.failures, 0)
+        self.assertEqual(check.state, HealthStates.HEALTHY)
+
+    def test_unhealthy_without_restart(self):
+        from supervisor.states import HealthStates
+        check = self._makeOne(healthcheck_retries=1, healthcheck_restart=False)
+        probe = self._startProbe(check)
+        probe.finish(123, 1 << 8)
+        self.assertEqual(check.state, HealthStates.UNHEALTHY)
+        self.assertEqual(check.process.killed_with, None)
+        self.assertEqual(check.restarting, False)
+
+    def test_restart_spawns_when_stopped(self):
+        from supervisor.states import HealthStates
+        from supervisor.states import ProcessStates
+        check = self._makeOne(healthcheck_retries=1)
+        probe = self._startProbe(check)
+        probe.finish(123, 1 << 8)
+        check.process.state = ProcessStates.STOPPING
+        check.transition(200)
+        self.assertEqual(check.process.spawned, False)
+        self.assertEqual(check.state, HealthStates.UNKNOWN)
+        check.process.state = ProcessStates.STOPPED
+        check.transition(201)
+        self.assertEqual(check.process.spawned, True)
+        self.assertEqual(check.restarting, False)
+
+    def test_restart_not_spawned_after_administrative_stop(self):
+        from supervisor.states import ProcessStates
+        check = self._makeOne(healthcheck_retries=1)
+        probe = self._startProbe(check)
+        probe.finish(123, 1 << 8)
+        check.process.administrative_stop = True
+        check.process.state = ProcessStates.STOPPED
+        check.transition(200)
+        self.assertEqual(check.process.spawned, False)
+        self.assertEqual(check.restarting, False)
+
+    def test_restart_not_spawned_when_shutting_down(self):
+        from supervisor.states import ProcessStates
+        from supervisor.states import SupervisorStates
+        check = self._makeOne(healthcheck_retries=1)
+        probe = self._startProbe(check)
+        probe.finish(123, 1 << 8)
+        check.config.options.mood = SupervisorStates.SHUTDOWN
+        check.process.state = ProcessStates.STOPPED
+        check.transition(200)
+        self.assertEqual(check.process.spawned, False)
+
+    def test_reset_abandons_probe(self):
+        from supervisor import healthcheck
+        from supervisor.states import HealthStates
+        from supervisor.states import ProcessStates
+        check = self._makeOne()
+        probe = self._startProbe(check)
+        probe.finish(123, 0)
+        probe = self._startProbe(check)
+        check.process.state = ProcessStates.EXITED
+        check.transition(101)
+        self.assertEqual(check.probe, None)
+        self.assertEqual(probe.closed, True)
+        self.assertEqual(check.next_check, None)
+        self.assertEqual(check.state, HealthStates.UNKNOWN)
+        self.assertEqual(healthcheck.running_probes, 0)
+        # UNKNOWN is not announced
+        self.assertEqual(len(self.events), 1)
+
+class ExecProbeTests(unittest.TestCase):
+    def _makeCheck(self, **kw):
+        from supervisor.healthcheck import HealthCheck
+        options = DummyOptions()
+        config = DummyPConfig(options, 'foo', '/bin/foo',
+                              healthcheck=('exec', 'test -f ok'), **kw)
+        process = DummyProcess(config)
+        process.set_uid = lambda: None
+        return HealthCheck(process)
+
+    def test_child(self):
+        from supervisor.healthcheck import ExecProbe
+        check = self._makeCheck(directory='/tmp', environment={'A':'1'})
+        options = check.config.options
+        options.forkpid = 0
+        ExecProbe(check, 105, 'test -f ok')
+        self.assertEqual(options.pgrp_set, True)
+        self.assertEqual(options.fds_closed, [3, 4])
+        self.assertEqual(options.execv_args,
+                         ('/bin/sh', ['/bin/sh', '-c', 'test -f ok']))
+        env = options.execv_environment
+        self.assertEqual(env['SUPERVISOR_PROCESS_NAME'], 'foo')
+        self.assertEqual(env['A'], '1')
+        self.assertEqual(options.changed_directory, True)
+        self.assertEqual(options._exitcode, 127)
+        self.assertEqual(options.pidhistory, {})
+
+    def test_finish_reports_exit_status(self):
+        from supervisor.healthcheck import ExecProbe
+        check = self._makeCheck()
+        check.config.options.forkpid = 123
+        probe = ExecProbe(check, 105, 'test -f ok')
+        finished = []
+        probe.finished = lambda ok, reason: finished.append((ok, reason))
+        probe.finish(123, 2 << 8)
+        self.assertEqual(finished, [(False, 'exit status 2')])
+        self.assertEqual(probe.pid, 0)
+        probe.close()
+        self.assertEqual(check.config.options.kills, {})
+
+class SocketProbeTests(unittest.TestCase):
+    def setUp(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+
+    def tearDown(self):
+        from supervisor import events
+        from supervisor import healthcheck
+        self.server.close()
+        events.clear()
+        healthcheck.running_probes = 0
+
+    def _makeCheck(self, spec):
+        from supervisor.healthcheck import HealthCheck
+        config = DummyPConfig(DummyOptions(), 'foo', '/bin/foo',
+                              healthcheck=spec, healthcheck_retries=1,
+                              healthcheck_restart=False)
+        return HealthCheck(DummyProcess(config))
+
+    def _poll(self, check):
+        # stands in for the main loop
+        for i in range(100):
+            probe = check.probe
+            if probe is None:
+                return
+            self.assertEqual(check.get_dispatchers(), {probe.fd:probe})
+            r, w, x = select.select([probe.fd], [probe.fd], [], 1)
+            if probe.fd in w and probe.writable():
+                probe.handle_write_event()
+            elif probe.fd in r and probe.readable():
+                probe.handle_read_event()
+            else:
+                self.serve()
+        self.fail('probe did not finish')
+
+    def serve(self):
+        pass
+
+    def test_tcp_connects(self):
+        from supervisor.states import HealthStates
+        check = self._makeCheck(('tcp', '127.0.0.1', self.port))
+        check.next_check = 0
+        check.transition(100)
+        self._poll(check)
+        self.assertEqual(check.state, HealthStates.HEALTHY)
+
+    def test_tcp_refused(self):
+        from supervisor.states import HealthStates
+        self.server.close()
+        check = self._makeCheck(('tcp', '127.0.0.1', self.port))
+        check.next_check = 0
+        check.transition(100)
+        self._poll(check)
+        self.assertEqual(check.state, HealthStates.UNHEALTHY)
+        self.assertTrue('refused' in check.config.options.logger.data[-2])
+
+    def test_http(self):
+        from supervisor.states import HealthStates
+        responses = ['HTTP/1.0 204 No Content\r\n\r\n']
+        requests = []
+        def serve():
+            if responses:
+                conn, addr = self.server.accept()
+                requests.append(conn.recv(4096))
+                conn.send(responses.pop())
+                conn.close()
+        self.serve = serve
+        check = self._makeCheck(('http', '127.0.0.1', self.port, '/health'))
+        check.next_check = 0
+        check.transition(100)
+        self._poll(check)
+        self.assertEqual(check.state, HealthStates.HEALTHY)
+        self.assertEqual(requests,
+                         ['GET /health HTTP/1.0\r\nHost: 127.0.0.1:%s\r\n'
+                          'Connection: close\r\n\r\n' % self.port])
+
+class HTTPStatusTests(unittest.TestCase):
+    def _callFUT(self, response):
+        from supervisor.healthcheck import http_status
+        return http_status(response)
+
+    def test_ok(self):
+        self.assertEqual(self._callFUT('HTTP/1.1 200 OK\r\n'),
+                         (True, 'status 200'))
+
+    def test_redirect(self):
+        self.assertEqual(self._callFUT('HTTP/1.0 302 Found\r\nLoc'),
+                         (True, 'status 302'))
+
+    def test_error(self):
+        self.assertEqual(self._callFUT('HTTP/1.1 503 Unavailable\r\n'),
+                         (False, 'status 503'))
+
+    def test_bad(self):
+        self.assertEqual(self._callFUT(''), (False, "bad response ''"))
+        self.assertEqual(self._callFUT('SSH-2.0\r\n'),
+                         (False, "bad response 'SSH-2.0'"))
+        self.assertEqual(self._callFUT('HTTP/1.1 OK\r\n'),
+                         (False, "bad response 'HTTP/1.1 OK'"))
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -15,6 +15,7 @@ from supervisor.tests.base import DummyRPCInterfaceFactory
 from supervisor.tests.base import DummyPConfig
 from supervisor.tests.base import DummyOptions
 from supervisor.tests.base import DummyRequest
+from supervisor.tests.base import DummyProcess
 
 from supervisor.http import NOT_DONE_YET
 
@@ -76,6 +77,72 @@ class LogtailHandlerTests(HandlerTests, unittest.TestCase):
         self.assertEqual(len(request.producers), 1)
         self.assertEqual(request._done, True)
 
+class GroupTailHandlerTests(HandlerTests, unittest.TestCase):
+    def tearDown(self):
+        from supervisor.events import clear
+        clear()
+
+    def _getTargetClass(self):
+        from supervisor.http import grouptail_handler
+        return grouptail_handler
+
+    def test_handle_request_no_matching_processes(self):
+        options = DummyOptions()
+        pconfig = DummyPConfig(options, 'foo', 'foo')
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig)
+        handler = self._makeOne(supervisord)
+        request = DummyRequest('/logtail-group/bar', None, None, None)
+        handler.handle_request(request)
+        self.assertEqual(request._error, 404)
+
+    def test_handle_request_bad_channel(self):
+        options = DummyOptions()
+        pconfig = DummyPConfig(options, 'foo', 'foo')
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig)
+        handler = self._makeOne(supervisord)
+        request = DummyRequest('/logtail-group/foo/fudge', None, None, None)
+        handler.handle_request(request)
+        self.assertEqual(request._error, 404)
+
+    def test_handle_request(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', 'process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2')
+        pconfig3 = DummyPConfig(options, 'other', 'other')
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig1,
+                                               pconfig2, pconfig3)
+        handler = self._makeOne(supervisord)
+        request = DummyRequest('/logtail-group/foo:process*/stderr',
+                               None, None, None)
+        handler.handle_request(request)
+        self.assertEqual(request._error, None)
+        self.assertEqual(request.headers['Content-Type'], 'text/plain')
+        self.assertEqual(len(request.producers), 1)
+        self.assertEqual(request._done, True)
+        producer = request.producers[0]
+        self.assertEqual(producer.channel, 'stderr')
+        processes = supervisord.process_groups['foo'].processes
+        self.assertEqual(processes['process1'].output_listeners,
+                         [producer.feed])
+        self.assertEqual(processes['process2'].output_listeners,
+                         [producer.feed])
+        self.assertEqual(processes['other'].output_listeners, [])
+
+    def test_handle_request_bare_group_name(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', 'process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2')
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig1,
+                                               pconfig2)
+        handler = self._makeOne(supervisord)
+        request = DummyRequest('/logtail-group/foo', None, None, None)
+        handler.handle_request(request)
+        producer = request.producers[0]
+        self.assertEqual(producer.channel, 'stdout')
+        prefixes = producer.prefixes.values()
+        prefixes.sort()
+        self.assertEqual(prefixes, ['foo:process1 | ', 'foo:process2 | '])
+
 class MainLogTailHandlerTests(HandlerTests, unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.http import mainlogtail_handler
@@ -146,6 +213,111 @@ class TailFProducerTests(unittest.TestCase):
         result = producer.more()
         self.assertEqual(result, '==> File truncated <==\n')
 
+class GroupTailProducerTests(unittest.TestCase):
+    def tearDown(self):
+        from supervisor.events import clear
+        clear()
+
+    def _getTargetClass(self):
+        from supervisor.http import group_tail_producer
+        return group_tail_producer
+
+    def _makeOne(self, request, processes, channel='stdout', maxbytes=1<<20):
+        return self._getTargetClass()(request, self.supervisord, processes,
+                                      channel, maxbytes)
+
+    def _makeProcesses(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'foo', 'foo')
+        pconfig2 = DummyPConfig(options, 'bar', 'bar')
+        self.supervisord = PopulatedDummySupervisor(options, 'g', pconfig1,
+                                                    pconfig2)
+        group = self.supervisord.process_groups['g']
+        p1 = group.processes['foo']
+        p2 = group.processes['bar']
+        p1.group = p2.group = group
+        return p1, p2
+
+    def test_more_merges_complete_lines_with_prefixes(self):
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('g:foo', p1), ('g:bar', p2)])
+        self.assertEqual(producer.more(), NOT_DONE_YET)
+        producer.feed(p1, 'stdout', 'one\ntw')
+        producer.feed(p2, 'stdout', 'three\n')
+        producer.feed(p1, 'stderr', 'ignored\n')
+        producer.feed(p1, 'stdout', 'o\n')
+        self.assertEqual(producer.more(),
+                         'g:foo | one\ng:bar | three\ng:foo | two\n')
+        self.assertEqual(producer.more(), NOT_DONE_YET)
+
+    def test_feed_drops_output_over_maxbytes(self):
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('foo', p1)], maxbytes=10)
+        producer.feed(p1, 'stdout', 'abcdef\nghijk\n')
+        self.assertEqual(producer.more(),
+                         'foo | abcdef\n==> 6 bytes dropped <==\n')
+
+    def test_detaches_when_client_gone(self):
+        from supervisor import events
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('foo', p1), ('bar', p2)])
+        self.assertEqual(len(events.callbacks), 1)
+        request.channel.close()
+        self.assertEqual(p1.output_listeners, [])
+        self.assertEqual(p2.output_listeners, [])
+        self.assertEqual(request.channel.close_callbacks, [])
+        self.assertEqual(events.callbacks, [])
+        self.assertEqual(producer.more(), '')
+
+    def test_exit_flushes_partial_line(self):
+        from supervisor import events
+        from supervisor.states import ProcessStates
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('foo', p1), ('bar', p2)])
+        producer.feed(p1, 'stdout', 'no newline')
+        events.notify(events.ProcessStateExitedEvent(p1,
+                                                     ProcessStates.RUNNING))
+        self.assertEqual(producer.more(), 'foo | no newline\n')
+        # it may be started again, so it is still listened to
+        self.assertEqual(p1.output_listeners, [producer.feed])
+
+    def test_follows_restarted_process(self):
+        from supervisor import events
+        from supervisor.states import ProcessStates
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('foo', p1), ('bar', p2)])
+        producer.feed(p1, 'stdout', 'one\ntwo')
+        events.notify(events.ProcessStateStoppedEvent(p1,
+                                                      ProcessStates.STOPPING))
+        self.assertEqual(producer.more(), 'foo | one\nfoo | two\n')
+        self.assertEqual(producer.more(), NOT_DONE_YET)
+        events.notify(events.ProcessStateStartingEvent(p1,
+                                                       ProcessStates.STOPPED))
+        producer.feed(p1, 'stdout', 'three\n')
+        self.assertEqual(producer.more(), 'foo | three\n')
+        # even FATAL processes may be started by hand
+        events.notify(events.ProcessStateFatalEvent(p2,
+                                                    ProcessStates.BACKOFF))
+        self.assertEqual(p1.output_listeners, [producer.feed])
+        self.assertEqual(p2.output_listeners, [producer.feed])
+        self.assertEqual(producer.more(), NOT_DONE_YET)
+
+    def test_more_detaches_processes_of_removed_group(self):
+        request = DummyRequest('/logtail-group/g', None, None, None)
+        p1, p2 = self._makeProcesses()
+        producer = self._makeOne(request, [('foo', p1), ('bar', p2)])
+        producer.feed(p2, 'stdout', 'last words')
+        del self.supervisord.process_groups['g']
+        self.assertEqual(producer.more(), 'bar | last words\n')
+        self.assertEqual(p1.output_listeners, [])
+        self.assertEqual(p2.output_listeners, [])
+        self.assertEqual(producer.more(), '')
+
 class DeferringChunkedProducerTests(unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.http import deferring_chunked_producer
@@ -255,6 +427,66 @@ class DeferringHookedProducerTests(unittest.TestCase):
         self.assertEqual(producer.more(), '')
         self.assertEqual(L, [0])
 
+class DeferringHttpChannelTests(unittest.TestCase):
+    def setUp(self):
+        self.channels = []
+
+    def tearDown(self):
+        for channel in self.channels:
+            channel.close()
+        self.client.close()
+
+    def _makeOne(self):
+        import socket
+        from supervisor.http import deferring_http_channel
+        self.client, conn = socket.socketpair()
+        channel = deferring_http_channel(None, conn, None)
+        self.channels.append(channel)
+        return channel
+
+    def test_writable_when_deferred_is_woken(self):
+        channel = self._makeOne()
+        deferred = DummyDeferred()
+        channel.push_with_producer(deferred)
+        channel.refill_buffer()
+        self.assertEqual(channel.delay, 60)
+        self.assertEqual(channel.deferred, deferred)
+        now = lambda: channel.writable_check
+        self.assertEqual(channel.writable(now), False)
+        deferred.woken = True
+        self.assertEqual(channel.writable(now), True)
+
+    def test_deferred_forgotten_when_done(self):
+        channel = self._makeOne()
+        deferred = DummyDeferred()
+        channel.push_with_producer(deferred)
+        channel.refill_buffer()
+        deferred.data = 'the response'
+        channel.refill_buffer()
+        self.assertEqual(channel.delay, False)
+        self.assertEqual(channel.deferred, None)
+
+    def test_close_stops_waiting(self):
+        channel = self._makeOne()
+        deferred = DummyDeferred()
+        channel.push_with_producer(deferred)
+        channel.refill_buffer()
+        channel.close()
+        self.channels.remove(channel)
+        self.assertEqual(deferred.stopped, True)
+
+    def test_close_calls_close_callbacks(self):
+        channel = self._makeOne()
+        called = []
+        channel.add_close_callback(lambda: called.append(1))
+        removed = lambda: called.append(2)
+        channel.add_close_callback(removed)
+        channel.remove_close_callback(removed)
+        channel.close()
+        self.channels.remove(channel)
+        self.assertEqual(called, [1])
+        self.assertEqual(channel.close_callbacks, ())
+
 class EncryptedDictionaryAuthorizedTests(unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.http import encrypted_dictionary_authorizer
@@ -334,6 +566,7 @@ class TopLevelFunctionTests(unittest.TestCase):
         server = inetdata[1]
         idents = [
             'Supervisor XML-RPC Handler',
+            'Group Logtail HTTP Request Handler',
             'Logtail HTTP Request Handler',
             'Main Logtail HTTP Request Handler',
             'Supervisor Web UI HTTP Request Handler',
@@ -372,6 +605,21 @@ class DummyProducer:
         else:
             return ''
 
+class DummyDeferred:
+    delay = 60
+    woken = False
+    stopped = False
+
+    def __init__(self):
+        from supervisor.http import NOT_DONE_YET
+        self.data = NOT_DONE_YET
+
+    def more(self):
+        return self.data
+
+    def stop_waiting(self):
+        self.stopped = True
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
@@ -177,6 +177,113 @@ class RotatingFileHandlerTests(FileHandlerTests):
         two = open(self.filename+ '.2','r').read()
         self.assertEqual(two, 'a'*12)
 
+    def test_emit_does_rollover_after_pool_eviction(self):
+        from supervisor.loggers import FileHandlerPool
+        pool = FileHandlerPool(1)
+        handler = self._makeOne(self.filename, maxBytes=10, backupCount=2,
+                                pool=pool)
+        other = self._makeOne(os.path.join(self.basedir, 'other'), pool=pool)
+        record = self._makeLogRecord('a' * 4)
+
+        handler.emit(record) # 4 bytes
+        other.emit(record) # evicts handler
+        self.assertEqual(handler.stream, None)
+        handler.emit(record) # 8 bytes
+        other.emit(record)
+        handler.emit(record) # 12 bytes, do rollover
+        self.assertTrue(os.path.exists(self.filename + '.1'))
+        self.assertEqual(open(self.filename + '.1').read(), 'a' * 12)
+        self.assertEqual(open(self.filename).read(), '')
+
+class FileHandlerPoolTests(HandlerTests, unittest.TestCase):
+    def _getTargetClass(self):
+        from supervisor.loggers import FileHandlerPool
+        return FileHandlerPool
+
+    def _makeHandler(self, pool, name='thelog'):
+        from supervisor.loggers import FileHandler
+        return FileHandler(os.path.join(self.basedir, name), pool=pool)
+
+    def test_handler_ctor_creates_file_without_opening_it(self):
+        pool = self._makeOne(2)
+        handler = self._makeHandler(pool)
+        self.assertEqual(handler.stream, None)
+        self.assertEqual(pool.handlers, {})
+        # the log of a process which has written nothing yet is empty,
+        # not missing
+        from supervisor.options import readFile
+        self.assertEqual(readFile(self.filename, 0, 0), '')
+
+    def test_reopen_recreates_removed_file(self):
+        pool = self._makeOne(2)
+        handler = self._makeHandler(pool)
+        handler.remove()
+        handler.reopen()
+        self.assertEqual(handler.stream, None)
+        self.assertTrue(os.path.exists(self.filename))
+
+    def test_emit_opens_file(self):
+        pool = self._makeOne(2)
+        handler = self._makeHandler(pool)
+        handler.emit(self._makeLogRecord('hello'))
+        self.assertEqual(open(self.filename).read(), 'hello')
+        self.assertEqual(pool.handlers.keys(), [handler])
+
+    def test_acquire_evicts_least_recently_used(self):
+        pool = self._makeOne(2)
+        one = self._makeHandler(pool, 'one')
+        two = self._makeHandler(pool, 'two')
+        three = self._makeHandler(pool, 'three')
+        record = self._makeLogRecord('x')
+        one.emit(record)
+        two.emit(record)
+        one.emit(record)
+        three.emit(record)
+        self.assertEqual(two.stream, None)
+        self.assertNotEqual(one.stream, None)
+        self.assertNotEqual(three.stream, None)
+        self.assertEqual(len(pool.handlers), 2)
+
+    def test_evicted_handler_appends_on_next_write(self):
+        pool = self._makeOne(1)
+        one = self._makeHandler(pool, 'one')
+        two = self._makeHandler(pool, 'two')
+        one.emit(self._makeLogRecord('abc'))
+        two.emit(self._makeLogRecord('x'))
+        self.assertEqual(one.stream, None)
+        one.emit(self._makeLogRecord('def'))
+        self.assertEqual(one.stream.tell(), 6)
+        one.flush()
+        self.assertEqual(open(one.baseFilename).read(), 'abcdef')
+
+    def test_reopen_releases_handler(self):
+        pool = self._makeOne(2)
+        handler = self._makeHandler(pool)
+        handler.emit(self._makeLogRecord('x'))
+        handler.reopen()
+        self.assertEqual(handler.stream, None)
+        self.assertEqual(pool.handlers, {})
+
+    def test_close_unopened_handler(self):
+        pool = self._makeOne(2)
+        handler = self._makeHandler(pool)
+        handler.close()
+        handler.flush()
+        self.assertEqual(handler.stream, None)
+
+    def test_emit_open_error(self):
+        pool = self._makeOne(2)
+        os.mkdir(os.path.join(self.basedir, 'gone'))
+        handler = self._makeHandler(pool, os.path.join('gone', 'a.log'))
+        handler.remove()
+        os.rmdir(os.path.join(self.basedir, 'gone'))
+        handled = []
+        handler.handleError = lambda record: handled.append(record)
+        record = self._makeLogRecord('x')
+        handler.emit(record)
+        self.assertEqual(handled, [record])
+        self.assertEqual(pool.handlers, {})
+
 class BoundIOTests(unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.loggers import BoundIO
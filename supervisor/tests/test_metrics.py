@@ -0,0 +1,96 @@
+"""Test suite for supervisor.metrics"""
+
+import sys
+import unittest
+
+class HistogramTests(unittest.TestCase):
+    def _makeOne(self, *arg):
+        from supervisor.metrics import Histogram
+        return Histogram(*arg)
+
+    def test_empty(self):
+        histogram = self._makeOne()
+        self.assertEqual(histogram.count, 0)
+        self.assertEqual(histogram.mean(), 0.0)
+        self.assertEqual(histogram.percentile(99), 0.0)
+        self.assertEqual(histogram.counts, [0] * 10)
+
+    def test_add(self):
+        histogram = self._makeOne((1, 10))
+        histogram.add(0.5)
+        histogram.add(1)
+        histogram.add(7)
+        histogram.add(100)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.total, 108.5)
+        self.assertEqual(histogram.max, 100)
+        self.assertEqual(histogram.mean(), 27.125)
+
+    def test_percentile(self):
+        histogram = self._makeOne((1, 10, 100))
+        for value in range(1, 11):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(10), 1.0)
+        self.assertEqual(histogram.percentile(50), 10.0)
+        histogram.add(50)
+        self.assertEqual(histogram.percentile(99), 50.0)
+        histogram.add(1000)
+        self.assertEqual(histogram.percentile(99), 1000)
+
+class PoolMetricsTests(unittest.TestCase):
+    def _makeOne(self, now=100):
+        from supervisor.metrics import PoolMetrics
+        return PoolMetrics(now)
+
+    def test_busy_ratios(self):
+        metrics = self._makeOne()
+        metrics.busy('listener_0', 110)
+        metrics.busy('listener_0', 115) # already busy
+        metrics.idle('listener_0', 120)
+        metrics.idle('listener_0', 125) # already idle
+        metrics.busy('listener_0', 130)
+        metrics.busy('listener_1', 140)
+        ratios = metrics.busy_ratios(['listener_0', 'listener_1',
+                                      'listener_2'], 150)
+        self.assertEqual(ratios, {'listener_0':0.6, 'listener_1':0.2,
+                                  'listener_2':0.0})
+
+    def test_busy_seconds(self):
+        metrics = self._makeOne()
+        metrics.busy('listener_0', 110)
+        metrics.idle('listener_0', 120)
+        metrics.busy('listener_0', 130)
+        metrics.busy('listener_1', 140)
+        metrics.busy('listener_2', 145)
+        self.assertEqual(metrics.busy_seconds(['listener_0', 'listener_1'],
+                                              150), 40)
+
+    def test_busy_ratios_no_time_elapsed(self):
+        metrics = self._makeOne()
+        self.assertEqual(metrics.busy_ratios(['listener_0'], 100),
+                         {'listener_0':0.0})
+
+    def test_rates(self):
+        metrics = self._makeOne()
+        for i in range(10):
+            metrics.accept('TICK_5')
+        metrics.accept('PROCESS_LOG')
+        self.assertEqual(metrics.accepted, {'TICK_5':10, 'PROCESS_LOG':1})
+        self.assertEqual(metrics.rates(110), {'TICK_5':1.0,
+                                              'PROCESS_LOG':0.1})
+        self.assertEqual(metrics.rates(120, roll=True),
+                         {'TICK_5':0.5, 'PROCESS_LOG':0.05})
+        for i in range(20):
+            metrics.accept('TICK_5')
+        # the rates of the last complete period until the next roll
+        self.assertEqual(metrics.rates(125),
+                         {'TICK_5':0.5, 'PROCESS_LOG':0.05})
+        self.assertEqual(metrics.rates(130, roll=True),
+                         {'TICK_5':2.0, 'PROCESS_LOG':0.0})
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -265,6 +265,7 @@ class ServerOptionsTests(unittest.TestCase):
         nocleanup=true
         minfds=2048
         minprocs=300
+        childlog_maxfds=100
         environment=FAKE_ENV_VAR=/some/path
 
         [program:cat1]
@@ -297,6 +298,7 @@ class ServerOptionsTests(unittest.TestCase):
         exitcodes=0,1,127
         stopasgroup=true
         killasgroup=true
+        notify_ready=true
 
         [program:cat4]
         priority=4
@@ -333,6 +335,7 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertEqual(options.nocleanup, True)
         self.assertEqual(options.minfds, 2048)
         self.assertEqual(options.minprocs, 300)
+        self.assertEqual(options.childlog_maxfds, 100)
         self.assertEqual(options.nocleanup, True)
         self.assertEqual(len(options.process_group_configs), 4)
         self.assertEqual(options.environment, dict(FAKE_ENV_VAR='/some/path'))
@@ -356,6 +359,7 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertEqual(proc1.stopwaitsecs, 5)
         self.assertEqual(proc1.stopasgroup, False)
         self.assertEqual(proc1.killasgroup, False)
+        self.assertEqual(proc1.notify_ready, False)
         self.assertEqual(proc1.stdout_logfile_maxbytes,
                          datatypes.byte_size('50MB'))
         self.assertEqual(proc1.stdout_logfile_backups, 10)
@@ -405,6 +409,7 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertEqual(proc3.stopsignal, signal.SIGTERM)
         self.assertEqual(proc3.stopasgroup, True)
         self.assertEqual(proc3.killasgroup, True)
+        self.assertEqual(proc3.notify_ready, True)
 
         cat4 = options.process_group_configs[3]
         self.assertEqual(cat4.name, 'cat4')
@@ -470,6 +475,8 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertEqual(instance.nocleanup, True)
         self.assertEqual(instance.minfds, 2048)
         self.assertEqual(instance.minprocs, 300)
+        self.assertEqual(instance.childlog_maxfds, 100)
+        self.assertEqual(instance.childlog_pool.maxopen, 100)
 
     def test_no_config_file_exits(self):
         instance = self._makeOne()
@@ -778,6 +785,9 @@ class ServerOptionsTests(unittest.TestCase):
         stdout_logfile_backups = 1
         stdout_logfile_maxbytes = 100MB
         stdout_events_enabled = true
+        stdout_events_flush_ms = 250
+        stdout_events_max_bytes = 4KB
+        stdout_filter_drop = ^DEBUG
         stopsignal = KILL
         stopwaitsecs = 100
         killasgroup = true
@@ -804,6 +814,12 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertEqual(pconfig.stdout_capture_maxbytes, 0)
         self.assertEqual(pconfig.stdout_logfile_maxbytes, 104857600)
         self.assertEqual(pconfig.stdout_events_enabled, True)
+        self.assertEqual(pconfig.stdout_events_flush_ms, 250)
+        self.assertEqual(pconfig.stdout_events_max_bytes, 4096)
+        self.assertEqual(pconfig.stderr_events_flush_ms, 0)
+        self.assertEqual(pconfig.stderr_events_max_bytes, 0)
+        self.assertEqual(pconfig.stdout_filter_drop, ['^DEBUG'])
+        self.assertEqual(pconfig.stdout_filter_keep, [])
         self.assertEqual(pconfig.stopsignal, signal.SIGKILL)
         self.assertEqual(pconfig.stopasgroup, False)
         self.assertEqual(pconfig.killasgroup, True)
@@ -926,6 +942,64 @@ class ServerOptionsTests(unittest.TestCase):
         self.assertRaises(ValueError, instance.processes_from_section,
                           config, 'program:foo', None)
 
+    def test_processes_from_section_healthcheck(self):
+        instance = self._makeOne()
+        text = lstrip("""\
+        [program:foo]
+        command = /bin/cat
+        healthcheck = http://:8080/health
+        healthcheck_interval = 10
+        healthcheck_timeout = 2
+        healthcheck_retries = 5
+        healthcheck_restart = false
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        pconfig = instance.processes_from_section(config, 'program:foo',
+                                                  'bar')[0]
+        self.assertEqual(pconfig.healthcheck,
+                         ('http', '127.0.0.1', 8080, '/health'))
+        self.assertEqual(pconfig.healthcheck_interval, 10)
+        self.assertEqual(pconfig.healthcheck_timeout, 2)
+        self.assertEqual(pconfig.healthcheck_retries, 5)
+        self.assertEqual(pconfig.healthcheck_restart, False)
+
+    def test_processes_from_section_healthcheck_defaults(self):
+        instance = self._makeOne()
+        text = lstrip("""\
+        [program:foo]
+        command = /bin/cat
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        pconfig = instance.processes_from_section(config, 'program:foo',
+                                                  'bar')[0]
+        self.assertEqual(pconfig.healthcheck, None)
+        self.assertEqual(pconfig.healthcheck_interval, 30)
+        self.assertEqual(pconfig.healthcheck_timeout, 5)
+        self.assertEqual(pconfig.healthcheck_retries, 3)
+        self.assertEqual(pconfig.healthcheck_restart, True)
+
+    def test_processes_from_section_bad_healthcheck(self):
+        from supervisor.options import UnhosedConfigParser
+        for setting in ('healthcheck = udp://:53',
+                        'healthcheck = tcp://localhost:53',
+                        'healthcheck_interval = 0',
+                        'healthcheck_timeout = 0',
+                        'healthcheck_retries = 0'):
+            instance = self._makeOne()
+            text = lstrip("""\
+            [program:foo]
+            command = /bin/cat
+            %s
+            """ % setting)
+            config = UnhosedConfigParser()
+            config.read_string(text)
+            self.assertRaises(ValueError, instance.processes_from_section,
+                              config, 'program:foo', None)
+
     def test_processes_from_section_stopasgroup_implies_killasgroup(self):
         instance = self._makeOne()
         text = lstrip("""\
@@ -1065,6 +1139,212 @@ class ServerOptionsTests(unittest.TestCase):
         gconfig1 = gconfigs[0]
         self.assertEqual(gconfig1.result_handler, dummy_handler)
 
+    def test_event_listener_pool_with_batch_size(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        batch_size = 10
+        max_batch_latency = 250
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].batch_size, 10)
+        self.assertEqual(gconfigs[0].max_batch_latency, 250)
+
+    def test_event_listener_pool_batch_size_defaults(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].batch_size, 1)
+        self.assertEqual(gconfigs[0].max_batch_latency, 0)
+
+    def test_event_listener_pool_batch_size_zero(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        batch_size = 0
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        self.assertRaises(ValueError,instance.process_groups_from_parser,config)
+
+    def test_event_listener_pool_with_window_size(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        window_size = 8
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].window_size, 8)
+
+    def test_event_listener_pool_window_size_with_batch_size(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        window_size = 8
+        batch_size = 8
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        self.assertRaises(ValueError,instance.process_groups_from_parser,config)
+
+    def test_event_listener_pool_with_spool(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        spool_file = /tmp/dog.spool
+        spool_maxbytes = 1MB
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].spool_file, '/tmp/dog.spool')
+        self.assertEqual(gconfigs[0].spool_maxbytes, 1024 * 1024)
+
+    def test_event_listener_pool_spool_defaults(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].spool_file, None)
+        self.assertEqual(gconfigs[0].spool_maxbytes, 50 * 1024 * 1024)
+
+    def test_event_listener_pool_with_retries(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        max_retries = 5
+        retry_delay = 250
+        dead_letter_size = 20
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].max_retries, 5)
+        self.assertEqual(gconfigs[0].retry_delay, 250)
+        self.assertEqual(gconfigs[0].dead_letter_size, 20)
+
+    def test_event_listener_pool_with_filters(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_STATE
+        command = /bin/dog
+        events_filter_processes = web*,db
+        events_filter_groups = backend
+        events_filter_expected = false
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].filter_processes, ['web*', 'db'])
+        self.assertEqual(gconfigs[0].filter_groups, ['backend'])
+        self.assertEqual(gconfigs[0].filter_expected, False)
+
+    def test_event_listener_pool_filter_defaults(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_STATE
+        command = /bin/dog
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].filter_processes, [])
+        self.assertEqual(gconfigs[0].filter_groups, [])
+        self.assertEqual(gconfigs[0].filter_expected, None)
+
+    def test_event_listener_pool_autoscaling(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        process_name = %(program_name)s_%(process_num)s
+        command = /bin/dog
+        numprocs_min = 2
+        numprocs_max = 4
+        numprocs_idle_secs = 30
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        gconfig = gconfigs[0]
+        self.assertEqual(gconfig.numprocs_min, 2)
+        self.assertEqual(gconfig.numprocs_max, 4)
+        self.assertEqual(gconfig.numprocs_idle_secs, 30)
+        self.assertEqual([ p.name for p in gconfig.process_configs ],
+                         ['dog_0', 'dog_1', 'dog_2', 'dog_3'])
+
+    def test_event_listener_pool_autoscaling_defaults(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        command = /bin/dog
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        gconfigs = instance.process_groups_from_parser(config)
+        self.assertEqual(gconfigs[0].numprocs_min, 1)
+        self.assertEqual(gconfigs[0].numprocs_max, 0)
+        self.assertEqual(gconfigs[0].numprocs_idle_secs, 60)
+        self.assertEqual(len(gconfigs[0].process_configs), 1)
+
+    def test_event_listener_pool_numprocs_min_above_max(self):
+        text = lstrip("""\
+        [eventlistener:dog]
+        events=PROCESS_COMMUNICATION
+        process_name = %(program_name)s_%(process_num)s
+        command = /bin/dog
+        numprocs_min = 3
+        numprocs_max = 2
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        self.assertRaises(ValueError,
+                          instance.process_groups_from_parser, config)
+
     def test_event_listener_pool_noeventsline(self):
         text = lstrip("""\
         [eventlistener:dog]
@@ -1457,6 +1737,68 @@ class ServerOptionsTests(unittest.TestCase):
         instance.clear_autochildlogdir()
         self.assertEqual(instance.logger.data, ['Could not clear childlog dir'])
 
+    def test_event_server_config_from_parser(self):
+        text = lstrip("""\
+        [unix_event_server]
+        file = /tmp/events.sock
+        chmod = 0770
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        self.assertEqual(instance.event_server_config_from_parser(config),
+                         {'file':'/tmp/events.sock', 'chmod':0770,
+                          'chown':(-1, -1)})
+
+    def test_event_server_config_from_parser_no_section(self):
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        instance = self._makeOne()
+        self.assertEqual(instance.event_server_config_from_parser(config),
+                         None)
+
+    def test_event_server_config_from_parser_no_file(self):
+        text = lstrip("""\
+        [unix_event_server]
+        chmod = 0770
+        """)
+        from supervisor.options import UnhosedConfigParser
+        config = UnhosedConfigParser()
+        config.read_string(text)
+        instance = self._makeOne()
+        self.assertRaises(ValueError,
+                          instance.event_server_config_from_parser, config)
+
+    def test_openeventserver_not_configured(self):
+        instance = self._makeOne()
+        instance.openeventserver()
+        self.assertEqual(instance.eventserver, None)
+
+    def test_openeventserver_reports_friendly_usage_when_eaddrinuse(self):
+        instance = self._makeOne()
+        instance.event_server_config = {}
+        def raise_eaddrinuse():
+            raise socket.error(errno.EADDRINUSE)
+        instance.make_event_server = raise_eaddrinuse
+        recorder = []
+        instance.usage = recorder.append
+        instance.openeventserver()
+        self.assertEqual(len(recorder), 1)
+        expected = 'Another program is already listening'
+        self.assertTrue(recorder[0].startswith(expected))
+
+    def test_close_eventserver(self):
+        instance = self._makeOne()
+        class Server:
+            closed = False
+            def close(self):
+                self.closed = True
+        server = instance.eventserver = Server()
+        instance.close_eventserver()
+        self.assertEqual(server.closed, True)
+        self.assertEqual(instance.eventserver, None)
+
     def test_openhttpservers_reports_friendly_usage_when_eaddrinuse(self):
         supervisord = DummySupervisor()
         instance = self._makeOne()
@@ -1575,9 +1917,13 @@ class TestProcessConfig(unittest.TestCase):
                      'startsecs', 'startretries', 'uid',
                      'stdout_logfile', 'stdout_capture_maxbytes',
                      'stdout_events_enabled',
+                     'stdout_events_flush_ms', 'stdout_events_max_bytes',
+                     'stdout_filter_drop', 'stdout_filter_keep',
                      'stdout_logfile_backups', 'stdout_logfile_maxbytes',
                      'stderr_logfile', 'stderr_capture_maxbytes',
                      'stderr_events_enabled',
+                     'stderr_events_flush_ms', 'stderr_events_max_bytes',
+                     'stderr_filter_drop', 'stderr_filter_keep',
                      'stderr_logfile_backups', 'stderr_logfile_maxbytes',
                      'stopsignal', 'stopwaitsecs', 'stopasgroup', 'killasgroup', 'exitcodes',
                      'redirect_stderr', 'environment'):
@@ -1637,6 +1983,17 @@ class TestProcessConfig(unittest.TestCase):
         self.assertEqual(pipes['stdout'], 5)
         self.assertEqual(pipes['stderr'], None)
 
+    def test_make_dispatchers_notify_ready(self):
+        options = DummyOptions()
+        instance = self._makeOne(options, notify_ready=True)
+        process1 = DummyProcess(instance)
+        dispatchers, pipes = instance.make_dispatchers(process1)
+        from supervisor.dispatchers import PNotifyDispatcher
+        self.assertEqual(dispatchers[9].__class__, PNotifyDispatcher)
+        self.assertEqual(dispatchers[9].channel, 'notify')
+        self.assertEqual(pipes['notify'], 9)
+        self.assertEqual(pipes['child_notify'], 10)
+
 class FastCGIProcessConfigTest(unittest.TestCase):
     def _getTargetClass(self):
         from supervisor.options import FastCGIProcessConfig
@@ -1649,9 +2006,13 @@ class FastCGIProcessConfigTest(unittest.TestCase):
                      'startsecs', 'startretries', 'uid',
                      'stdout_logfile', 'stdout_capture_maxbytes',
                      'stdout_events_enabled',
+                     'stdout_events_flush_ms', 'stdout_events_max_bytes',
+                     'stdout_filter_drop', 'stdout_filter_keep',
                      'stdout_logfile_backups', 'stdout_logfile_maxbytes',
                      'stderr_logfile', 'stderr_capture_maxbytes',
                      'stderr_events_enabled',
+                     'stderr_events_flush_ms', 'stderr_events_max_bytes',
+                     'stderr_filter_drop', 'stderr_filter_keep',
                      'stderr_logfile_backups', 'stderr_logfile_maxbytes',
                      'stopsignal', 'stopwaitsecs', 'stopasgroup', 'killasgroup', 'exitcodes',
                      'redirect_stderr', 'environment'):
@@ -488,6 +488,28 @@ class SubprocessTests(unittest.TestCase):
             options.execv_environment['SUPERVISOR_SERVER_URL'],
             'http://localhost:9001')
 
+    def test_spawn_as_child_notify_ready(self):
+        options = DummyOptions()
+        options.forkpid = 0
+        config = DummyPConfig(options, 'cat', '/bin/cat', notify_ready=True)
+        instance = self._makeOne(config)
+        result = instance.spawn()
+        self.assertEqual(result, None)
+        self.assertEqual(
+            options.execv_environment['SUPERVISOR_NOTIFY_FD'], '3')
+        self.assertEqual(options.duped[instance.pipes['child_notify']], 3)
+        # fd 3 is left open for the child
+        self.assertEqual(len(options.fds_closed), options.minfds - 4)
+
+    def test_spawn_as_child_without_notify_ready(self):
+        options = DummyOptions()
+        options.forkpid = 0
+        config = DummyPConfig(options, 'cat', '/bin/cat')
+        instance = self._makeOne(config)
+        instance.spawn()
+        self.failIf('SUPERVISOR_NOTIFY_FD' in options.execv_environment)
+        self.assertEqual(len(options.fds_closed), options.minfds - 3)
+
     def test_spawn_as_child_stderr_redirected(self):
         options = DummyOptions()
         options.forkpid = 0
@@ -699,6 +721,119 @@ class SubprocessTests(unittest.TestCase):
         self.assertEqual(event1.__class__, events.ProcessStateStoppingEvent)
         self.assertEqual(event2.__class__, events.ProcessStateUnknownEvent)
 
+    def test_report_ready(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test', startsecs=60,
+                              notify_ready=True)
+        instance = self._makeOne(config)
+        instance.pid = 11
+        instance.backoff = 1
+        from supervisor.states import ProcessStates
+        from supervisor import events
+        L = []
+        events.subscribe(events.ProcessStateEvent, lambda x: L.append(x))
+        instance.state = ProcessStates.STARTING
+        instance.report_ready()
+        self.assertEqual(instance.state, ProcessStates.RUNNING)
+        self.assertEqual(instance.backoff, 0)
+        self.assertEqual(L[0].__class__, events.ProcessStateRunningEvent)
+        self.assertEqual(options.logger.data[0],
+                         'success: test entered RUNNING state, process '
+                         'reported that it was ready')
+        # a second READY=1 changes nothing
+        instance.report_ready()
+        self.assertEqual(len(L), 1)
+
+    def test_ctor_healthcheck(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test',
+                              healthcheck=('tcp', '127.0.0.1', 80))
+        instance = self._makeOne(config)
+        self.assertEqual(instance.healthcheck.process, instance)
+        config = DummyPConfig(options, 'test', '/test')
+        instance = self._makeOne(config)
+        self.assertEqual(instance.healthcheck, None)
+
+    def test_transition_runs_healthcheck(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test',
+                              healthcheck=('tcp', '127.0.0.1', 80))
+        instance = self._makeOne(config)
+        from supervisor.states import ProcessStates
+        instance.state = ProcessStates.RUNNING
+        transitions = []
+        instance.healthcheck.transition = transitions.append
+        instance.transition()
+        self.assertEqual(len(transitions), 1)
+
+    def test_next_wakeup_log_events_held_back(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test')
+        instance = self._makeOne(config)
+        self.assertEqual(instance.next_wakeup(), None)
+        stdout = DummyDispatcher(readable=True)
+        stdout.events_buffer = 'partial'
+        stdout.events_deadline = 110
+        stderr = DummyDispatcher(readable=True)
+        stderr.events_buffer = ''
+        stderr.events_deadline = None
+        instance.dispatchers = {0:DummyDispatcher(writable=True), 1:stdout,
+                                2:stderr}
+        self.assertEqual(instance.next_wakeup(), 110)
+        stderr.events_buffer = 'partial'
+        stderr.events_deadline = 105
+        self.assertEqual(instance.next_wakeup(), 105)
+
+    def test_report_ready_not_starting(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test', notify_ready=True)
+        instance = self._makeOne(config)
+        from supervisor.states import ProcessStates
+        instance.state = ProcessStates.STOPPING
+        instance.report_ready()
+        self.assertEqual(instance.state, ProcessStates.STOPPING)
+        self.assertEqual(options.logger.data, [])
+
+    def test_signal_nopid(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test')
+        instance = self._makeOne(config)
+        msg = instance.signal(signal.SIGHUP)
+        self.assertEqual(msg,
+              'attempted to send test sig SIGHUP but it wasn\'t running')
+        self.assertEqual(options.kills, {})
+
+    def test_signal_from_running(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test', stopasgroup=True)
+        instance = self._makeOne(config)
+        instance.pid = 11
+        L = []
+        from supervisor.states import ProcessStates
+        from supervisor import events
+        events.subscribe(events.Event,lambda x: L.append(x))
+        instance.state = ProcessStates.RUNNING
+        self.assertEqual(instance.signal(signal.SIGHUP), None)
+        self.assertEqual(options.logger.data[0],
+                         'sending test (pid 11) sig SIGHUP')
+        self.assertEqual(options.kills[11], signal.SIGHUP)
+        self.assertEqual(instance.state, ProcessStates.RUNNING)
+        self.assertEqual(instance.killing, 0)
+        self.assertEqual(L, []) # no event because we didn't change state
+
+    def test_signal_error(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'test', '/test')
+        options.kill_error = 1
+        instance = self._makeOne(config)
+        from supervisor.states import ProcessStates
+        instance.pid = 11
+        instance.state = ProcessStates.RUNNING
+        msg = instance.signal(signal.SIGHUP)
+        self.failUnless(msg.startswith('unknown problem sending sig test'))
+        self.assertEqual(options.logger.data[1], msg)
+        self.assertEqual(instance.state, ProcessStates.RUNNING)
+
     def test_kill_from_starting(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'test', '/test')
@@ -886,6 +1021,35 @@ class SubprocessTests(unittest.TestCase):
         self.assertEqual(event.__class__, events.ProcessStateBackoffEvent)
         self.assertEqual(event.from_state, ProcessStates.STARTING)
 
+    def test_finish_after_report_ready_tooquickly(self):
+        options = DummyOptions()
+        config = DummyPConfig(options, 'notthere', '/notthere',
+                              stdout_logfile='/tmp/foo', startsecs=10,
+                              notify_ready=True)
+        instance = self._makeOne(config)
+        instance.config.options.pidhistory[123] = instance
+        import time
+        instance.laststart = time.time()
+        from supervisor.states import ProcessStates
+        from supervisor import events
+        instance.state = ProcessStates.STARTING
+        instance.pid = 123
+        instance.report_ready()
+        L = []
+        events.subscribe(events.ProcessStateEvent, lambda x: L.append(x))
+        instance.finish(123, 1<<8)
+        self.assertEqual(instance.state, ProcessStates.EXITED)
+        self.assertEqual(options.logger.data[1],
+                         'exited: notthere (exit status 1; not expected)')
+        self.assertEqual(len(L), 1)
+        self.assertEqual(L[0].__class__, events.ProcessStateExitedEvent)
+        self.assertEqual(L[0].from_state, ProcessStates.RUNNING)
+        # an unexpected exit of a RUNNING process is restarted
+        from supervisor.datatypes import RestartUnconditionally
+        instance.config.autorestart = RestartUnconditionally
+        instance.transition()
+        self.assertEqual(instance.state, ProcessStates.STARTING)
+
     def test_finish_with_current_event_sends_rejected(self):
         from supervisor import events
         L = []
@@ -909,6 +1073,40 @@ class SubprocessTests(unittest.TestCase):
         self.assertEqual(event2.event, event)
         self.assertEqual(instance.event, None)
 
+    def test_finish_with_current_batch_sends_rejected(self):
+        from supervisor import events
+        L = []
+        events.subscribe(events.EventRejectedEvent, lambda x: L.append(x))
+        options = DummyOptions()
+        config = DummyPConfig(options, 'notthere', '/notthere',
+                              stdout_logfile='/tmp/foo', startsecs=10)
+        instance = self._makeOne(config)
+        from supervisor.states import ProcessStates
+        instance.state = ProcessStates.RUNNING
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        instance.batch = [event1, event2]
+        instance.finish(123, 1)
+        self.assertEqual([ x.event for x in L ], [event2, event1])
+        self.assertEqual(instance.batch, None)
+
+    def test_finish_with_window_sends_rejected(self):
+        from supervisor import events
+        L = []
+        events.subscribe(events.EventRejectedEvent, lambda x: L.append(x))
+        options = DummyOptions()
+        config = DummyPConfig(options, 'notthere', '/notthere',
+                              stdout_logfile='/tmp/foo', startsecs=10)
+        instance = self._makeOne(config)
+        from supervisor.states import ProcessStates
+        instance.state = ProcessStates.RUNNING
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        instance.window = [event1, event2]
+        instance.finish(123, 1)
+        self.assertEqual([ x.event for x in L ], [event2, event1])
+        self.assertEqual(instance.window, [])
+
     def test_set_uid_no_uid(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'test', '/test')
@@ -1387,6 +1585,20 @@ class ProcessGroupBaseTests(unittest.TestCase):
         unstopped = group.get_unstopped_processes()
         self.assertEqual(unstopped, [process1])
 
+    def test_next_wakeup(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2','/bin/process2')
+        process1 = DummyProcess(pconfig1)
+        process2 = DummyProcess(pconfig2)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1, pconfig2])
+        group = self._makeOne(gconfig)
+        group.processes = {'process1': process1, 'process2': process2}
+        self.assertEqual(group.next_wakeup(), None)
+        process1.wakeup = 110
+        process2.wakeup = 105
+        self.assertEqual(group.next_wakeup(), 105)
+
     def test_stop_all(self):
         from supervisor.states import ProcessStates
         options = DummyOptions()
@@ -1432,6 +1644,22 @@ class ProcessGroupBaseTests(unittest.TestCase):
         result= group.get_dispatchers()
         self.assertEqual(result, {4:None, 5:None})
 
+    def test_get_dispatchers_includes_healthcheck_probes(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        process1 = DummyProcess(pconfig1)
+        process1.dispatchers = {4:None}
+        class DummyHealthCheck:
+            def get_dispatchers(self):
+                return {6:'probe'}
+        process1.healthcheck = DummyHealthCheck()
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        group = self._makeOne(gconfig)
+        group.processes = { 'process1': process1 }
+        result = group.get_dispatchers()
+        self.assertEqual(result[4], None)
+        self.assertEqual(result[6], 'probe')
+
     def test_reopenlogs(self):
         options = DummyOptions()
         from supervisor.states import ProcessStates
@@ -1516,11 +1744,13 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         gconfig.pool_events = (EventType,)
         pool = self._makeOne(gconfig)
         from supervisor import events
-        self.assertEqual(len(events.callbacks), 2)
+        self.assertEqual(len(events.callbacks), 3)
         self.assertEqual(events.callbacks[0],
             (EventType, pool._acceptEvent))
         self.assertEqual(events.callbacks[1],
             (events.EventRejectedEvent, pool.handle_rejected))
+        self.assertEqual(events.callbacks[2],
+            (events.Tick60Event, pool._reportMetrics))
         self.assertEqual(pool.serial, -1)
 
     def test__eventEnvelope(self):
@@ -1543,6 +1773,820 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         self.assertEqual(headers[6], 'len:8')
         self.assertEqual(payload, 'payload\n')
 
+    def test__eventEnvelope_escapes_percent_in_names(self):
+        options = DummyOptions()
+        options.identifier = 'sup%s'
+        gconfig = DummyPGroupConfig(options)
+        gconfig.name = 'pool%d'
+        pool = self._makeOne(gconfig)
+        from supervisor import events
+        result = pool._eventEnvelope(
+            events.EventTypes.PROCESS_COMMUNICATION_STDOUT, 80, 20, 'x')
+        self.assertEqual(result,
+                         'ver:3.0 server:sup%s serial:80 pool:pool%d '
+                         'poolserial:20 eventname:PROCESS_COMMUNICATION_STDOUT '
+                         'len:1\nx')
+
+    def test__dispatchEvent_renders_payload_once(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        process1 = DummyProcess(pconfig1, state=ProcessStates.RUNNING)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1}
+        class CountingEvent(DummyEvent):
+            rendered = 0
+            def __str__(self):
+                self.rendered += 1
+                return 'counted'
+        event = CountingEvent()
+        pool._acceptEvent(event)
+        for i in range(2):
+            process1.listener_state = EventListenerStates.READY
+            pool.listener_ready(process1)
+            self.assertTrue(pool._dispatchEvent(event))
+        self.assertEqual(event.rendered, 1)
+        self.assertEqual(event.rendered_payload, 'counted')
+        self.assertTrue(process1.stdin_buffer.endswith('len:7\ncounted'))
+
+    def _makeBatchPool(self, options, batch_size, max_batch_latency=0):
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        process1 = DummyProcess(pconfig1, state=ProcessStates.RUNNING)
+        process1.listener_state = EventListenerStates.READY
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        gconfig.batch_size = batch_size
+        gconfig.max_batch_latency = max_batch_latency
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1}
+        pool.listener_ready(process1)
+        return pool, process1
+
+    def test_dispatch_batch(self):
+        options = DummyOptions()
+        options.identifier = 'sup'
+        pool, process1 = self._makeBatchPool(options, 2)
+        from supervisor.states import EventListenerStates
+        event1 = DummyEvent()
+        event2 = DummyEvent()
+        event3 = DummyEvent()
+        for event in (event1, event2, event3):
+            pool._acceptEvent(event)
+        pool.dispatch()
+        self.assertEqual(list(pool.event_buffer), [event3])
+        self.assertEqual(process1.listener_state, EventListenerStates.BUSY)
+        self.assertEqual(process1.batch, [event1, event2])
+        self.assertEqual(process1.event, None)
+        header, body = process1.stdin_buffer.split('\n', 1)
+        self.assertEqual(header,
+                         'ver:3.1 server:sup pool:whatever batch:2 len:%s'
+                         % len(body))
+        self.assertEqual(body.count('eventname:'), 2)
+        self.assertTrue(body.endswith('len:11\ndummy event'))
+
+    def test_next_wakeup_partial_batch(self):
+        options = DummyOptions()
+        pool, process1 = self._makeBatchPool(options, 3, 60000)
+        self.assertEqual(pool.next_wakeup(), None)
+        pool._acceptEvent(DummyEvent())
+        self.assertEqual(pool.next_wakeup(), pool.batch_deadline)
+        pool.retry_events = [(pool.batch_deadline - 1, DummyEvent())]
+        self.assertEqual(pool.next_wakeup(), pool.batch_deadline - 1)
+        pool.retry_events = []
+        # a full batch is sent without waiting
+        pool._acceptEvent(DummyEvent())
+        pool._acceptEvent(DummyEvent())
+        self.assertEqual(pool.next_wakeup(), None)
+
+    def test_next_wakeup_batch_deadline_passed(self):
+        options = DummyOptions()
+        pool, process1 = self._makeBatchPool(options, 3, 60000)
+        pool._acceptEvent(DummyEvent())
+        pool.batch_deadline = 1
+        self.assertEqual(pool.next_wakeup(), None)
+
+    def test_dispatch_batch_waits_for_latency(self):
+        options = DummyOptions()
+        pool, process1 = self._makeBatchPool(options, 3, 60000)
+        event = DummyEvent()
+        pool._acceptEvent(event)
+        pool.dispatch()
+        self.assertEqual(list(pool.event_buffer), [event])
+        self.assertEqual(process1.stdin_buffer, '')
+        pool.batch_deadline = 0
+        pool.dispatch()
+        self.assertEqual(list(pool.event_buffer), [])
+        self.assertEqual(process1.batch, [event])
+
+    def test_dispatch_batch_pipe_error_rebuffers_in_order(self):
+        options = DummyOptions()
+        pool, process1 = self._makeBatchPool(options, 2)
+        import errno
+        process1.write_error = errno.EPIPE
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        pool._acceptEvent(event1)
+        pool._acceptEvent(event2)
+        pool.dispatch()
+        self.assertEqual(list(pool.event_buffer), [event1, event2])
+        self.assertEqual(process1.batch, None)
+
+    def test_dispatch_windowed(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        gconfig.window_size = 2
+        pool = self._makeOne(gconfig)
+        process1 = pool.processes['process1']
+        self.assertEqual(process1.window, [])
+        process1.state = ProcessStates.RUNNING
+        process1.listener_state = EventListenerStates.READY
+        pool.listener_ready(process1)
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        event3 = DummyEvent(3)
+        pool._acceptEvent(event1)
+        pool.dispatch()
+        self.assertEqual(process1.listener_state, EventListenerStates.READY)
+        self.assertEqual(process1.event, None)
+        pool._acceptEvent(event2)
+        pool._acceptEvent(event3)
+        pool.dispatch()
+        self.assertEqual(process1.window, [event1, event2])
+        self.assertEqual(process1.listener_state, EventListenerStates.BUSY)
+        self.assertEqual(list(pool.event_buffer), [event3])
+        self.assertEqual(process1.stdin_buffer.count('eventname:'), 2)
+
+    def test_dispatch_least_recently_ready_listener_first(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2','/bin/process2')
+        process1 = DummyProcess(pconfig1, state=ProcessStates.RUNNING)
+        process2 = DummyProcess(pconfig2, state=ProcessStates.RUNNING)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1, pconfig2])
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1, 'process2': process2}
+        for process in (process2, process1, process2):
+            process.listener_state = EventListenerStates.READY
+            pool.listener_ready(process)
+        self.assertEqual(list(pool.ready_listeners), [process2, process1])
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        pool._acceptEvent(event1)
+        pool._acceptEvent(event2)
+        pool.dispatch()
+        self.assertEqual(process2.event, event1)
+        self.assertEqual(process1.event, event2)
+        self.assertEqual(list(pool.ready_listeners), [])
+        self.assertEqual(pool.ready_ids, {})
+
+    def test__nextListener_skips_stale_listeners(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2','/bin/process2')
+        process1 = DummyProcess(pconfig1, state=ProcessStates.RUNNING)
+        process2 = DummyProcess(pconfig2, state=ProcessStates.RUNNING)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1, pconfig2])
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1, 'process2': process2}
+        process1.listener_state = EventListenerStates.READY
+        process2.listener_state = EventListenerStates.READY
+        pool.listener_ready(process1)
+        pool.listener_ready(process2)
+        process1.state = ProcessStates.EXITED
+        self.assertEqual(pool._nextListener(), process2)
+        self.assertEqual(pool._nextListener(), None)
+
+    def test_dispatch_windowed_round_robin(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        pconfig2 = DummyPConfig(options, 'process2', 'process2','/bin/process2')
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1, pconfig2])
+        gconfig.window_size = 3
+        pool = self._makeOne(gconfig)
+        process1 = pool.processes['process1']
+        process2 = pool.processes['process2']
+        for process in (process1, process2):
+            process.state = ProcessStates.RUNNING
+            process.listener_state = EventListenerStates.READY
+            pool.listener_ready(process)
+        events = [ DummyEvent(i) for i in range(4) ]
+        for event in events:
+            pool._acceptEvent(event)
+        pool.dispatch()
+        self.assertEqual(process1.window, [events[0], events[2]])
+        self.assertEqual(process2.window, [events[1], events[3]])
+
+    def _makeSpoolingPool(self, options, buffer_size=2, spool_maxbytes=1<<20):
+        import tempfile
+        from supervisor.states import ProcessStates
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        process1 = DummyProcess(pconfig1, state=ProcessStates.RUNNING)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        gconfig.buffer_size = buffer_size
+        gconfig.spool_file = tempfile.mktemp()
+        gconfig.spool_maxbytes = spool_maxbytes
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1}
+        return pool, process1
+
+    def test__acceptEvent_overflow_spools(self):
+        options = DummyOptions()
+        pool, process1 = self._makeSpoolingPool(options)
+        try:
+            events = [ DummyEvent(i) for i in range(4) ]
+            for event in events:
+                pool._acceptEvent(event)
+            self.assertEqual(list(pool.event_buffer), events[:2])
+            self.assertEqual(pool.spool.pending, 2)
+            self.assertEqual(pool.buffer_overflows, 0)
+            # a rebuffered event goes to the head and nothing is lost
+            rejected = DummyEvent('r')
+            pool._acceptEvent(rejected, head=True)
+            self.assertEqual(list(pool.event_buffer),
+                             [rejected, events[0], events[1]])
+            self.assertEqual(pool.spool.pending, 2)
+        finally:
+            pool.before_remove()
+
+    def test_dispatch_drains_spool_in_order(self):
+        options = DummyOptions()
+        pool, process1 = self._makeSpoolingPool(options, buffer_size=1)
+        from supervisor.states import EventListenerStates
+        from supervisor.events import ProcessCommunicationStdoutEvent
+        try:
+            events = []
+            for i in range(3):
+                # only a registered event type can be read back
+                event = ProcessCommunicationStdoutEvent(process1, 1, 'data')
+                event.serial = i
+                event.rendered_payload = 'payload %s' % i
+                events.append(event)
+                pool._acceptEvent(event)
+            self.assertEqual(pool.spool.pending, 2)
+            serials = []
+            for i in range(3):
+                process1.listener_state = EventListenerStates.READY
+                pool.listener_ready(process1)
+                pool.dispatch()
+                serials.append(process1.event.serial)
+            self.assertEqual(serials, [0, 1, 2])
+            self.assertEqual(pool.spool.pending, 0)
+            self.assertEqual(list(pool.event_buffer), [])
+            self.assertTrue(process1.stdin_buffer.endswith('payload 2'))
+        finally:
+            pool.before_remove()
+
+    def test__acceptEvent_spool_full(self):
+        options = DummyOptions()
+        pool, process1 = self._makeSpoolingPool(options, buffer_size=1,
+                                                spool_maxbytes=1)
+        try:
+            pool._acceptEvent(DummyEvent(1))
+            pool._acceptEvent(DummyEvent(2))
+            self.assertEqual(pool.spool.pending, 0)
+            self.assertEqual(pool.buffer_overflows, 1)
+            self.assertEqual(options.logger.data[0],
+                'pool whatever event spool is full, discarding event 2')
+        finally:
+            pool.before_remove()
+
+    def test_ctor_spool_cannot_be_opened(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options)
+        gconfig.spool_file = '/nonexistent/dir/spool'
+        pool = self._makeOne(gconfig)
+        self.assertEqual(pool.spool, None)
+        self.assertTrue(options.logger.data[0].startswith(
+            'pool whatever cannot open event spool /nonexistent/dir/spool'))
+
+    def _makeRejectingPool(self, options, **config):
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        process1 = DummyProcess(pconfig1)
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        for name, value in config.items():
+            setattr(gconfig, name, value)
+        pool = self._makeOne(gconfig)
+        pool.processes = {'process1': process1}
+        return pool, process1
+
+    def test_metrics_follow_an_event(self):
+        from supervisor import events
+        from supervisor.states import EventListenerStates
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        process1.listener_state = EventListenerStates.READY
+        event = events.Tick5Event(1, None)
+        pool._acceptEvent(event)
+        self.assertEqual(pool.metrics.accepted, {'TICK_5':1})
+        event.pool_times['whatever'] -= 0.25
+        pool.transition()
+        self.assertEqual(process1.event, event)
+        metrics = pool.get_metrics()
+        self.assertEqual(metrics['enqueue_latency']['count'], 1)
+        self.assertTrue(metrics['enqueue_latency']['mean_ms'] >= 250)
+        self.assertEqual(metrics['enqueue_latency']['buckets'][5], 1)
+        self.assertTrue(pool.metrics.busy_since.has_key('process1'))
+        event.pool_times['whatever'] -= 0.02
+        pool.listener_answered(process1, [event])
+        self.assertEqual(pool.metrics.busy_since, {})
+        metrics = pool.get_metrics()
+        self.assertEqual(metrics['result_latency']['count'], 1)
+        self.assertTrue(metrics['result_latency']['mean_ms'] >= 20)
+        self.assertTrue(metrics['busy']['process1'] > 0)
+        self.assertEqual(metrics['rejected'], 0)
+        self.assertEqual(metrics['rebuffered'], 0)
+        self.assertEqual(metrics['accepted'], {'TICK_5':1})
+
+    def test_listener_answered_with_events_in_flight_stays_busy(self):
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        process1.window = [DummyEvent()]
+        pool.metrics.busy('process1', 0)
+        pool.listener_answered(process1, [])
+        self.assertTrue(pool.metrics.busy_since.has_key('process1'))
+
+    def test_handle_rejected_records_metrics(self):
+        from supervisor.events import EventRejectedEvent
+        from supervisor.states import ProcessStates
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        process1.state = ProcessStates.EXITED
+        pool.metrics.busy('process1', 0)
+        event = DummyEvent()
+        pool._acceptEvent(event)
+        pool.event_buffer.popleft()
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        # a listener dying is not a rejection
+        self.assertEqual(pool.metrics.rejected, 0)
+        self.assertEqual(pool.metrics.rebuffered, 1)
+        self.assertEqual(pool.metrics.busy_since, {})
+        # a rebuffered event is not counted as accepted twice
+        self.assertEqual(sum(pool.metrics.accepted.values()), 1)
+
+    def test_reportMetrics(self):
+        from supervisor import events
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        pool._acceptEvent(DummyEvent())
+        pool.buffer_overflows = 2
+        L = []
+        events.subscribe(events.EventPoolStatsEvent, L.append)
+        events.notify(events.Tick60Event(1, None))
+        self.assertEqual(len(L), 1)
+        self.assertEqual(L[0].pool_name, 'whatever')
+        self.assertEqual(L[0].stats['depth'], 1)
+        self.assertEqual(L[0].stats['overflows'], 2)
+        self.assertEqual(L[0].stats['busy'], {'process1':0.0})
+        pool.before_remove()
+        events.notify(events.Tick60Event(1, None))
+        self.assertEqual(len(L), 1)
+
+    def test_handle_rejected_counts_rejections(self):
+        from supervisor.events import EventRejectedEvent
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        event = DummyEvent()
+        pool._acceptEvent(event)
+        pool.event_buffer.popleft()
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        pool.event_buffer.popleft()
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        self.assertEqual(event.pool_rejections, {'whatever':2})
+        self.assertEqual(list(pool.event_buffer), [event])
+
+    def test_handle_rejected_retry_delay_backs_off(self):
+        from supervisor.events import EventRejectedEvent
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, retry_delay=1000)
+        event = DummyEvent()
+        other = DummyEvent('other')
+        pool._acceptEvent(event)
+        pool.event_buffer.popleft()
+        pool._acceptEvent(other)
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        (due1, e1), (due2, e2) = pool.retry_events
+        self.assertEqual(e1, event)
+        # the second retry waits twice as long as the first
+        self.assertTrue(0.5 < due2 - due1 < 1.5)
+        # held back events don't block the ones behind them
+        self.assertEqual(list(pool.event_buffer), [other])
+        pool._requeueRetries(now=due1)
+        self.assertEqual(list(pool.event_buffer), [event, other])
+        self.assertEqual(pool.retry_events, [(due2, event)])
+
+    def test_handle_rejected_retry_delay_is_capped(self):
+        from supervisor.events import EventRejectedEvent
+        from supervisor.process import MAX_RETRY_DELAY
+        import time
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, retry_delay=1000)
+        event = DummyEvent()
+        event.pool_rejections = {'whatever':100}
+        before = time.time()
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        due, event = pool.retry_events[0]
+        self.assertTrue(due <= time.time() + MAX_RETRY_DELAY)
+        self.assertTrue(due >= before + MAX_RETRY_DELAY)
+
+    def test_handle_rejected_listener_died(self):
+        from supervisor.events import EventRejectedEvent
+        from supervisor.states import ProcessStates
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, retry_delay=1000,
+                                                 max_retries=1)
+        process1.state = ProcessStates.EXITED
+        event = DummyEvent()
+        other = DummyEvent('other')
+        pool._acceptEvent(other)
+        for i in range(3):
+            pool.handle_rejected(EventRejectedEvent(process1, event))
+            self.assertEqual(pool.event_buffer.popleft(), event)
+        # sent again at once, and not counted against max_retries
+        self.assertEqual(pool.retry_events, [])
+        self.assertEqual(list(pool.dead_letters), [])
+        self.assertEqual(getattr(event, 'pool_rejections', {}), {})
+
+    def test_next_wakeup(self):
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        self.assertEqual(pool.next_wakeup(), None)
+        pool.retry_events = [(120, DummyEvent()), (110, DummyEvent())]
+        self.assertEqual(pool.next_wakeup(), 110)
+
+    def test_transition_requeues_due_retries(self):
+        from supervisor.states import ProcessStates
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, retry_delay=1000)
+        process1.state = ProcessStates.STARTING
+        event = DummyEvent()
+        later = DummyEvent('later')
+        pool.retry_events = [(0, event), (time.time() + 100, later)]
+        pool.transition()
+        # no listener is ready, yet the due retry is buffered again
+        self.assertEqual(list(pool.event_buffer), [event])
+        self.assertEqual(pool.next_wakeup(), pool.retry_events[0][0])
+
+    def test_handle_rejected_max_retries_dead_letters(self):
+        from supervisor.events import EventRejectedEvent
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, max_retries=1,
+                                                 dead_letter_size=1)
+        event1 = DummyEvent(1)
+        event2 = DummyEvent(2)
+        for event in (event1, event1, event2, event2):
+            pool.handle_rejected(EventRejectedEvent(process1, event))
+        self.assertEqual(list(pool.dead_letters), [event2])
+        self.assertEqual(list(pool.event_buffer), [event2, event1])
+        self.assertEqual(options.logger.data, [
+            'pool whatever moved event 1 to the dead letter queue after 2 '
+            'rejections',
+            'pool whatever dead letter queue is full, discarding event 1',
+            'pool whatever moved event 2 to the dead letter queue after 2 '
+            'rejections'])
+
+    def test_handle_rejected_max_retries_no_dead_letters(self):
+        from supervisor.events import EventRejectedEvent
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options, max_retries=1,
+                                                 dead_letter_size=0)
+        event = DummyEvent(1)
+        event.pool_rejections = {'whatever':1}
+        pool.handle_rejected(EventRejectedEvent(process1, event))
+        self.assertEqual(list(pool.dead_letters), [])
+        self.assertEqual(options.logger.data,
+                         ['pool whatever discarding event 1, rejected 2 times'])
+
+    def test_replay_dead_letters(self):
+        options = DummyOptions()
+        pool, process1 = self._makeRejectingPool(options)
+        event1 = DummyEvent(1)
+        event1.pool_serials = {'whatever':0}
+        event1.pool_rejections = {'whatever':3}
+        event2 = DummyEvent(2)
+        event2.pool_serials = {'whatever':1}
+        event2.pool_rejections = {'whatever':3}
+        pool.dead_letters.extend([event1, event2])
+        self.assertEqual(pool.replay_dead_letters(), 2)
+        self.assertEqual(list(pool.dead_letters), [])
+        self.assertEqual(list(pool.event_buffer), [event1, event2])
+        self.assertEqual(event1.pool_rejections, {'whatever':0})
+
+    def _makeFilteringPool(self, options, **config):
+        gconfig = DummyPGroupConfig(options)
+        for name, value in config.items():
+            setattr(gconfig, name, value)
+        return self._makeOne(gconfig)
+
+    def _makeProcessEvent(self, options, name, groupname=None,
+                          expected=True):
+        from supervisor.events import ProcessStateExitedEvent
+        from supervisor.states import ProcessStates
+        process = DummyProcess(DummyPConfig(options, name, '/bin/' + name))
+        if groupname is not None:
+            process.group = DummyProcessGroup(
+                DummyPGroupConfig(options, name=groupname))
+        return ProcessStateExitedEvent(process, ProcessStates.RUNNING,
+                                       expected)
+
+    def test__acceptEvent_filter_processes(self):
+        options = DummyOptions()
+        pool = self._makeFilteringPool(options,
+                                       filter_processes=['web*', 'db'])
+        wanted1 = self._makeProcessEvent(options, 'web1')
+        wanted2 = self._makeProcessEvent(options, 'db')
+        for event in (wanted1, self._makeProcessEvent(options, 'dbx'),
+                      wanted2, self._makeProcessEvent(options, 'cron')):
+            pool._acceptEvent(event)
+        self.assertEqual(list(pool.event_buffer), [wanted1, wanted2])
+        self.assertEqual(pool.serial, 1)
+
+    def test__acceptEvent_filter_groups(self):
+        options = DummyOptions()
+        pool = self._makeFilteringPool(options, filter_groups=['web'])
+        wanted = self._makeProcessEvent(options, 'web1', 'web')
+        for event in (wanted, self._makeProcessEvent(options, 'db1', 'db'),
+                      self._makeProcessEvent(options, 'orphan')):
+            pool._acceptEvent(event)
+        self.assertEqual(list(pool.event_buffer), [wanted])
+
+    def test__acceptEvent_filter_expected(self):
+        options = DummyOptions()
+        pool = self._makeFilteringPool(options, filter_expected=False)
+        unexpected = self._makeProcessEvent(options, 'a', expected=False)
+        pool._acceptEvent(self._makeProcessEvent(options, 'a'))
+        pool._acceptEvent(unexpected)
+        self.assertEqual(list(pool.event_buffer), [unexpected])
+
+    def test__acceptEvent_filter_passes_events_without_process(self):
+        options = DummyOptions()
+        pool = self._makeFilteringPool(options, filter_processes=['web*'],
+                                       filter_groups=['web'],
+                                       filter_expected=True)
+        event = DummyEvent()
+        pool._acceptEvent(event)
+        self.assertEqual(list(pool.event_buffer), [event])
+
+    def test__acceptEvent_filter_skips_rebuffered_events(self):
+        options = DummyOptions()
+        pool = self._makeFilteringPool(options, filter_processes=['web*'])
+        event = self._makeProcessEvent(options, 'cron')
+        pool._acceptEvent(event, head=True)
+        self.assertEqual(list(pool.event_buffer), [event])
+
+    def _makeScalingPool(self, options, states, numprocs_min=1,
+                         numprocs_idle_secs=60):
+        from supervisor.states import EventListenerStates
+        pconfigs = []
+        processes = {}
+        for i in range(len(states)):
+            name = 'process%s' % i
+            pconfig = DummyPConfig(options, name, name, '/bin/' + name)
+            process = DummyProcess(pconfig, state=states[i])
+            process.listener_state = EventListenerStates.READY
+            pconfigs.append(pconfig)
+            processes[name] = process
+        gconfig = DummyPGroupConfig(options, pconfigs=pconfigs)
+        gconfig.numprocs_min = numprocs_min
+        gconfig.numprocs_max = len(states)
+        gconfig.numprocs_idle_secs = numprocs_idle_secs
+        pool = self._makeOne(gconfig)
+        pool.processes = processes
+        return pool
+
+    def test_ctor_standby(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.STOPPED] * 3)
+        self.assertEqual(pool.standby, {'process1':True, 'process2':True})
+        self.assertEqual(pool.idle_since, None)
+
+    def test_transition_does_not_start_standby(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED])
+        pool.transition()
+        self.assertEqual(pool.processes['process0'].transitioned, True)
+        self.assertEqual(pool.processes['process1'].transitioned, False)
+
+    def test_transition_standby_started_by_hand(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STARTING])
+        pool.transition()
+        self.assertEqual(pool.standby, {})
+        self.assertEqual(pool.processes['process1'].transitioned, True)
+
+    def test__autoscale_scales_up_when_congested(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED,
+                                               ProcessStates.EXITED])
+        pool.processes['process0'].listener_state = EventListenerStates.BUSY
+        pool.event_buffer.append(DummyEvent())
+        pool.transition()
+        self.assertEqual(pool.processes['process1'].spawned, True)
+        self.assertEqual(pool.processes['process2'].spawned, False)
+        self.assertEqual(pool.standby, {'process2':True})
+        self.assertEqual(options.logger.data[0],
+                         'pool whatever is congested, starting process1')
+
+    def test__scaleUp_waits_for_starting_process(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.STARTING,
+                                               ProcessStates.STOPPED])
+        pool._scaleUp()
+        self.assertEqual(pool.processes['process1'].spawned, False)
+        self.assertEqual(pool.standby, {'process1':True})
+
+    def test__scaleUp_skips_listener_still_stopping(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 2)
+        pool.standby = {}
+        for process in pool.processes.values():
+            process.listener_state = EventListenerStates.READY
+        pool._scaleDown()
+        process1 = pool.processes['process1']
+        self.assertEqual(pool.standby, {'process1':True})
+        process1.state = ProcessStates.STOPPING
+        pool._scaleUp()
+        self.assertEqual(process1.spawned, False)
+        self.assertEqual(pool.standby, {'process1':True})
+        # once it has stopped it may be started again
+        process1.state = ProcessStates.STOPPED
+        pool._scaleUp()
+        self.assertEqual(process1.spawned, True)
+        self.assertEqual(pool.standby, {})
+
+    def test__scaleUp_spawn_fails(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED])
+        process1 = pool.processes['process1']
+        process1.spawn_pid = None
+        pool._scaleUp()
+        self.assertEqual(process1.spawned, True)
+        self.assertEqual(process1.state, ProcessStates.BACKOFF)
+        # still the pool's to start, not autostarted by transition()
+        self.assertEqual(pool.standby, {'process1':True})
+        pool.transition()
+        self.assertEqual(process1.transitioned, False)
+        self.assertEqual(pool.standby, {'process1':True})
+
+    def test__scaleUp_nothing_in_standby(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING])
+        pool._scaleUp()
+        self.assertEqual(pool.processes['process0'].spawned, False)
+        self.assertEqual(options.logger.data, [])
+
+    def test__autoscale_idle_scales_down_after_idle_secs(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 3,
+                                     numprocs_idle_secs=10)
+        pool.standby = {}
+        pool._autoscale(True, now=100)
+        self.assertEqual(pool.idle_since, 100)
+        pool._autoscale(True, now=105)
+        self.assertEqual(pool.standby, {})
+        pool._autoscale(True, now=110)
+        self.assertEqual(pool.idle_since, 110)
+        self.assertEqual(pool.processes['process2'].stop_called, True)
+        self.assertEqual(pool.processes['process1'].stop_called, False)
+        self.assertEqual(pool.standby, {'process2':True})
+        self.assertEqual(options.logger.data[0],
+                         'pool whatever is idle, stopping process2')
+
+    def test__autoscale_scales_up_when_listeners_mostly_busy(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED],
+                                     numprocs_idle_secs=10)
+        pool.event_buffer.append(DummyEvent())
+        pool._autoscale(True, now=100)
+        self.assertEqual(pool.processes['process1'].spawned, False)
+        # busy 9 of the last 10 seconds, though ready just now
+        pool.metrics.busy('process0', 100)
+        pool.metrics.idle('process0', 109)
+        pool._autoscale(True, now=110)
+        self.assertEqual(pool.busy_fraction, 0.9)
+        self.assertEqual(pool.processes['process1'].spawned, True)
+        self.assertEqual(pool.standby, {})
+
+    def test__autoscale_does_not_scale_up_when_listeners_mostly_idle(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED],
+                                     numprocs_idle_secs=10)
+        pool.event_buffer.append(DummyEvent())
+        pool._autoscale(True, now=100)
+        pool.metrics.busy('process0', 100)
+        pool.metrics.idle('process0', 102)
+        pool._autoscale(True, now=110)
+        self.assertEqual(pool.busy_fraction, 0.2)
+        self.assertEqual(pool.processes['process1'].spawned, False)
+
+    def test__autoscale_does_not_scale_down_when_others_would_be_busy(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 2,
+                                     numprocs_idle_secs=10)
+        pool.standby = {}
+        pool._autoscale(True, now=100)
+        # busy half of the time each: one listener alone would be always
+        # busy
+        pool.metrics.busy('process0', 100)
+        pool.metrics.idle('process0', 105)
+        pool.metrics.busy('process1', 100)
+        pool.metrics.idle('process1', 105)
+        pool._autoscale(True, now=110)
+        self.assertEqual(pool.busy_fraction, 0.5)
+        self.assertEqual(pool.idle_since, 110)
+        self.assertEqual(pool.processes['process0'].stop_called, False)
+        self.assertEqual(pool.processes['process1'].stop_called, False)
+        self.assertEqual(pool.standby, {})
+
+    def test__measureBusy_counts_active_listeners_only(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED],
+                                     numprocs_idle_secs=10)
+        pool.standby = {'process1':True, 'process2':True}
+        self.assertEqual(pool._activeListeners(), ['process0'])
+        pool.metrics.busy('process0', 100)
+        pool.metrics.busy('process1', 100)
+        pool._measureBusy(['process0'], 100)
+        self.assertEqual(pool.busy_sample, (100, 0))
+        pool._measureBusy(['process0'], 105) # window not over yet
+        self.assertEqual(pool.busy_fraction, None)
+        pool._measureBusy(['process0'], 110)
+        self.assertEqual(pool.busy_fraction, 1.0)
+        self.assertEqual(pool.busy_sample, (110, 10))
+
+    def test_in_standby(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING,
+                                               ProcessStates.STOPPED])
+        self.assertEqual(pool.in_standby(pool.processes['process0']), False)
+        self.assertEqual(pool.in_standby(pool.processes['process1']), True)
+
+    def test__autoscale_busy_resets_idle_clock(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 2)
+        pool.idle_since = 100
+        pool.event_buffer.append(DummyEvent())
+        pool._autoscale(True, now=200)
+        self.assertEqual(pool.idle_since, None)
+
+    def test__scaleDown_keeps_numprocs_min(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 2,
+                                     numprocs_min=2)
+        pool._scaleDown()
+        self.assertEqual(pool.processes['process0'].stop_called, False)
+        self.assertEqual(pool.processes['process1'].stop_called, False)
+
+    def test__scaleDown_skips_busy_listeners(self):
+        options = DummyOptions()
+        from supervisor.states import ProcessStates
+        from supervisor.states import EventListenerStates
+        pool = self._makeScalingPool(options, [ProcessStates.RUNNING] * 2)
+        pool.standby = {}
+        pool.processes['process1'].listener_state = EventListenerStates.BUSY
+        pool._scaleDown()
+        self.assertEqual(pool.processes['process0'].stop_called, True)
+        self.assertEqual(pool.processes['process1'].stop_called, False)
+        self.assertEqual(pool.standby, {'process0':True})
+
     def test_handle_rejected_no_overflow(self):
         options = DummyOptions()
         gconfig = DummyPGroupConfig(options)
@@ -1551,7 +2595,7 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
         pool = self._makeOne(gconfig)
         pool.processes = {'process1': process1}
-        pool.event_buffer = [None, None]
+        pool.event_buffer.extend([None, None])
         class DummyEvent1:
             serial = 'abc'
         class DummyEvent2:
@@ -1560,7 +2604,8 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         dummyevent = DummyEvent2()
         dummyevent.serial = 1
         pool.handle_rejected(dummyevent)
-        self.assertEqual(pool.event_buffer, [dummyevent.event, None, None])
+        self.assertEqual(list(pool.event_buffer),
+                         [dummyevent.event, None, None])
 
     def test_handle_rejected_event_buffer_overflowed(self):
         options = DummyOptions()
@@ -1582,11 +2627,13 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         event_b = DummyEvent('b')
         event_c = DummyEvent('c')
         rej_event = DummyRejectedEvent('rejected')
-        pool.event_buffer = [event_a, event_b, event_c]
+        pool.event_buffer.extend([event_a, event_b, event_c])
         pool.handle_rejected(rej_event)
         serials = [ x.serial for x in pool.event_buffer ]
         # we popped a, and we inserted the rejected event into the 1st pos
         self.assertEqual(serials, ['rejected', 'b', 'c'])
+        self.assertEqual(pool.buffer_overflows, 1)
+        self.assertEqual(pool.buffer_high_water, 3)
         self.assertEqual(pool.config.options.logger.data[0],
             'pool whatever event buffer overflowed, discarding event a')
 
@@ -1601,14 +2648,60 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         import errno
         process1.write_error = errno.EPIPE
         process1.listener_state = EventListenerStates.READY
+        pool.listener_ready(process1)
         event = DummyEvent()
         pool._acceptEvent(event)
         pool.dispatch()
         self.assertEqual(process1.listener_state, EventListenerStates.READY)
-        self.assertEqual(pool.event_buffer, [event])
+        self.assertEqual(list(pool.event_buffer), [event])
         self.assertEqual(options.logger.data[0],
                          'rebuffering event abc for pool whatever (bufsize 0)')
 
+    def test_get_dispatchers(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', 'process1','/bin/process1')
+        gconfig = DummyPGroupConfig(options, pconfigs=[pconfig1])
+        pool = self._makeOne(gconfig)
+        pool.processes['process1'].dispatchers = {4:None}
+        result = pool.get_dispatchers()
+        self.assertEqual(result, {4:None, 98:pool.trigger})
+
+    def test_before_remove(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options)
+        class EventType:
+            pass
+        gconfig.pool_events = (EventType,)
+        pool = self._makeOne(gconfig)
+        pool.before_remove()
+        from supervisor import events
+        self.assertEqual(events.callbacks, [])
+        self.assertEqual(pool.trigger.closed, True)
+        self.assertEqual(options.fds_closed, [98, 99])
+
+    def test__acceptEvent_pulls_trigger(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options)
+        pool = self._makeOne(gconfig)
+        pool._acceptEvent(DummyEvent())
+        pool._acceptEvent(DummyEvent())
+        self.assertEqual(options.written, {99:'x'})
+        pool.trigger.handle_read_event()
+        pool._acceptEvent(DummyEvent(), head=True)
+        self.assertEqual(pool.trigger.triggered, False)
+
+    def test__acceptEvent_tracks_high_water(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options)
+        pool = self._makeOne(gconfig)
+        pool._acceptEvent(DummyEvent())
+        pool._acceptEvent(DummyEvent())
+        pool.event_buffer.popleft()
+        pool._acceptEvent(DummyEvent())
+        self.assertEqual(len(pool.event_buffer), 2)
+        self.assertEqual(pool.buffer_high_water, 2)
+        self.assertEqual(pool.buffer_overflows, 0)
+
     def test__acceptEvent_attaches_pool_serial_and_serial(self):
         from supervisor.process import GlobalSerial
         options = DummyOptions()
@@ -1648,7 +2741,7 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         pool._acceptEvent(event)
         pool.transition()
         self.assertEqual(process1.transitioned, True)
-        self.assertEqual(pool.event_buffer, [event])
+        self.assertEqual(list(pool.event_buffer), [event])
         data = pool.config.options.logger.data
 
     def test_transition_event_proc_not_running(self):
@@ -1666,7 +2759,7 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         pool._acceptEvent(event)
         pool.transition()
         self.assertEqual(process1.transitioned, True)
-        self.assertEqual(pool.event_buffer, [event])
+        self.assertEqual(list(pool.event_buffer), [event])
         self.assertEqual(process1.stdin_buffer, '')
         self.assertEqual(process1.listener_state, EventListenerStates.READY)
 
@@ -1687,7 +2780,8 @@ class EventListenerPoolTests(ProcessGroupBaseTests):
         pool._acceptEvent(event)
         pool.transition()
         self.assertEqual(process1.transitioned, True)
-        self.assertEqual(pool.event_buffer, [])
+        self.assertEqual(list(pool.event_buffer), [])
+        self.assertEqual(list(pool.ready_listeners), [])
         header, payload = process1.stdin_buffer.split('\n', 1)
         self.assertEquals(payload, 'dummy event', payload)
         self.assertEqual(process1.listener_state, EventListenerStates.BUSY)
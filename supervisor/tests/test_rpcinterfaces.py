@@ -477,6 +477,18 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         callback = interface.startProcess('foo:*')
         self.assertEqual(interface.update_text, 'startProcessGroup')
 
+    def test_startProcess_notify_ready_before_startsecs(self):
+        options = DummyOptions()
+        pconfig = DummyPConfig(options, 'foo', __file__, autostart=False,
+                               startsecs=60, notify_ready=True)
+        from supervisor.process import ProcessStates
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig)
+        supervisord.set_procattr('foo', 'state', ProcessStates.STOPPED)
+        interface = self._makeOne(supervisord)
+        callback = interface.startProcess('foo')
+        # the process reported it was ready long before startsecs
+        self.assertEqual(callback(), True)
+
     def test_startProcessGroup(self):
         options = DummyOptions()
         pconfig1 = DummyPConfig(options, 'process1', __file__, priority=1,
@@ -493,18 +505,17 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
 
         from supervisor.http import NOT_DONE_YET
 
-        # create callbacks in startall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-        # start first process
-        self.assertEqual(callback(), NOT_DONE_YET)
-        # start second process
+        # create callbacks in startall() and start the first priority tier
         self.assertEqual(callback(), NOT_DONE_YET)
+        process2 = supervisord.process_groups['foo'].processes['process2']
+        self.assertEqual(process2.spawned, False)
 
-        # wait for timeout 1
+        # wait for startsecs of the first process, then start the second
         time.sleep(.02)
         self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(process2.spawned, True)
 
-        # wait for timeout 2
+        # wait for startsecs of the second
         time.sleep(.02)
         result = callback()
 
@@ -512,14 +523,12 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
 
         from supervisor.xmlrpc import Faults
 
-        # XXX not sure about this ordering, I think process1 should
-        # probably show up first
-        self.assertEqual(result[0]['name'], 'process2')
+        self.assertEqual(result[0]['name'], 'process1')
         self.assertEqual(result[0]['group'], 'foo')
         self.assertEqual(result[0]['status'],  Faults.SUCCESS)
         self.assertEqual(result[0]['description'], 'OK')
 
-        self.assertEqual(result[1]['name'], 'process1')
+        self.assertEqual(result[1]['name'], 'process2')
         self.assertEqual(result[1]['group'], 'foo')
         self.assertEqual(result[1]['status'],  Faults.SUCCESS)
         self.assertEqual(result[1]['description'], 'OK')
@@ -547,10 +556,7 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         from supervisor.http import NOT_DONE_YET
         from supervisor.xmlrpc import Faults
 
-        # create callbacks in startall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-
-        # get a result
+        # create callbacks in startall() and call them
         result = callback()
 
         self.assertEqual(len(result), 2)
@@ -588,18 +594,17 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
 
         from supervisor.http import NOT_DONE_YET
 
-        # create callbacks in startall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-        # start first process
-        self.assertEqual(callback(), NOT_DONE_YET)
-        # start second process
+        # create callbacks in startall() and start the first priority tier
         self.assertEqual(callback(), NOT_DONE_YET)
+        process2 = supervisord.process_groups['foo'].processes['process2']
+        self.assertEqual(process2.spawned, False)
 
-        # wait for timeout 1
+        # wait for startsecs of the first process, then start the second
         time.sleep(.02)
         self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(process2.spawned, True)
 
-        # wait for timeout 2
+        # wait for startsecs of the second
         time.sleep(.02)
         result = callback()
 
@@ -607,14 +612,12 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
 
         from supervisor.xmlrpc import Faults
 
-        # XXX not sure about this ordering, I think process1 should
-        # probably show up first
-        self.assertEqual(result[0]['name'], 'process2')
+        self.assertEqual(result[0]['name'], 'process1')
         self.assertEqual(result[0]['group'], 'foo')
         self.assertEqual(result[0]['status'],  Faults.SUCCESS)
         self.assertEqual(result[0]['description'], 'OK')
 
-        self.assertEqual(result[1]['name'], 'process1')
+        self.assertEqual(result[1]['name'], 'process2')
         self.assertEqual(result[1]['group'], 'foo')
         self.assertEqual(result[1]['status'],  Faults.SUCCESS)
         self.assertEqual(result[1]['description'], 'OK')
@@ -642,10 +645,7 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         from supervisor.http import NOT_DONE_YET
         from supervisor.xmlrpc import Faults
 
-        # create callbacks in startall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-
-        # get a result
+        # create callbacks in startall() and call them
         result = callback()
 
         self.assertEqual(len(result), 2)
@@ -659,6 +659,25 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         self.assertEqual(result[1]['status'],  Faults.SUCCESS)
         self.assertEqual(result[1]['description'], 'OK')
 
+    def test_startAllProcesses_leaves_standby_listeners_alone(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', __file__, priority=1)
+        pconfig2 = DummyPConfig(options, 'process2', __file__, priority=2)
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig1,
+                                               pconfig2)
+        from supervisor.process import ProcessStates
+        supervisord.set_procattr('process1', 'state', ProcessStates.STOPPED)
+        supervisord.set_procattr('process2', 'state', ProcessStates.STOPPED)
+        supervisord.process_groups['foo'].standby['process2'] = True
+        interface = self._makeOne(supervisord)
+        callback = interface.startAllProcesses(wait=False)
+        result = callback()
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0]['name'], 'process1')
+        process2 = supervisord.process_groups['foo'].processes['process2']
+        self.assertEqual(process2.spawned, False)
+
     def test_stopProcess_badname(self):
         from supervisor import xmlrpc
         supervisord = DummySupervisor()
@@ -686,6 +705,124 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         self.assertEqual(len(supervisord.process_groups['foo'].processes), 1)
         self.assertEqual(interface.update_text, 'stopProcess')
 
+    def test_stopProcess_waits_for_its_process(self):
+        options = DummyOptions()
+        pconfig = DummyPConfig(options, 'foo', '/bin/foo')
+        from supervisor.process import ProcessStates
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig)
+        supervisord.set_procattr('foo', 'state', ProcessStates.RUNNING)
+        interface = self._makeOne(supervisord)
+        callback = interface.stopProcess('foo')
+        process = supervisord.process_groups['foo'].processes['foo']
+        self.assertEqual(callback.waits_for(process), True)
+        other = DummyProcess(DummyPConfig(options, 'foo', '/bin/foo'))
+        self.assertEqual(callback.waits_for(other), False)
+
+    def test_stopProcessGroup_calls_every_unfinished_callback(self):
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'process1', '/bin/foo')
+        pconfig2 = DummyPConfig(options, 'process2', '/bin/foo2')
+        from supervisor.process import ProcessStates
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig1,
+                                               pconfig2)
+        supervisord.set_procattr('process1', 'state', ProcessStates.RUNNING)
+        supervisord.set_procattr('process2', 'state', ProcessStates.RUNNING)
+        interface = self._makeOne(supervisord)
+        callback = interface.stopProcessGroup('foo')
+        process1 = supervisord.process_groups['foo'].processes['process1']
+        process2 = supervisord.process_groups['foo'].processes['process2']
+        from supervisor import http
+        self.assertEqual(callback(), http.NOT_DONE_YET)
+        self.assertEqual(process1.stop_called, True)
+        self.assertEqual(process2.stop_called, True)
+        self.assertEqual(callback.waits_for(process1), True)
+        self.assertEqual(callback.waits_for(process2), True)
+        process1.state = ProcessStates.STOPPING
+        self.assertEqual(callback(), http.NOT_DONE_YET)
+        self.assertEqual(callback.waits_for(process1), True)
+        self.assertEqual(callback.waits_for(process2), False)
+        process1.state = ProcessStates.STOPPED
+        result = callback()
+        # in the order of the processes, not the order they stopped in
+        self.assertEqual([ x['name'] for x in result ],
+                         ['process1', 'process2'])
+
+    def test_startProcessGroup_starts_a_tier_together(self):
+        options = DummyOptions()
+        pconfigs = [ DummyPConfig(options, 'process%s' % i, __file__,
+                                  priority=1, startsecs=.01)
+                     for i in range(3) ]
+        supervisord = PopulatedDummySupervisor(options, 'foo', *pconfigs)
+        from supervisor.process import ProcessStates
+        for i in range(3):
+            supervisord.set_procattr('process%s' % i, 'state',
+                                     ProcessStates.STOPPED)
+        interface = self._makeOne(supervisord)
+        callback = interface.startProcessGroup('foo')
+        from supervisor.http import NOT_DONE_YET
+        self.assertEqual(callback(), NOT_DONE_YET)
+        processes = supervisord.process_groups['foo'].processes
+        for process in processes.values():
+            self.assertEqual(process.spawned, True)
+        time.sleep(.02)
+        result = callback()
+        names = [ x['name'] for x in result ]
+        names.sort()
+        self.assertEqual(names, ['process0', 'process1', 'process2'])
+
+    def test_startProcessGroup_max_concurrency(self):
+        options = DummyOptions()
+        pconfigs = [ DummyPConfig(options, 'process%s' % i, __file__,
+                                  priority=1, startsecs=.01)
+                     for i in range(3) ]
+        supervisord = PopulatedDummySupervisor(options, 'foo', *pconfigs)
+        from supervisor.process import ProcessStates
+        for i in range(3):
+            supervisord.set_procattr('process%s' % i, 'state',
+                                     ProcessStates.STOPPED)
+        interface = self._makeOne(supervisord)
+        callback = interface.startProcessGroup('foo', max_concurrency=2)
+        from supervisor.http import NOT_DONE_YET
+        processes = supervisord.process_groups['foo'].processes
+        self.assertEqual(callback(), NOT_DONE_YET)
+        spawned = [ p for p in processes.values() if p.spawned ]
+        self.assertEqual(len(spawned), 2)
+        self.assertEqual(callback.waits_for(spawned[0]), True)
+        time.sleep(.02)
+        self.assertEqual(callback(), NOT_DONE_YET)
+        spawned = [ p for p in processes.values() if p.spawned ]
+        self.assertEqual(len(spawned), 3)
+        time.sleep(.02)
+        self.assertEqual(len(callback()), 3)
+
+    def test_stopAllProcesses_max_concurrency_nowait(self):
+        options = DummyOptions()
+        pconfigs = [ DummyPConfig(options, 'process%s' % i, __file__)
+                     for i in range(3) ]
+        supervisord = PopulatedDummySupervisor(options, 'foo', *pconfigs)
+        from supervisor.process import ProcessStates
+        for i in range(3):
+            supervisord.set_procattr('process%s' % i, 'state',
+                                     ProcessStates.RUNNING)
+        interface = self._makeOne(supervisord)
+        callback = interface.stopAllProcesses(wait=False, max_concurrency=1)
+        # callbacks which finish at once make room for the next in one call
+        result = callback()
+        self.assertEqual(len(result), 3)
+
+    def test_max_concurrency_bad(self):
+        from supervisor import xmlrpc
+        options = DummyOptions()
+        pconfig = DummyPConfig(options, 'foo', __file__)
+        supervisord = PopulatedDummySupervisor(options, 'foo', pconfig)
+        interface = self._makeOne(supervisord)
+        for value in (-1, 'x'):
+            self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                                 interface.startAllProcesses, True, value)
+            self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                                 interface.stopProcessGroup, 'foo', True,
+                                 value)
+
     def test_stopProcess_nowait(self):
         options = DummyOptions()
         pconfig = DummyPConfig(options, 'foo', __file__)
@@ -741,10 +878,7 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         from supervisor.http import NOT_DONE_YET
         from supervisor.xmlrpc import Faults
 
-        # create callbacks in killall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-
-        # get a result
+        # create callbacks in killall() and call them
         result = callback()
 
         self.assertEqual(len(result), 2)
@@ -822,10 +956,7 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         from supervisor.http import NOT_DONE_YET
         from supervisor.xmlrpc import Faults
 
-        # create callbacks in killall()
-        self.assertEqual(callback(), NOT_DONE_YET)
-
-        # get a result
+        # create callbacks in killall() and call them
         result = callback()
 
         self.assertEqual(len(result), 2)
@@ -839,6 +970,364 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         self.assertEqual(result[1]['status'],  Faults.SUCCESS)
         self.assertEqual(result[1]['description'], 'OK')
 
+    def _makeTwoGroups(self):
+        from supervisor.process import ProcessStates
+        options = DummyOptions()
+        pconfig1 = DummyPConfig(options, 'web1', '/bin/web', priority=1)
+        pconfig2 = DummyPConfig(options, 'web2', '/bin/web', priority=2)
+        supervisord = PopulatedDummySupervisor(options, 'web', pconfig1,
+                                               pconfig2)
+        pconfig3 = DummyPConfig(options, 'worker', '/bin/worker', priority=3)
+        # groups are in priority order before their processes are
+        supervisord.process_groups['web'].config.priority = 1
+        gconfig = DummyPGroupConfig(options, 'jobs', priority=2,
+                                    pconfigs=[pconfig3])
+        group = DummyProcessGroup(gconfig)
+        group.processes = {'worker':DummyProcess(pconfig3)}
+        supervisord.process_groups['jobs'] = group
+        for name in ('web1', 'web2'):
+            supervisord.set_procattr(name, 'state', ProcessStates.STOPPED)
+        supervisord.set_procattr('worker', 'state', ProcessStates.STOPPED,
+                                 'jobs')
+        return supervisord
+
+    def _matched(self, interface, patterns):
+        return [ '%s:%s' % (group.config.name, process.config.name)
+                 for group, process in interface._matchProcesses(patterns) ]
+
+    def test_matchProcesses(self):
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        self.assertEqual(self._matched(interface, ['web:web2']), ['web:web2'])
+        self.assertEqual(self._matched(interface, ['web']),
+                         ['web:web1', 'web:web2'])
+        self.assertEqual(self._matched(interface, ['*:w*']),
+                         ['web:web1', 'web:web2', 'jobs:worker'])
+        self.assertEqual(self._matched(interface, ['j*']), ['jobs:worker'])
+        self.assertEqual(self._matched(interface, 're:.*[12]'),
+                         ['web:web1', 'web:web2'])
+        # a process matched twice is dealt with once, in priority order
+        self.assertEqual(self._matched(interface, ['jobs', 'web:web?', 'web']),
+                         ['web:web1', 'web:web2', 'jobs:worker'])
+
+    def test_matchProcesses_errors(self):
+        from supervisor import xmlrpc
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        self._assertRPCError(xmlrpc.Faults.BAD_NAME,
+                             interface._matchProcesses, ['web', 'nope*'])
+        self._assertRPCError(xmlrpc.Faults.BAD_NAME,
+                             interface._matchProcesses, ['re:web'])
+        self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                             interface._matchProcesses, ['re:('])
+        self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                             interface._matchProcesses, [1])
+
+    def test_getNameIndex_remade_when_groups_change(self):
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        entries, positions = interface._getNameIndex()
+        self.assertEqual(interface._getNameIndex()[0] is entries, True)
+        del supervisord.process_groups['jobs']
+        entries, positions = interface._getNameIndex()
+        self.assertEqual([ entry[0] for entry in entries ],
+                         ['web:web1', 'web:web2'])
+        self.assertEqual(positions, {'web:web1':[0], 'web:web2':[1],
+                                     'web':[0, 1]})
+
+    def test_startProcesses(self):
+        from supervisor.xmlrpc import Faults
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        callback = interface.startProcesses(['web:web2', 'jobs'], wait=False)
+        self.assertEqual(interface.update_text, 'startProcesses')
+        result = callback()
+        self.assertEqual(result, [
+            {'status':Faults.SUCCESS, 'group':'web', 'name':'web2',
+             'description':'OK'},
+            {'status':Faults.SUCCESS, 'group':'jobs', 'name':'worker',
+             'description':'OK'},
+            ])
+        web1 = supervisord.process_groups['web'].processes['web1']
+        self.assertEqual(web1.spawned, False)
+
+    def test_startProcesses_bad_max_concurrency(self):
+        from supervisor import xmlrpc
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                             interface.startProcesses, ['web'], True, -1)
+
+    def test_stopProcesses(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        from supervisor import http
+        supervisord = self._makeTwoGroups()
+        supervisord.set_procattr('web1', 'state', ProcessStates.RUNNING)
+        supervisord.set_procattr('worker', 'state', ProcessStates.RUNNING,
+                                 'jobs')
+        interface = self._makeOne(supervisord)
+        callback = interface.stopProcesses(['re:.*:w.*1', '*:worker'],
+                                           max_concurrency=1)
+        self.assertEqual(interface.update_text, 'stopProcesses')
+        while 1:
+            value = callback()
+            if value is not http.NOT_DONE_YET:
+                break
+        self.assertEqual(value, [
+            {'status':Faults.SUCCESS, 'group':'web', 'name':'web1',
+             'description':'OK'},
+            {'status':Faults.SUCCESS, 'group':'jobs', 'name':'worker',
+             'description':'OK'},
+            ])
+        worker = supervisord.process_groups['jobs'].processes['worker']
+        self.assertEqual(worker.stop_called, True)
+
+    def _makeWorkers(self, count):
+        options = DummyOptions()
+        pconfigs = [ DummyPConfig(options, 'w%s' % i, '/bin/w', priority=i)
+                     for i in range(count) ]
+        supervisord = PopulatedDummySupervisor(options, 'workers', *pconfigs)
+        processes = [ supervisord.process_groups['workers'].processes[
+            pconfig.name] for pconfig in pconfigs ]
+        return supervisord, processes
+
+    def test_rollingRestart(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(5)
+        running = []
+        def stop(process):
+            running.append(len([ p for p in processes
+                                 if p.state == ProcessStates.RUNNING ]))
+            process.state = ProcessStates.STOPPED
+        for process in processes:
+            process.stop = lambda process=process: stop(process)
+        interface = self._makeOne(supervisord)
+        callback = interface.rollingRestart('workers', 4, 3)
+        self.assertEqual(interface.update_text, 'rollingRestart')
+        result = callback()
+        self.assertEqual([ r['name'] for r in result ],
+                         ['w0', 'w1', 'w2', 'w3', 'w4'])
+        self.assertEqual([ r['status'] for r in result ],
+                         [Faults.SUCCESS] * 5)
+        # batches of two, so that at least three were always running
+        self.assertEqual(running, [5, 4, 5, 4, 5])
+        for process in processes:
+            self.assertEqual(process.spawned, True)
+
+    def test_rollingRestart_waits_for_running(self):
+        from supervisor.process import ProcessStates
+        from supervisor.http import NOT_DONE_YET
+        supervisord, processes = self._makeWorkers(2)
+        w0, w1 = processes
+        def spawn(process):
+            process.spawned = True
+            process.state = ProcessStates.STARTING
+        for process in processes:
+            process.spawn = lambda process=process: spawn(process)
+        def stop():
+            w0.state = ProcessStates.STOPPING
+        w0.stop = stop
+        interface = self._makeOne(supervisord)
+        callback = interface.rollingRestart('workers')
+        self.assertEqual(callback.waits_for(w0), False)
+        self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(callback.waits_for(w0), True)
+        self.assertEqual(callback.waits_for(w1), False)
+        self.assertEqual(w0.spawned, False)
+        w0.state = ProcessStates.STOPPED
+        self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(w0.spawned, True)
+        w0.state = ProcessStates.BACKOFF # retried until it gives up
+        self.assertEqual(callback(), NOT_DONE_YET)
+        w0.state = ProcessStates.RUNNING
+        self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(w1.spawned, True)
+        w1.state = ProcessStates.RUNNING
+        self.assertEqual(len(callback()), 2)
+
+    def test_rollingRestart_aborts_on_fatal(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(4)
+        def spawn():
+            processes[1].state = ProcessStates.FATAL
+        processes[1].spawn = spawn
+        interface = self._makeOne(supervisord)
+        result = interface.rollingRestart('workers', 2)()
+        self.assertEqual(result, [
+            {'status':Faults.SUCCESS, 'group':'workers', 'name':'w0',
+             'description':'OK'},
+            {'status':Faults.ABNORMAL_TERMINATION, 'group':'workers',
+             'name':'w1', 'description':'workers:w1'},
+            ])
+        self.assertEqual(processes[2].stop_called, False)
+        self.assertEqual(processes[2].state, ProcessStates.RUNNING)
+
+    def test_rollingRestart_pause(self):
+        from supervisor.http import NOT_DONE_YET
+        supervisord, processes = self._makeWorkers(2)
+        interface = self._makeOne(supervisord)
+        callback = interface.rollingRestart('workers', pause=.02)
+        self.assertEqual(callback(), NOT_DONE_YET)
+        self.assertEqual(processes[0].spawned, True)
+        self.assertEqual(processes[1].spawned, False)
+        time.sleep(.03)
+        self.assertEqual(len(callback()), 2)
+        self.assertEqual(processes[1].spawned, True)
+
+    def test_rollingRestart_stop_failed(self):
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(3)
+        processes[1].stop = lambda: 'it went wrong'
+        interface = self._makeOne(supervisord)
+        result = interface.rollingRestart('workers', 2)()
+        self.assertEqual(result, [
+            {'status':Faults.FAILED, 'group':'workers', 'name':'w1',
+             'description':'it went wrong'},
+            {'status':Faults.SUCCESS, 'group':'workers', 'name':'w0',
+             'description':'OK'},
+            ])
+        # the rest of the batch is restarted, and the restart ends there
+        self.assertEqual(processes[0].spawned, True)
+        self.assertEqual(processes[1].spawned, False)
+        self.assertEqual(processes[2].stop_called, False)
+
+    def test_rollingRestart_leaves_stopped_processes_alone(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(4)
+        processes[0].state = ProcessStates.STOPPED
+        processes[2].state = ProcessStates.FATAL
+        processes[3].state = ProcessStates.BACKOFF
+        interface = self._makeOne(supervisord)
+        result = interface.rollingRestart('workers')()
+        self.assertEqual([ (r['name'], r['status']) for r in result ],
+                         [('w0', Faults.NOT_RUNNING),
+                          ('w2', Faults.NOT_RUNNING),
+                          ('w1', Faults.SUCCESS),
+                          ('w3', Faults.SUCCESS)])
+        self.assertEqual([ p.spawned for p in processes ],
+                         [False, True, False, True])
+        self.assertEqual(processes[3].stop_called, False)
+
+    def test_rollingRestart_skips_process_stopped_meanwhile(self):
+        from supervisor.process import ProcessStates
+        from supervisor.http import NOT_DONE_YET
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(2)
+        interface = self._makeOne(supervisord)
+        callback = interface.rollingRestart('workers', pause=.02)
+        self.assertEqual(callback(), NOT_DONE_YET)
+        processes[1].state = ProcessStates.STOPPED # by an operator
+        time.sleep(.03)
+        result = callback()
+        self.assertEqual([ (r['name'], r['status']) for r in result ],
+                         [('w0', Faults.SUCCESS), ('w1', Faults.NOT_RUNNING)])
+        self.assertEqual(processes[1].spawned, False)
+
+    def test_rollingRestart_min_running_counts_running_processes(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(5)
+        processes[0].state = ProcessStates.BACKOFF
+        processes[4].state = ProcessStates.STOPPED
+        running = []
+        def stop(process):
+            running.append(len([ p for p in processes
+                                 if p.state == ProcessStates.RUNNING ]))
+            process.state = ProcessStates.STOPPED
+        for process in processes:
+            process.stop = lambda process=process: stop(process)
+        interface = self._makeOne(supervisord)
+        # three RUNNING, so only one may be down at first; w0, once it
+        # is started from BACKOFF, makes room for two
+        self._assertRPCError(Faults.BAD_ARGUMENTS,
+                             interface.rollingRestart, 'workers', 3, 3)
+        result = interface.rollingRestart('workers', 3, 2)()
+        self.assertEqual([ r['name'] for r in result ],
+                         ['w4', 'w0', 'w1', 'w2', 'w3'])
+        self.assertEqual([ r['status'] for r in result ],
+                         [Faults.NOT_RUNNING] + [Faults.SUCCESS] * 4)
+        self.assertEqual(running, [3, 4, 3])
+
+    def test_rollingRestart_fewer_running_than_min_running(self):
+        from supervisor.process import ProcessStates
+        from supervisor.http import NOT_DONE_YET
+        from supervisor.xmlrpc import Faults
+        supervisord, processes = self._makeWorkers(3)
+        interface = self._makeOne(supervisord)
+        callback = interface.rollingRestart('workers', 1, 2, pause=.02)
+        self.assertEqual(callback(), NOT_DONE_YET)
+        processes[2].state = ProcessStates.BACKOFF # crashed meanwhile
+        time.sleep(.03)
+        result = callback()
+        description = 'would leave fewer than 2 processes RUNNING'
+        self.assertEqual(result, [
+            {'status':Faults.SUCCESS, 'group':'workers', 'name':'w0',
+             'description':'OK'},
+            {'status':Faults.FAILED, 'group':'workers', 'name':'w1',
+             'description':description},
+            {'status':Faults.FAILED, 'group':'workers', 'name':'w2',
+             'description':description},
+            ])
+        self.assertEqual(processes[1].stop_called, False)
+
+    def test_rollingRestart_bad_arguments(self):
+        from supervisor import xmlrpc
+        supervisord, processes = self._makeWorkers(2)
+        interface = self._makeOne(supervisord)
+        self._assertRPCError(xmlrpc.Faults.BAD_NAME,
+                             interface.rollingRestart, 'nope')
+        for args in ((0,), ('1',), (1, -1), (1, 2), (1, 3), (1, 0, -1),
+                     (1, 0, 'x')):
+            self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                                 interface.rollingRestart, 'workers', *args)
+
+    def test_signalProcesses(self):
+        import signal
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord = self._makeTwoGroups()
+        supervisord.set_procattr('web1', 'state', ProcessStates.RUNNING)
+        interface = self._makeOne(supervisord)
+        result = interface.signalProcesses(['web'], 'HUP')
+        self.assertEqual(interface.update_text, 'signalProcesses')
+        self.assertEqual(result, [
+            {'status':Faults.SUCCESS, 'group':'web', 'name':'web1',
+             'description':'OK'},
+            {'status':Faults.NOT_RUNNING, 'group':'web', 'name':'web2',
+             'description':'NOT_RUNNING'},
+            ])
+        web1 = supervisord.process_groups['web'].processes['web1']
+        self.assertEqual(web1.signalled_with, signal.SIGHUP)
+        self.assertEqual(web1.state, ProcessStates.RUNNING)
+        web2 = supervisord.process_groups['web'].processes['web2']
+        self.assertEqual(web2.signalled_with, None)
+
+    def test_signalProcesses_failed(self):
+        from supervisor.process import ProcessStates
+        from supervisor.xmlrpc import Faults
+        supervisord = self._makeTwoGroups()
+        supervisord.set_procattr('worker', 'state', ProcessStates.RUNNING,
+                                 'jobs')
+        worker = supervisord.process_groups['jobs'].processes['worker']
+        worker.signal = lambda sig: 'it went wrong'
+        interface = self._makeOne(supervisord)
+        result = interface.signalProcesses('jobs:worker', 15)
+        self.assertEqual(result, [
+            {'status':Faults.FAILED, 'group':'jobs', 'name':'worker',
+             'description':'it went wrong'},
+            ])
+
+    def test_signalProcesses_bad_signal(self):
+        from supervisor import xmlrpc
+        supervisord = self._makeTwoGroups()
+        interface = self._makeOne(supervisord)
+        self._assertRPCError(xmlrpc.Faults.BAD_ARGUMENTS,
+                             interface.signalProcesses, ['web'], 'BOGUS')
+
     def test_getAllConfigInfo(self):
         options = DummyOptions()
         supervisord = DummySupervisor(options, 'foo')
@@ -880,6 +1369,10 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         description = interface._interpretProcessInfo(running)
         self.assertEqual(description, 'pid 1, uptime 0:01:40')
 
+        running['health'] = 'UNHEALTHY'
+        description = interface._interpretProcessInfo(running)
+        self.assertEqual(description, 'pid 1, uptime 0:01:40, UNHEALTHY')
+
         fatal = {'name':'fatal',
                  'pid':2,
                  'state':ProcessStates.FATAL,
@@ -937,6 +1430,8 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         process.pid = 111
         process.laststart = 10
         process.laststop = 11
+        process.dropped_lines = 2
+        process.dropped_bytes = 1 << 40
         pgroup_config = DummyPGroupConfig(options, name='foo')
         pgroup = DummyProcessGroup(pgroup_config)
         pgroup.processes = {'foo':process}
@@ -956,8 +1451,30 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         self.assertEqual(data['statename'], 'RUNNING')
         self.assertEqual(data['exitstatus'], 0)
         self.assertEqual(data['spawnerr'], '')
+        self.assertEqual(data['dropped_lines'], 2)
+        self.assertEqual(data['dropped_bytes'], 2**31 - 1)
+        self.assertEqual(data['health'], 'NONE')
         self.failUnless(data['description'].startswith('pid 111'))
 
+    def test_getProcessInfo_health(self):
+        from supervisor.states import HealthStates
+        options = DummyOptions()
+        config = DummyPConfig(options, 'foo', '/bin/foo',
+                              healthcheck=('tcp', '127.0.0.1', 80))
+        process = DummyProcess(config)
+        process.pid = 111
+        class DummyHealthCheck:
+            state = HealthStates.UNHEALTHY
+        process.healthcheck = DummyHealthCheck()
+        pgroup_config = DummyPGroupConfig(options, name='foo')
+        pgroup = DummyProcessGroup(pgroup_config)
+        pgroup.processes = {'foo':process}
+        supervisord = DummySupervisor(process_groups={'foo':pgroup})
+        interface = self._makeOne(supervisord)
+        data = interface.getProcessInfo('foo')
+        self.assertEqual(data['health'], 'UNHEALTHY')
+        self.failUnless(data['description'].endswith(', UNHEALTHY'))
+
     def test_getProcessInfo_logfile_NONE(self):
         options = DummyOptions()
         config = DummyPConfig(options, 'foo', '/bin/foo',
@@ -1619,6 +2136,147 @@ class SupervisorNamespaceXMLRPCInterfaceTests(TestBase):
         self.assertEqual(event.type, 'fi\xc3\xad once')
         self.assertEqual(event.data, 'fi\xc3\xad twice')
 
+    def test_getEventPoolStats(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options, name='listeners')
+        pool = DummyProcessGroup(gconfig)
+        pool.event_buffer = [None, None]
+        pool.buffer_high_water = 5
+        pool.buffer_overflows = 3
+        pool.spool = None
+        pool.retry_events = [(0, None)]
+        pool.dead_letters = [None, None, None]
+        pool.standby = {'listener_1':True}
+        pool.get_metrics = self._makeMetrics
+        group = DummyProcessGroup(DummyPGroupConfig(options, name='foo'))
+        supervisord = DummySupervisor(
+            process_groups={'listeners':pool, 'foo':group})
+        interface = self._makeOne(supervisord)
+        stats = interface.getEventPoolStats()
+        self.assertEqual(interface.update_text, 'getEventPoolStats')
+        expected = self._makeMetrics()
+        expected.update({'name':'listeners', 'buffer_size':10,
+                         'depth':2, 'high_water':5,
+                         'overflows':3, 'spooled':0,
+                         'retrying':1, 'dead_letters':3,
+                         'standby':1})
+        self.assertEqual(stats, [expected])
+
+    def _makeMetrics(self):
+        latency = {'count':2, 'mean_ms':3.0, 'p50_ms':5.0, 'p90_ms':5.0,
+                   'p99_ms':5.0, 'max_ms':4.0,
+                   'buckets':[0, 2, 0, 0, 0, 0, 0, 0, 0, 0]}
+        return {'rejected':1, 'rebuffered':1,
+                'enqueue_latency':latency, 'result_latency':latency.copy(),
+                'accepted':{'TICK_5':2}, 'rates':{'TICK_5':0.5},
+                'busy':{'listener_0':0.25}}
+
+    def test_getEventPoolStats_caps_counts(self):
+        from xmlrpclib import MAXINT
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options, name='listeners')
+        pool = DummyProcessGroup(gconfig)
+        pool.event_buffer = []
+        pool.buffer_high_water = 0
+        pool.buffer_overflows = MAXINT + 1
+        pool.spool = None
+        pool.retry_events = []
+        pool.dead_letters = []
+        pool.standby = {}
+        def get_metrics():
+            metrics = self._makeMetrics()
+            metrics['rejected'] = MAXINT + 1
+            metrics['accepted']['TICK_5'] = MAXINT + 1
+            metrics['enqueue_latency']['count'] = MAXINT + 1
+            metrics['enqueue_latency']['buckets'][1] = MAXINT + 1
+            return metrics
+        pool.get_metrics = get_metrics
+        supervisord = DummySupervisor(process_groups={'listeners':pool})
+        interface = self._makeOne(supervisord)
+        stats = interface.getEventPoolStats()[0]
+        self.assertEqual(stats['overflows'], MAXINT)
+        self.assertEqual(stats['rejected'], MAXINT)
+        self.assertEqual(stats['accepted'], {'TICK_5':MAXINT})
+        self.assertEqual(stats['enqueue_latency']['count'], MAXINT)
+        self.assertEqual(stats['enqueue_latency']['buckets'][1], MAXINT)
+
+    def test_getEventPoolStats_spooled(self):
+        options = DummyOptions()
+        gconfig = DummyPGroupConfig(options, name='listeners')
+        pool = DummyProcessGroup(gconfig)
+        pool.event_buffer = []
+        pool.buffer_high_water = 0
+        pool.buffer_overflows = 0
+        pool.retry_events = []
+        pool.dead_letters = []
+        pool.standby = {}
+        pool.get_metrics = self._makeMetrics
+        class DummySpool:
+            pending = 4
+        pool.spool = DummySpool()
+        supervisord = DummySupervisor(process_groups={'listeners':pool})
+        interface = self._makeOne(supervisord)
+        stats = interface.getEventPoolStats()
+        self.assertEqual(stats[0]['spooled'], 4)
+
+    def _makeDeadLetterPool(self, options):
+        from collections import deque
+        from supervisor.events import ProcessCommunicationStdoutEvent
+        gconfig = DummyPGroupConfig(options, name='listeners')
+        pool = DummyProcessGroup(gconfig)
+        event = ProcessCommunicationStdoutEvent(None, 1, 'data')
+        event.serial = 5
+        event.pool_serials = {'listeners':2}
+        event.pool_rejections = {'listeners':4}
+        event.rendered_payload = 'the payload'
+        pool.dead_letters = deque([event])
+        def replay_dead_letters():
+            pool.replayed = True
+            return 1
+        pool.replay_dead_letters = replay_dead_letters
+        return pool
+
+    def test_getDeadLetters(self):
+        options = DummyOptions()
+        pool = self._makeDeadLetterPool(options)
+        supervisord = DummySupervisor(process_groups={'listeners':pool})
+        interface = self._makeOne(supervisord)
+        result = interface.getDeadLetters('listeners')
+        self.assertEqual(interface.update_text, 'getDeadLetters')
+        self.assertEqual(result, [{'serial':5, 'pool_serial':2,
+                                   'eventname':'PROCESS_COMMUNICATION_STDOUT',
+                                   'rejections':4,
+                                   'payload':'the payload'}])
+
+    def test_getDeadLetters_bad_name(self):
+        from supervisor import xmlrpc
+        options = DummyOptions()
+        group = DummyProcessGroup(DummyPGroupConfig(options, name='foo'))
+        supervisord = DummySupervisor(process_groups={'foo':group})
+        interface = self._makeOne(supervisord)
+        self._assertRPCError(xmlrpc.Faults.BAD_NAME,
+                             interface.getDeadLetters, 'foo')
+        self._assertRPCError(xmlrpc.Faults.BAD_NAME,
+                             interface.getDeadLetters, 'nope')
+
+    def test_replayDeadLetters(self):
+        options = DummyOptions()
+        pool = self._makeDeadLetterPool(options)
+        supervisord = DummySupervisor(process_groups={'listeners':pool})
+        interface = self._makeOne(supervisord)
+        self.assertEqual(interface.replayDeadLetters('listeners'), 1)
+        self.assertEqual(interface.update_text, 'replayDeadLetters')
+        self.assertEqual(pool.replayed, True)
+
+    def test_clearDeadLetters(self):
+        options = DummyOptions()
+        pool = self._makeDeadLetterPool(options)
+        supervisord = DummySupervisor(process_groups={'listeners':pool})
+        interface = self._makeOne(supervisord)
+        self.assertEqual(interface.clearDeadLetters('listeners'), 1)
+        self.assertEqual(interface.update_text, 'clearDeadLetters')
+        self.assertEqual(len(pool.dead_letters), 0)
+
 
 class SystemNamespaceXMLRPCInterfaceTests(TestBase):
     def _getTargetClass(self):
@@ -1791,6 +2449,22 @@ class SystemNamespaceXMLRPCInterfaceTests(TestBase):
             result = callback()
         self.assertEqual(result[0], [])
 
+    def test_multicall_waits_for(self):
+        interface = self._makeOne()
+        def waiting():
+            def deferred():
+                return True
+            deferred.delay = 0.05
+            deferred.waits_for = lambda process: process == 'process1'
+            return deferred
+        interface.namespaces['system'].waiting = waiting
+        callback = interface.multicall([
+            {'methodName':'system.listMethods', 'params':[]},
+            {'methodName':'system.waiting'},
+            ])
+        self.assertEqual(callback.waits_for('process1'), True)
+        self.assertEqual(callback.waits_for('process2'), False)
+
     def test_methodHelp(self):
         from supervisor import xmlrpc
         interface = self._makeOne()
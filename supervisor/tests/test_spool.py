@@ -0,0 +1,155 @@
+"""Test suite for supervisor.spool"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+class EventSpoolTests(unittest.TestCase):
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.basedir, 'thespool')
+
+    def tearDown(self):
+        try:
+            shutil.rmtree(self.basedir)
+        except OSError:
+            pass
+
+    def _getTargetClass(self):
+        from supervisor.spool import EventSpool
+        return EventSpool
+
+    def _makeOne(self, maxbytes=1<<20):
+        return self._getTargetClass()(self.filename, maxbytes)
+
+    def _makeEvent(self, serial, payload='payload'):
+        from supervisor.events import ProcessCommunicationStdoutEvent
+        event = ProcessCommunicationStdoutEvent(None, 1, payload)
+        event.serial = serial
+        event.pool_serials = {'pool':serial + 100}
+        event.rendered_payload = payload
+        return event
+
+    def test_ctor_truncates_existing_file(self):
+        f = open(self.filename, 'w')
+        f.write('leftover')
+        f.close()
+        spool = self._makeOne()
+        self.assertEqual(os.path.getsize(self.filename), 0)
+        self.assertEqual(spool.pending, 0)
+
+    def test_append_and_read_in_order(self):
+        from supervisor.events import ProcessCommunicationStdoutEvent
+        spool = self._makeOne()
+        self.assertTrue(spool.append(self._makeEvent(1, 'one'), 'pool'))
+        self.assertTrue(spool.append(self._makeEvent(2, 'two\nlines'), 'pool'))
+        self.assertEqual(spool.pending, 2)
+        event = spool.read('pool')
+        self.assertEqual(event.__class__, ProcessCommunicationStdoutEvent)
+        self.assertEqual(event.serial, 1)
+        self.assertEqual(event.pool_serials, {'pool':101})
+        self.assertEqual(event.rendered_payload, 'one')
+        event = spool.read('pool')
+        self.assertEqual(event.serial, 2)
+        self.assertEqual(event.rendered_payload, 'two\nlines')
+        self.assertEqual(spool.pending, 0)
+
+    def test_read_last_event_empties_file(self):
+        spool = self._makeOne()
+        spool.append(self._makeEvent(1), 'pool')
+        spool.read('pool')
+        self.assertEqual(spool.read_offset, 0)
+        self.assertEqual(spool.write_offset, 0)
+        self.assertEqual(os.path.getsize(self.filename), 0)
+
+    def test_append_full(self):
+        spool = self._makeOne(maxbytes=60)
+        self.assertTrue(spool.append(self._makeEvent(1), 'pool'))
+        self.assertFalse(spool.append(self._makeEvent(2), 'pool'))
+        self.assertEqual(spool.pending, 1)
+
+    def test_append_full_compacts_read_events(self):
+        # two 44 byte records; reading one frees half the file
+        spool = self._makeOne(maxbytes=88)
+        spool.append(self._makeEvent(1), 'pool')
+        spool.append(self._makeEvent(2), 'pool')
+        spool.read('pool')
+        self.assertTrue(spool.append(self._makeEvent(3), 'pool'))
+        self.assertEqual([ spool.read('pool').serial for i in range(2) ],
+                         [2, 3])
+
+    def test_append_full_does_not_compact_little_read_space(self):
+        spool = self._makeOne(maxbytes=200)
+        for serial in range(4):
+            self.assertTrue(spool.append(self._makeEvent(serial), 'pool'))
+        spool.read('pool')
+        compacted = []
+        spool.compact = lambda: compacted.append(True)
+        self.assertFalse(spool.append(self._makeEvent(4), 'pool'))
+        self.assertEqual(compacted, [])
+
+    def test_compact_copies_in_chunks(self):
+        from supervisor import spool as spool_module
+        old_chunk = spool_module.COMPACT_CHUNK
+        spool_module.COMPACT_CHUNK = 10
+        try:
+            spool = self._makeOne()
+            for serial in range(5):
+                spool.append(self._makeEvent(serial), 'pool')
+            spool.read('pool')
+            reads = []
+            class CountingFile:
+                def __init__(self, file):
+                    self.file = file
+                def read(self, size):
+                    reads.append(size)
+                    return self.file.read(size)
+                def __getattr__(self, name):
+                    return getattr(self.file, name)
+            spool.file = CountingFile(spool.file)
+            spool.compact()
+        finally:
+            spool_module.COMPACT_CHUNK = old_chunk
+        self.assertEqual(max(reads), 10)
+        self.assertEqual(spool.read_offset, 0)
+        self.assertEqual(os.path.getsize(self.filename), spool.write_offset)
+        self.assertEqual([ spool.read('pool').serial for i in range(4) ],
+                         [1, 2, 3, 4])
+
+    def test_compaction_is_amortized(self):
+        spool = self._makeOne(maxbytes=1000)
+        compact = spool.compact
+        copied = []
+        def counting_compact():
+            copied.append(spool.write_offset - spool.read_offset)
+            compact()
+        spool.compact = counting_compact
+        # a listener which keeps up with a steady stream, but only just
+        serial = 0
+        while spool.append(self._makeEvent(serial), 'pool'):
+            serial += 1
+        record_size = spool.write_offset / serial
+        appended = 0
+        for i in range(500):
+            spool.read('pool')
+            if spool.append(self._makeEvent(serial), 'pool'):
+                appended += 1
+            serial += 1
+        # each compaction frees at least half the file, so copying costs
+        # at most one unread byte per byte appended
+        self.assertTrue(len(copied) <= appended * record_size / 500 + 1)
+        self.assertTrue(sum(copied) <= (appended + 1) * record_size)
+        self.assertTrue(appended > 450)
+
+    def test_close_removes_file(self):
+        spool = self._makeOne()
+        spool.close()
+        self.assertFalse(os.path.exists(self.filename))
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -50,7 +50,15 @@ class TopLevelEventListenerStateTests(unittest.TestCase):
     def test_getEventListenerStateDescription_returns_None_when_not_found(self):
         self.assertEqual(states.getEventListenerStateDescription(3.14159),
             None)
-    
+
+class TopLevelHealthStateTests(unittest.TestCase):
+    def test_getHealthStateDescription_returns_string_when_found(self):
+        state = states.HealthStates.UNHEALTHY
+        self.assertEqual(states.getHealthStateDescription(state), 'UNHEALTHY')
+
+    def test_getHealthStateDescription_returns_None_when_not_found(self):
+        self.assertEqual(states.getHealthStateDescription(3.14159), None)
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -294,6 +294,21 @@ class TestDefaultControllerPlugin(unittest.TestCase):
         value = plugin.ctl.stdout.getvalue().strip()
         self.assertEqual(value, "Error: bad channel 'fudge'")
 
+    def test_tail_f_group_uses_group_logtail(self):
+        plugin = self._makeOne()
+        L = []
+        plugin._tailf = L.append
+        plugin.do_tail('-f foo:* stderr')
+        self.assertEqual(L, ['/logtail-group/foo:*/stderr'])
+
+    def test_tail_group_without_f(self):
+        plugin = self._makeOne()
+        result = plugin.do_tail('-10 foo:*')
+        self.assertEqual(result, None)
+        value = plugin.ctl.stdout.getvalue().strip()
+        self.assertEqual(value,
+                         'Error: tail of multiple processes requires -f')
+
     def test_status_oneprocess(self):
         plugin = self._makeOne()
         result = plugin.do_status('foo')
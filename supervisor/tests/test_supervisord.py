@@ -12,6 +12,7 @@ from supervisor.tests.base import DummyPGroupConfig
 from supervisor.tests.base import DummyProcess
 from supervisor.tests.base import DummyProcessGroup
 from supervisor.tests.base import DummyDispatcher
+from supervisor.tests.base import DummyEvent
 
 class EntryPointTests(unittest.TestCase):
     def test_main_noprofile(self):
@@ -90,6 +91,7 @@ class SupervisordTests(unittest.TestCase):
                          options)
         self.assertEqual(options.environment_processed, True)
         self.assertEqual(options.httpservers_opened, True)
+        self.assertEqual(options.eventserver_opened, True)
         self.assertEqual(options.signals_set, True)
         self.assertEqual(options.daemonized, True)
         self.assertEqual(options.pidfile_written, True)
@@ -253,9 +255,13 @@ class SupervisordTests(unittest.TestCase):
                 'autorestart': True, 'startsecs': 10, 'startretries': 999,
                 'uid': None, 'stdout_logfile': None, 'stdout_capture_maxbytes': 0,
                 'stdout_events_enabled': False,
+                'stdout_events_flush_ms': 0, 'stdout_events_max_bytes': 0,
+                'stdout_filter_drop': [], 'stdout_filter_keep': [],
                 'stdout_logfile_backups': 0, 'stdout_logfile_maxbytes': 0,
                 'stderr_logfile': None, 'stderr_capture_maxbytes': 0,
                 'stderr_events_enabled': False,
+                'stderr_events_flush_ms': 0, 'stderr_events_max_bytes': 0,
+                'stderr_filter_drop': [], 'stderr_filter_keep': [],
                 'stderr_logfile_backups': 0, 'stderr_logfile_maxbytes': 0,
                 'redirect_stderr': False,
                 'stopsignal': None, 'stopwaitsecs': 10,
@@ -329,9 +335,11 @@ class SupervisordTests(unittest.TestCase):
         self.assertRaises(KeyError, supervisord.remove_process_group, 'asdf')
 
         supervisord.add_process_group(gconfig)
+        group = supervisord.process_groups['foo']
         result = supervisord.remove_process_group('foo')
         self.assertEqual(supervisord.process_groups, {})
         self.assertTrue(result)
+        self.assertTrue(group.removed)
 
         supervisord.add_process_group(gconfig)
         supervisord.process_groups['foo'].unstopped_processes = [DummyProcess(None)]
@@ -363,6 +371,29 @@ class SupervisordTests(unittest.TestCase):
         supervisord.runforever()
         self.assertEqual(L, [2])
 
+    def test_runforever_transitions_eventserver(self):
+        options = DummyOptions()
+        options.test = True
+        class DummyEventServer:
+            transitioned = False
+            def get_dispatchers(self):
+                return {}
+            def transition(self):
+                self.transitioned = True
+        options.eventserver = DummyEventServer()
+        supervisord = self._makeOne(options)
+        supervisord.runforever()
+        self.assertEqual(options.eventserver.transitioned, True)
+
+    def test_get_process_map_includes_eventserver(self):
+        options = DummyOptions()
+        class DummyEventServer:
+            def get_dispatchers(self):
+                return {98:'trigger'}
+        options.eventserver = DummyEventServer()
+        supervisord = self._makeOne(options)
+        self.assertEqual(supervisord.get_process_map(), {98:'trigger'})
+
     def test_runforever_calls_tick(self):
         options = DummyOptions()
         options.test = True
@@ -485,6 +516,34 @@ class SupervisordTests(unittest.TestCase):
         result = getSupervisorStateDescription(SupervisorStates.RUNNING)
         self.assertEqual(result, 'RUNNING')
 
+    def test_select_timeout(self):
+        options = DummyOptions()
+        supervisord = self._makeOne(options)
+        group1 = DummyProcessGroup(DummyPGroupConfig(options, 'foo'))
+        group2 = DummyProcessGroup(DummyPGroupConfig(options, 'bar'))
+        self.assertEqual(supervisord.select_timeout([group1, group2], 100), 1)
+        group1.wakeup = 105
+        self.assertEqual(supervisord.select_timeout([group1, group2], 100), 1)
+        group2.wakeup = 100.25
+        self.assertEqual(supervisord.select_timeout([group1, group2], 100),
+                         .25)
+        # overdue
+        self.assertEqual(supervisord.select_timeout([group1, group2], 101), 0)
+
+    def test_select_timeout_pending_batch(self):
+        from supervisor.process import EventListenerPool
+        options = DummyOptions()
+        supervisord = self._makeOne(options)
+        gconfig = DummyPGroupConfig(options, 'pool')
+        gconfig.batch_size = 10
+        gconfig.max_batch_latency = 200
+        pool = EventListenerPool(gconfig)
+        pool._acceptEvent(DummyEvent())
+        now = time.time()
+        timeout = supervisord.select_timeout([pool], now)
+        self.assertTrue(0 < timeout <= .2)
+        self.assertEqual(timeout, pool.batch_deadline - now)
+
     def test_tick(self):
         from supervisor import events
         L = []
@@ -4,6 +4,9 @@ import unittest
 from supervisor.tests.base import DummySupervisor
 from supervisor.tests.base import DummyRequest
 from supervisor.tests.base import DummySupervisorRPCNamespace
+from supervisor.tests.base import DummyOptions
+from supervisor.tests.base import DummyPConfig
+from supervisor.tests.base import DummyProcess
 
 class XMLRPCMarshallingTests(unittest.TestCase):
     def test_xmlrpc_marshal(self):
@@ -166,6 +169,51 @@ class XMLRPCHandlerTests(unittest.TestCase):
         self.assertEqual(len(request.producers), 0)
         self.assertEqual(request._error, 500)
 
+class DeferredXMLRPCResponseTests(unittest.TestCase):
+    def tearDown(self):
+        from supervisor.events import clear
+        clear()
+
+    def _makeOne(self, callback):
+        from supervisor.xmlrpc import DeferredXMLRPCResponse
+        request = DummyRequest('/what/ever', None, None, None)
+        return DeferredXMLRPCResponse(request, callback)
+
+    def test_woken_by_state_change_of_awaited_process(self):
+        from supervisor import events
+        from supervisor.http import NOT_DONE_YET
+        from supervisor.states import ProcessStates
+        options = DummyOptions()
+        process1 = DummyProcess(DummyPConfig(options, 'process1', '/bin/a'))
+        process2 = DummyProcess(DummyPConfig(options, 'process2', '/bin/b'))
+        values = [NOT_DONE_YET, True]
+        def callback():
+            return values.pop(0)
+        callback.delay = 0.2
+        callback.waits_for = lambda process: process is process1
+        response = self._makeOne(callback)
+        self.assertEqual(response.more(), NOT_DONE_YET)
+        self.assertEqual(response.woken, False)
+        events.notify(events.ProcessStateStoppedEvent(process2,
+                                                      ProcessStates.STOPPING))
+        self.assertEqual(response.woken, False)
+        events.notify(events.ProcessStateStoppedEvent(process1,
+                                                      ProcessStates.STOPPING))
+        self.assertEqual(response.woken, True)
+        response.more()
+        self.assertEqual(response.finished, True)
+        self.assertEqual(response.woken, False)
+        self.assertEqual(events.callbacks, [])
+
+    def test_no_waits_for(self):
+        from supervisor import events
+        def callback():
+            return True
+        callback.delay = 0.2
+        response = self._makeOne(callback)
+        self.assertEqual(events.callbacks, [])
+        response.stop_waiting()
+
 class TraverseTests(unittest.TestCase):
     def test_underscore(self):
         from supervisor import xmlrpc
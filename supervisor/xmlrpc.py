@@ -14,6 +14,7 @@ from supervisor.medusa.xmlrpc_handler import xmlrpc_handler
 from supervisor.medusa import producers
 
 from supervisor.http import NOT_DONE_YET
+from supervisor import events
 
 class Faults:
     UNKNOWN_METHOD = 1
@@ -57,10 +58,26 @@ class DeferredXMLRPCResponse:
         self.request = request
         self.finished = False
         self.delay = float(callback.delay)
+        # a callback which waits for processes to change state says which
+        # ones; the channel calls it again as soon as one of them does
+        self.woken = False
+        self.waits_for = getattr(callback, 'waits_for', None)
+        if self.waits_for is not None:
+            events.subscribe(events.ProcessStateEvent, self.wake)
+
+    def wake(self, event):
+        if self.waits_for(event.process):
+            self.woken = True
+
+    def stop_waiting(self):
+        if self.waits_for is not None:
+            events.unsubscribe(events.ProcessStateEvent, self.wake)
+            self.waits_for = None
 
     def more(self):
         if self.finished:
             return ''
+        self.woken = False
         try:
             try:
                 value = self.callback()
@@ -72,6 +89,7 @@ class DeferredXMLRPCResponse:
             body = xmlrpc_marshal(value)
 
             self.finished = True
+            self.stop_waiting()
 
             return self.getresponse(body)
 
@@ -79,6 +97,7 @@ class DeferredXMLRPCResponse:
             # report unexpected exception back to server
             traceback.print_exc()
             self.finished = True
+            self.stop_waiting()
             self.request.error(500)
 
     def getresponse(self, body):
@@ -291,7 +310,15 @@ class SystemNamespaceRPCInterface:
 
             return results
 
+        def waits_for(process):
+            for callback in producers:
+                waits_for = getattr(callback, 'waits_for', None)
+                if waits_for is not None and waits_for(process):
+                    return True
+            return False
+
         multiproduce.delay = .05
+        multiproduce.waits_for = waits_for
         return multiproduce
 
 class AttrDict(dict):